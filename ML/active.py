@@ -0,0 +1,164 @@
+import os
+import json
+import bisect
+import argparse
+from typing import Any, Dict, Iterable, List, Tuple
+
+from incidents import incident_window, load_labels, parse_date
+
+# --------------------------- Konfiguracja ---------------------------
+
+INPUT_PATH = "outputs/london_crime_news_labeled.jsonl"
+# incydenty dłuższe niż to (szacunki modelu na wiele dni) trzymane osobno – inaczej jeden
+# taki wpis poszerzałby okno przeszukiwania dla wszystkich zapytań
+LONG_DURATION = 48 * 3600
+
+# --------------------------- Indeks ---------------------------
+
+class ActiveIndex:
+    """Incydenty aktywne w chwili T / w oknie czasu: posortowane początki + bisect.
+
+    Krótkie incydenty (do LONG_DURATION) leżą na liście posortowanej po początku; aktywny
+    w T musi zaczynać się w [T - najdłuższy czas trwania, T], więc zapytanie to dwa bisect
+    i przejrzenie tylko tego przedziału. Długie incydenty (nieliczne) sprawdzane są wprost.
+    Wpisy bez rozpoznawalnej daty trafiają do `undated` i nie biorą udziału w zapytaniach.
+    """
+
+    def __init__(self, long_duration: float = LONG_DURATION):
+        self.long_duration = long_duration
+        self._starts: List[float] = []
+        self._items: List[Tuple[float, float, str, Dict[str, Any]]] = []  # (start, end, klucz, etykiety)
+        self._max_duration = 0.0
+        self._long: Dict[str, Tuple[float, float, Dict[str, Any]]] = {}
+        self._where: Dict[str, Tuple[float, float]] = {}  # klucz -> okno (do podmiany wpisu)
+        self.undated: Dict[str, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items) + len(self._long)
+
+    @staticmethod
+    def _key(labels: Dict[str, Any]) -> str:
+        return labels.get("adres_url") or json.dumps(labels, sort_keys=True, ensure_ascii=False)
+
+    def add(self, labels: Dict[str, Any]) -> bool:
+        # wstawienie przyrostowe (insort); ponownie zaetykietowany wpis zastępuje poprzedni
+        key = self._key(labels)
+        self.remove(key)
+        window = incident_window(labels)
+        if window is None:
+            self.undated[key] = labels
+            return False
+        start, end = window
+        self._where[key] = window
+        if end - start > self.long_duration:
+            self._long[key] = (start, end, labels)
+            return True
+        i = bisect.bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._items.insert(i, (start, end, key, labels))
+        self._max_duration = max(self._max_duration, end - start)
+        return True
+
+    def extend(self, labels: Iterable[Dict[str, Any]]) -> int:
+        return sum(1 for lab in labels if self.add(lab))
+
+    def remove(self, key: str) -> bool:
+        self.undated.pop(key, None)
+        window = self._where.pop(key, None)
+        if window is None:
+            return False
+        if self._long.pop(key, None) is not None:
+            return True
+        # _max_duration zostaje (górne ograniczenie – zapytania pozostają poprawne)
+        i = bisect.bisect_left(self._starts, window[0])
+        while self._items[i][2] != key:
+            i += 1
+        del self._starts[i]
+        del self._items[i]
+        return True
+
+    def overlapping(self, start: Any, end: Any = None) -> List[Dict[str, Any]]:
+        # incydenty, których okno [początek, koniec] przecina [start, end]; posortowane po początku
+        lo = _timestamp(start)
+        hi = lo if end is None else _timestamp(end)
+        first = bisect.bisect_left(self._starts, lo - self._max_duration)
+        last = bisect.bisect_right(self._starts, hi)
+        found = [item for item in self._items[first:last] if item[1] >= lo]
+        found.extend((s, e, key, lab) for key, (s, e, lab) in self._long.items() if s <= hi and e >= lo)
+        found.sort(key=lambda item: item[0])
+        return [item[3] for item in found]
+
+    def active_at(self, when: Any) -> List[Dict[str, Any]]:
+        return self.overlapping(when)
+
+# --------------------------- Strumień etykiet ---------------------------
+
+class LabelTail:
+    """Nowe wyniki dopisane do JSONL (main.py --stream/--follow) od ostatniego odczytu."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0
+
+    def read(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < self.offset:
+                self.offset = 0  # plik skompaktowany/zastąpiony – od początku
+            f.seek(self.offset)
+            chunk = f.read()
+        # tylko pełne linie; urwana ostatnia zostanie doczytana następnym razem
+        end = chunk.rfind(b"\n") + 1
+        self.offset += end
+        labels = []
+        for line in chunk[:end].splitlines():
+            try:
+                lab = json.loads(line).get("labels")
+            except (json.JSONDecodeError, AttributeError):
+                continue
+            if isinstance(lab, dict):
+                labels.append(lab)
+        return labels
+
+    def update(self, index: ActiveIndex) -> int:
+        return index.extend(self.read())
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    dt = parse_date(value)
+    if dt is None:
+        raise ValueError(f"nierozpoznana data: {value!r}")
+    return dt.timestamp()
+
+# --------------------------- Main ---------------------------
+
+def load_index(path: str = INPUT_PATH) -> ActiveIndex:
+    index = ActiveIndex()
+    if path.endswith(".jsonl"):
+        LabelTail(path).update(index)
+    else:
+        index.extend(load_labels(path))
+    return index
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Incydenty aktywne w danej chwili / oknie czasu.")
+    parser.add_argument("--input", default=INPUT_PATH, help="Wyjście main.py (.jsonl lub .json).")
+    parser.add_argument("--at", help="Chwila (ISO 8601); domyślnie teraz.")
+    parser.add_argument("--window", nargs=2, metavar=("OD", "DO"), help="Okno czasu zamiast chwili.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    from datetime import datetime, timezone
+
+    args = parse_args()
+    index = load_index(args.input)
+    if args.window:
+        found = index.overlapping(*args.window)
+    else:
+        found = index.active_at(args.at or datetime.now(timezone.utc))
+    print(f"{len(found)} z {len(index)} incydentów (bez daty: {len(index.undated)})")
+    for lab in found:
+        print(f"- {lab.get('data')} → {lab.get('szacowany_czas_zakonczenia')} | "
+              f"{lab.get('poziom_zagrozenia')} | {lab.get('miejsce')} | {lab.get('adres_url')}")
@@ -0,0 +1,166 @@
+import io
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# --------------------------- Plik wsadowy ---------------------------
+
+def write_batch_file(path: str, items: List[Dict[str, Any]],
+                     build_body: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    # jedna linia = jedno zapytanie chat.completions; custom_id wiąże wynik z wpisem
+    by_id: Dict[str, Dict[str, Any]] = {}
+    with open(path, "w", encoding="utf-8") as f:
+        for i, entry in enumerate(items):
+            custom_id = f"wpis-{i}"
+            by_id[custom_id] = entry
+            line = {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": build_body(entry)}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return by_id
+
+# --------------------------- Wysyłka i odpytywanie ---------------------------
+
+async def submit_batch(client: Any, path: str) -> str:
+    with open(path, "rb") as f:
+        uploaded = await client.files.create(file=f, purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=COMPLETION_WINDOW,
+    )
+    print(f"Batch {batch.id} wysłany (plik {uploaded.id})")
+    return batch.id
+
+async def wait_for_batch(client: Any, batch_id: str, poll_interval: float) -> Any:
+    while True:
+        batch = await client.batches.retrieve(batch_id)
+        counts = getattr(batch, "request_counts", None)
+        if counts is not None:
+            print(f"Batch {batch_id}: {batch.status} ({counts.completed}/{counts.total}, błędy: {counts.failed})")
+        else:
+            print(f"Batch {batch_id}: {batch.status}")
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        await asyncio.sleep(poll_interval)
+
+def parse_result_line(line: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    # zwraca (argumenty set_labels, błąd) dla jednej linii pliku wynikowego
+    if line.get("error"):
+        return None, json.dumps(line["error"], ensure_ascii=False)
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        return None, f"HTTP {response.get('status_code')}: {json.dumps(response.get('body'), ensure_ascii=False)}"
+    try:
+        tool_calls = response["body"]["choices"][0]["message"].get("tool_calls")
+    except (KeyError, IndexError, TypeError):
+        return None, "Niepoprawna odpowiedź w pliku wynikowym."
+    if not tool_calls:
+        return None, "Brak wywołania funkcji z danymi etykiet."
+    return tool_calls[0]["function"]["arguments"], None
+
+async def iter_batch_results(client: Any, batch: Any) -> AsyncIterator[Tuple[str, Optional[str], Optional[str]]]:
+    # strumieniowo: (custom_id, argumenty, błąd) z pliku wyników i pliku błędów
+    for file_id in (batch.output_file_id, getattr(batch, "error_file_id", None)):
+        if not file_id:
+            continue
+        content = await client.files.content(file_id)
+        for raw in content.text.splitlines():
+            if not raw.strip():
+                continue
+            line = json.loads(raw)
+            args_str, error = parse_result_line(line)
+            yield line["custom_id"], args_str, error
+
+# --------------------------- Atrapa API (testy bez sieci) ---------------------------
+
+def _fake_labels(body: Dict[str, Any]) -> Dict[str, Any]:
+    # deterministyczne etykiety; URL wyciągnięty z promptu użytkownika
+    prompt = body["messages"][-1]["content"]
+    url = ""
+    for line in prompt.splitlines():
+        if line.startswith("- url: "):
+            url = line[len("- url: "):]
+    return {
+        "miejsce": "Parliament Square, Westminster, London",
+        "data": "2025-10-04T13:45:00+01:00",
+        "szacowany_czas_zakonczenia": "2025-10-04T15:45:00+01:00",
+        "poziom_zagrozenia": 3,
+        "komfort": 3,
+        "podsumowanie": "Atrapa etykiet.",
+        "adres_url": url,
+    }
+
+class FakeBatchClient:
+    """Lokalna atrapa `client.files` / `client.batches` – przetwarza batch w pamięci.
+
+    `respond(body)` zwraca argumenty `set_labels` (dict) albo rzuca wyjątek,
+    który trafi do pliku błędów. Pierwsze `polls_until_done` odpytań zwraca `in_progress`.
+    """
+
+    def __init__(self, respond: Callable[[Dict[str, Any]], Dict[str, Any]] = _fake_labels,
+                 polls_until_done: int = 1):
+        self._respond = respond
+        self._polls_until_done = polls_until_done
+        self._files: Dict[str, str] = {}
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    async def _create_file(self, file: io.BufferedReader, purpose: str) -> Any:
+        file_id = f"file-{len(self._files)}"
+        self._files[file_id] = file.read().decode("utf-8")
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    async def _file_content(self, file_id: str) -> Any:
+        return SimpleNamespace(text=self._files[file_id])
+
+    async def _create_batch(self, input_file_id: str, endpoint: str, completion_window: str) -> Any:
+        out_lines, err_lines = [], []
+        for raw in self._files[input_file_id].splitlines():
+            req = json.loads(raw)
+            try:
+                args = self._respond(req["body"])
+            except Exception as e:
+                err_lines.append({"custom_id": req["custom_id"], "response": None,
+                                  "error": {"code": "fake_error", "message": str(e)}})
+                continue
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call-{req['custom_id']}", "type": "function",
+                "function": {"name": "set_labels", "arguments": json.dumps(args, ensure_ascii=False)},
+            }]}
+            out_lines.append({"custom_id": req["custom_id"], "error": None, "response": {
+                "status_code": 200, "body": {"choices": [{"index": 0, "message": message}]},
+            }})
+
+        batch_id = f"batch-{len(self._batches)}"
+        output_id = err_id = None
+        if out_lines:
+            output_id = f"file-{len(self._files)}"
+            self._files[output_id] = "\n".join(json.dumps(x, ensure_ascii=False) for x in out_lines)
+        if err_lines:
+            err_id = f"file-{len(self._files)}"
+            self._files[err_id] = "\n".join(json.dumps(x, ensure_ascii=False) for x in err_lines)
+        self._batches[batch_id] = {
+            "polls": 0, "output_file_id": output_id, "error_file_id": err_id,
+            "total": len(out_lines) + len(err_lines), "failed": len(err_lines), "created_at": time.time(),
+        }
+        return SimpleNamespace(id=batch_id, status="validating")
+
+    async def _retrieve_batch(self, batch_id: str) -> Any:
+        b = self._batches[batch_id]
+        b["polls"] += 1
+        done = b["polls"] > self._polls_until_done
+        counts = SimpleNamespace(total=b["total"], completed=b["total"] - b["failed"] if done else 0,
+                                 failed=b["failed"] if done else 0)
+        return SimpleNamespace(
+            id=batch_id,
+            status="completed" if done else "in_progress",
+            request_counts=counts,
+            output_file_id=b["output_file_id"] if done else None,
+            error_file_id=b["error_file_id"] if done else None,
+        )
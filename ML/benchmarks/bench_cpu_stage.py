@@ -0,0 +1,146 @@
+"""Scaling of the CPU stage (extraction, date parsing, matching) from 1 to N worker processes.
+
+Usage (from ML/):
+    python benchmarks/bench_cpu_stage.py CORPUS_DIR [--max-workers N] [--repeat N]
+    python benchmarks/bench_cpu_stage.py --synthetic N [--max-workers N]
+
+CORPUS_DIR holds recorded pages (*.html, see bench_extract.py --save). Each item is
+processed like a NewsAPI article: extract_article_text on the page, dateutil on its
+publication date and the London matcher on the extracted text. Results must equal the
+inline (1 worker) run. The async run maps in a worker thread, as the daemon's jobs do,
+and reports the longest event-loop stall while the stage is busy.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from dateutil import parser as dateparser
+
+from cpu_stage import CpuStage
+from extract import extract_article_text
+from cities import load_city
+
+LONDON = load_city("london")
+
+WORDS = "the a on in at was said local residents council week today after over police".split()
+
+
+def process(item):
+    html, pub_date = item
+    text = extract_article_text(html)
+    when = dateparser.parse(pub_date).isoformat()
+    hits = LONDON.find(text)
+    return len(text), when, sorted(hits["area"]), bool(hits["crime"])
+
+
+def synthetic(n, seed=0):
+    rng = random.Random(seed)
+    pages = []
+    for i in range(n):
+        paragraphs = []
+        for _ in range(rng.randint(8, 30)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(20, 60))]
+            words.insert(rng.randrange(len(words)), rng.choice(LONDON.areas))
+            if rng.random() < 0.5:
+                words.insert(rng.randrange(len(words)), rng.choice(LONDON.keywords["crime"]))
+            paragraphs.append(f"<p>{' '.join(words)}.</p>")
+        nav = "".join(f"<li><a href='/s/{j}'>Section {j}</a></li>" for j in range(40))
+        pages.append((f"page{i}.html", f"<html><head><script>var x={i};</script></head><body>"
+                      f"<nav><ul>{nav}</ul></nav><main><article>{''.join(paragraphs)}</article>"
+                      f"</main><footer><p>Footer {i}</p></footer></body></html>"))
+    return pages
+
+
+def load_corpus(corpus_dir):
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(corpus_dir, name), 'r', encoding='utf-8', errors='replace') as f:
+                pages.append((name, f.read()))
+    return pages
+
+
+def make_items(pages, repeat, seed=0):
+    rng = random.Random(seed)
+    formats = ["2025-10-{d:02d}T{h:02d}:15:00Z", "Sat, {d:02d} Oct 2025 {h:02d}:15:00 GMT", "October {d}, 2025 {h}:15"]
+    return [(html, rng.choice(formats).format(d=rng.randint(1, 28), h=rng.randint(0, 23)))
+            for _ in range(repeat) for _, html in pages]
+
+
+async def loop_stall(stage, items):
+    # longest gap between ticks of a 1 ms timer while the stage works
+    stall = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            stall = max(stall, now - last - 0.001)
+            last = now
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    # the daemon path: Job.call runs the scraper cycle (and its stage.map) off the loop
+    results = await asyncio.to_thread(lambda: list(stage.map(process, items)))
+    elapsed = time.perf_counter() - start
+    done = True
+    await tick
+    return results, elapsed, stall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus_dir', nargs='?')
+    parser.add_argument('--synthetic', type=int, default=0, help='generate N pages instead of a corpus')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus_dir) if args.corpus_dir else synthetic(args.synthetic or 500)
+    if not pages:
+        print(f"No .html files in {args.corpus_dir}")
+        return
+    items = make_items(pages, args.repeat)
+    total_mb = sum(len(html.encode('utf-8')) for html, _ in items) / 1e6
+    print(f"{len(items)} items, {total_mb:.1f} MB, {os.cpu_count()} CPUs\n")
+
+    reference = None
+    base_rate = None
+    print(f"{'workers':>7} {'items/s':>9} {'MB/s':>7} {'speedup':>8} {'parity':>8}")
+    workers = 1
+    while True:
+        stage = CpuStage(workers)
+        list(stage.map(process, items[:stage.workers * stage.chunk_size]))  # start the worker processes
+        start = time.perf_counter()
+        results = list(stage.map(process, items))
+        elapsed = time.perf_counter() - start
+        stage.close()
+
+        reference = reference or results
+        rate = len(items) / elapsed
+        base_rate = base_rate or rate
+        same = sum(1 for a, b in zip(results, reference) if a == b)
+        print(f"{workers:>7} {rate:>9.1f} {total_mb / elapsed:>7.2f} {rate / base_rate:>7.2f}x {same:>4}/{len(items)}")
+        if workers >= args.max_workers:
+            break
+        workers = min(workers * 2, args.max_workers)
+
+    stage = CpuStage(args.max_workers)
+    list(stage.map(process, items[:stage.workers * stage.chunk_size]))
+    results, elapsed, stall = asyncio.run(loop_stall(stage, items))
+    stage.close()
+    same = sum(1 for a, b in zip(results, reference) if a == b)
+    print(f"\nasync (map in a job thread), {args.max_workers} workers: {len(items) / elapsed:.1f} items/s, "
+          f"longest event-loop stall {stall * 1000:.1f} ms, parity {same}/{len(items)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Throughput and output parity of the article extraction backends.
+
+Usage (from ML/):
+    python benchmarks/bench_extract.py CORPUS_DIR [--repeat N]
+    python benchmarks/bench_extract.py CORPUS_DIR --save URL [URL ...]
+
+CORPUS_DIR holds saved pages (*.html). Every backend is compared against the
+original multi-pass BeautifulSoup implementation below.
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import requests
+from bs4 import BeautifulSoup
+
+from extract import BACKENDS
+from fetcher import USER_AGENT
+
+
+def legacy_extract(html):
+    """The pre-backend implementation (three find_all('p') passes), kept as the reference"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe']):
+        element.decompose()
+
+    content = ""
+    article = soup.find('article')
+    if article:
+        paragraphs = article.find_all('p')
+        content = ' '.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
+    if not content or len(content) < 200:
+        main = soup.find('main')
+        if main:
+            paragraphs = main.find_all('p')
+            content = ' '.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
+    if not content or len(content) < 200:
+        paragraphs = soup.find_all('p')
+        content = ' '.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
+
+    content = ' '.join(content.split())
+    return content if len(content) > 100 else ""
+
+
+def save_pages(corpus_dir, urls):
+    os.makedirs(corpus_dir, exist_ok=True)
+    for url in urls:
+        try:
+            response = requests.get(url, headers={'User-Agent': USER_AGENT}, timeout=15)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"Could not fetch {url}: {e}")
+            continue
+        name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + '.html'
+        with open(os.path.join(corpus_dir, name), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"Saved {url} -> {name}")
+
+
+def load_corpus(corpus_dir):
+    pages = []
+    for name in sorted(os.listdir(corpus_dir)):
+        if name.endswith(('.html', '.htm')):
+            with open(os.path.join(corpus_dir, name), 'r', encoding='utf-8', errors='replace') as f:
+                pages.append((name, f.read()))
+    return pages
+
+
+def run(fn, pages, repeat):
+    outputs = [fn(html) for _, html in pages]  # warm-up, also the parity sample
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for _, html in pages:
+            fn(html)
+    elapsed = time.perf_counter() - start
+    return outputs, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('corpus_dir')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', nargs='+', metavar='URL', help='Download pages into the corpus and exit')
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.corpus_dir, args.save)
+        return
+
+    pages = load_corpus(args.corpus_dir)
+    if not pages:
+        print(f"No .html files in {args.corpus_dir}")
+        return
+    total_mb = sum(len(html.encode('utf-8')) for _, html in pages) / 1e6
+    print(f"Corpus: {len(pages)} pages, {total_mb:.1f} MB, {args.repeat} repeats\n")
+
+    reference, ref_time = run(legacy_extract, pages, args.repeat)
+    ref_rate = len(pages) * args.repeat / ref_time
+    print(f"{'backend':<12} {'pages/s':>9} {'MB/s':>8} {'speedup':>8} {'parity':>8}")
+    print(f"{'legacy':<12} {ref_rate:>9.1f} {total_mb * args.repeat / ref_time:>8.2f} {1.0:>7.2f}x {'-':>8}")
+
+    for name, fn in BACKENDS.items():
+        outputs, elapsed = run(fn, pages, args.repeat)
+        rate = len(pages) * args.repeat / elapsed
+        same = sum(1 for a, b in zip(outputs, reference) if a == b)
+        print(f"{name:<12} {rate:>9.1f} {total_mb * args.repeat / elapsed:>8.2f} {rate / ref_rate:>7.2f}x {same:>4}/{len(pages):<3}")
+        for (page, _), a, b in zip(pages, outputs, reference):
+            if a != b:
+                print(f"    differs: {page} ({len(a)} vs {len(b)} chars)")
+
+
+if __name__ == '__main__':
+    main()
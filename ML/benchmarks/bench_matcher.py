@@ -0,0 +1,137 @@
+"""Microbenchmark: compiled TermMatcher vs. the previous linear keyword/area scans.
+
+Usage (from ML/):
+    python benchmarks/bench_matcher.py [--texts N] [--words N]
+
+Texts are synthetic (filler words mixed with keywords and London areas). The compiled
+matcher must agree exactly with a slow per-term word-boundary reference (asserted). The
+old substring checks are timed too; their disagreements are expected and only counted:
+they matched inside words ("Bow" in "elbow", the FILLER trap words), and tweets are now
+located with the whole London gazetteer (cities/london.json) instead of the old short list.
+"""
+import os
+import sys
+import time
+import re
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from cities import load_city
+from x_scraper import TweetAnalyzer
+
+LONDON = load_city("london")
+# city matchers compile on first use; do it here, outside the timed runs
+LONDON.matcher()
+LONDON.matcher(LONDON.x["keywords"])
+KEYWORDS_CRIME = LONDON.keywords["crime"]
+LONDON_AREAS = LONDON.areas
+
+FILLER = (
+    "the a police said on in at was were man woman near station street road after before "
+    "night morning officers appeal witnesses hospital elbow studied banking skewer bowl "
+    "about their there which would could people public government minister council year"
+).split()
+KEYWORD_RATE = 0.03  # share of words drawn from the keyword/area lists
+
+
+# Previous implementations, reproduced for comparison
+LONDON_KEYWORDS = [
+    'london', 'londyn', 'westminster', 'tower bridge', 'piccadilly',
+    'camden', 'shoreditch', 'brixton', 'soho', 'covent garden',
+    'kensington', 'chelsea', 'hackney', 'islington', 'greenwich',
+    'canary wharf', 'city of london', 'big ben', 'trafalgar square'
+]
+
+def legacy_london(text):
+    lowered = text.lower()
+    is_crime = any(word in lowered for word in KEYWORDS_CRIME)
+    found = [area for area in LONDON_AREAS if area.lower() in lowered]
+    in_london = "london" in lowered or bool(found)
+    # process_articles scanned the areas a second time on the article context
+    matched = sorted({area for area in LONDON_AREAS if area.lower() in lowered})
+    return is_crime, in_london, matched
+
+
+def legacy_tweet(text):
+    def contains_keywords(text, keywords):
+        text_lower = text.lower()
+        return any(keyword.lower() in text_lower for keyword in keywords)
+    return (contains_keywords(text, LONDON.x["keywords"]["crime"]),
+            contains_keywords(text, LONDON.x["keywords"]["protest"]),
+            contains_keywords(text, LONDON_KEYWORDS))
+
+
+# Reference semantics, one regex search per term: terms start on a word boundary,
+# place names (areas, city names) also end on one, keyword stems may carry a suffix
+def _reference_hits(text, terms, whole_word):
+    lowered = text.lower()
+    tail = r'\b' if whole_word else ''
+    return {t for t in terms if re.search(r'\b' + re.escape(t.lower()) + tail, lowered)}
+
+
+def reference_london(text):
+    areas = _reference_hits(text, LONDON_AREAS, True)
+    is_crime = bool(_reference_hits(text, KEYWORDS_CRIME, False))
+    return is_crime, bool(areas or _reference_hits(text, LONDON.names, True)), sorted(areas)
+
+
+def reference_tweet(text):
+    keywords = LONDON.x["keywords"]
+    places = _reference_hits(text, LONDON_AREAS + LONDON.names, True)
+    return (bool(_reference_hits(text, keywords["crime"], False)),
+            bool(_reference_hits(text, keywords["protest"], False)), bool(places))
+
+
+def compiled_london(text):
+    hits = LONDON.find(text)
+    return bool(hits["crime"]), bool(hits["city"] or hits["area"]), sorted(hits["area"])
+
+
+def compiled_tweet(text):
+    return TweetAnalyzer.analyze(text, LONDON)
+
+
+def make_texts(n, words, seed=0):
+    rng = random.Random(seed)
+    terms = KEYWORDS_CRIME + LONDON_AREAS + ["London"] + LONDON.x["keywords"]["protest"]
+    return [
+        ' '.join(rng.choice(terms) if rng.random() < KEYWORD_RATE else rng.choice(FILLER) for _ in range(words))
+        for _ in range(n)
+    ]
+
+
+def bench(name, fn, texts):
+    start = time.perf_counter()
+    results = [fn(t) for t in texts]
+    elapsed = time.perf_counter() - start
+    print(f"{name:<18} {len(texts) / elapsed:>10.0f} texts/s  ({elapsed * 1000:.1f} ms)")
+    return results, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--texts', type=int, default=5000)
+    parser.add_argument('--words', type=int, default=120)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.words)
+    tweets = [t[:280] for t in texts]
+    print(f"{args.texts} texts x {args.words} words\n")
+
+    for kind, items, legacy, reference, compiled in (
+            ("london", texts, legacy_london, reference_london, compiled_london),
+            ("tweets", tweets, legacy_tweet, reference_tweet, compiled_tweet)):
+        old, t_old = bench(f"legacy {kind}", legacy, items)
+        new, t_new = bench(f"compiled {kind}", compiled, items)
+        expected = [reference(t) for t in items]
+        mismatches = [t for t, a, b in zip(items, new, expected) if a != b]
+        assert not mismatches, f"{kind}: {len(mismatches)} texts differ from the reference, e.g. {mismatches[0][:200]!r}"
+        differs = sum(1 for a, b in zip(old, new) if a != b)
+        print(f"  speedup {t_old / t_new:.1f}x, matches the word-boundary reference on {len(items)}/{len(items)}; "
+              f"substring baseline differs on {differs} (expected)\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Local prefilter: scoring throughput and API calls avoided at a fixed recall.
+
+Usage (from ML/):
+    python benchmarks/bench_prefilter.py LABELED.jsonl [...] [--recall R]
+    python benchmarks/bench_prefilter.py --synthetic N [--recall R]
+
+Trains on 80% of the labeled results (main.py --stream/--follow output) and
+evaluates on the rest. --synthetic generates incident stories next to obituaries,
+court reports and sports news that share their keywords ("died", "police", "arrest").
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prefilter import TARGET_RECALL, load_examples, train
+
+PLACES = ["Brixton", "Camden", "Hackney", "Croydon", "Soho", "Peckham", "Stratford", "Westminster"]
+INCIDENT = [
+    "Man stabbed near {p} station, police appeal for witnesses",
+    "Shooting in {p}: two injured, armed police at the scene",
+    "Robbery at a shop in {p}, suspect fled on a moped",
+    "Protest blocks roads in {p}, several arrests made by police",
+    "Woman dies after attack in {p} park, murder investigation launched",
+    "Road closed in {p} after serious assault overnight",
+]
+OTHER = [
+    "Tributes paid to {p} teacher who died peacefully aged 92",
+    "Court hears fraud case from 2019, former {p} councillor sentenced",
+    "{p} FC striker arrested for dangerous tackle? Police say no action",
+    "Police charity run through {p} raises thousands",
+    "Obituary: {p} musician dead at 80 after long illness",
+    "Review: new crime drama filmed in {p} is a gripping watch",
+]
+FILLER = "the a on in at was said local residents council week today after over".split()
+
+
+def synthetic(n, seed=0):
+    rng = random.Random(seed)
+    examples = []
+    for i in range(n):
+        incident = rng.random() < 0.4
+        title = rng.choice(INCIDENT if incident else OTHER).format(p=rng.choice(PLACES))
+        body = ' '.join(rng.choice(FILLER) for _ in range(40))
+        level = rng.randint(2, 5) if incident else 1
+        if rng.random() < 0.03:  # szum etykiet jak w prawdziwych wynikach
+            level = 1 if incident else rng.randint(2, 3)
+        examples.append(({"url": f"https://example.com/{i}", "title": title, "context": body}, level))
+    return examples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('labeled', nargs='*')
+    parser.add_argument('--synthetic', type=int, default=0)
+    parser.add_argument('--recall', type=float, default=TARGET_RECALL)
+    args = parser.parse_args()
+
+    if args.labeled:
+        examples = [ex for path in args.labeled for ex in load_examples(path)]
+    else:
+        examples = synthetic(args.synthetic or 5000)
+    print(f"{len(examples)} labeled examples, target recall {args.recall}\n")
+
+    start = time.perf_counter()
+    model = train(examples, args.recall)
+    t_train = time.perf_counter() - start
+
+    entries = [e for e, _ in examples]
+    start = time.perf_counter()
+    model.score_batch(entries)
+    t_score = time.perf_counter() - start
+
+    m = model.metrics
+    print(f"train      {m['train']} examples in {t_train:.1f}s")
+    print(f"scoring    {len(entries) / t_score:.0f} items/s")
+    print(f"threshold  {model.threshold:.3f}")
+    print(f"holdout    recall {m['recall']:.3f}, precision {m['precision']:.3f}, level MAE {m['level_mae']:.2f}")
+    print(f"avoided    {m['avoided']:.1%} of LLM calls")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Per-item post_validate vs. the batch validator on synthetic labels.
+
+Usage (from ML/):
+    python benchmarks/bench_validation.py [--labels N] [--places N]
+
+Labels mix specific and generic places, valid and malformed dates and
+out-of-range or non-numeric scales. Both paths must produce identical labels.
+"""
+import os
+import sys
+import copy
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from validation import post_validate, validate_batch
+
+PLACES = [
+    "Parliament Square, Westminster, London, UK",
+    "Rue de Rivoli, 1er arrondissement, Paris",
+    "10 Downing Street, London",
+    "Brixton station, Lambeth, London",
+    "Gare du Nord, Paris",
+    "Camden High St / Parkway, Camden",
+    "Hyde Park, London",
+    "Westminster, London",
+    "Shoreditch (oszacowano)",
+    "Paris", "France", "Warszawa", "UK", "", None,
+    "Place de la République, 11e arr.",
+    "Trafalgar Square",
+]
+DATES = [
+    "2025-10-04T12:00:00+01:00", "2025-10-04T12:00Z", "2025-10-04T12:00:00.123Z",
+    "2025-10-04 12:00", "2025-10-04", "04/10/2025", "nieznana", None, 1759579200,
+]
+SCALES = [1, 2, 3, 4, 5, 0, 7, "3", "4.5", 2.7, None, "wysoki", True]
+
+
+def make_labels(n, places, seed=0):
+    rng = random.Random(seed)
+    # część miejsc unikalna (warianty z numerem/dzielnicą), reszta się powtarza jak w realnych danych
+    pool = PLACES + [f"{rng.choice(PLACES[:8]) or 'Street'} {i}" if i % 2 else f"Borough {i}"
+                     for i in range(places)]
+    entries, labels = [], []
+    for i in range(n):
+        entries.append({"url": f"https://example.com/{i}"})
+        labels.append({
+            "miejsce": rng.choice(pool),
+            "data": rng.choice(DATES),
+            "szacowany_czas_zakonczenia": "2025-10-04T15:00:00+01:00",
+            "poziom_zagrozenia": rng.choice(SCALES),
+            "komfort": rng.choice(SCALES),
+            "podsumowanie": "Incydent",
+            "adres_url": "" if i % 10 == 0 else f"https://example.com/{i}",
+        })
+    return entries, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--labels', type=int, default=100_000)
+    parser.add_argument('--places', type=int, default=20_000, help='distinct generated place names')
+    args = parser.parse_args()
+
+    entries, labels = make_labels(args.labels, args.places)
+    per_item = copy.deepcopy(labels)
+    batch = copy.deepcopy(labels)
+    print(f"{args.labels} labels, ~{args.places + len(PLACES)} distinct places\n")
+
+    start = time.perf_counter()
+    for entry, lab in zip(entries, per_item):
+        post_validate(entry, lab)
+    t_item = time.perf_counter() - start
+
+    start = time.perf_counter()
+    validate_batch(entries, batch)
+    t_batch = time.perf_counter() - start
+
+    same = sum(1 for a, b in zip(per_item, batch) if a == b)
+    print(f"{'per-item':<10} {args.labels / t_item:>12.0f} labels/s  ({t_item * 1000:.0f} ms)")
+    print(f"{'batch':<10} {args.labels / t_batch:>12.0f} labels/s  ({t_batch * 1000:.0f} ms)")
+    print(f"  speedup {t_item / t_batch:.1f}x, identical labels {same}/{args.labels}")
+
+
+if __name__ == '__main__':
+    main()
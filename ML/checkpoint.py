@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+# --------------------------- Wpis ---------------------------
+
+def _first(item: Dict[str, Any], *keys: str) -> Optional[Any]:
+    for key in keys:
+        if item.get(key) is not None:
+            return item[key]
+    return None
+
+def to_entry(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Wpis scrapera -> wejście etykietowania (tytul/tresc/czy_demonstracja/czy_przestepstwo).
+
+    Scrapery NewsAPI i X zapisują title/context oraz crime/demonstration, Google News –
+    title/context oraz czy_*; pozostałe pola (url, data, ...) zostają bez zmian.
+    """
+    entry = dict(item)
+    entry["tytul"] = item.get("tytul") or item.get("title") or ""
+    entry["tresc"] = item.get("tresc") or item.get("context") or ""
+    entry["czy_demonstracja"] = _first(item, "czy_demonstracja", "demonstration")
+    entry["czy_przestepstwo"] = _first(item, "czy_przestepstwo", "crime")
+    return entry
+
+
+def entry_key(entry: Dict[str, Any]) -> str:
+    # URL identyfikuje wpis; bez URL – skrót treści wpisu
+    url = entry.get("url")
+    if url:
+        return url
+    raw = json.dumps(entry, sort_keys=True, ensure_ascii=False)
+    return "sha256:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def to_legacy(res: Dict[str, Any]) -> Dict[str, Any]:
+    # dotychczasowy układ pliku wyjściowego (tylko labels, błąd jako labels.error)
+    if res.get("labels") is not None:
+        return {"labels": res["labels"]}
+    return {"labels": {"error": res.get("error")}}
+
+# --------------------------- Odczyt / zapis ---------------------------
+
+def load_checkpoint(path: str) -> Dict[str, Dict[str, Any]]:
+    """Ostatni zapisany wynik dla każdego wpisu (w kolejności pierwszego wystąpienia)."""
+    done: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                res = json.loads(line)
+            except json.JSONDecodeError:
+                # urwana ostatnia linia po awarii – wpis zostanie ponowiony
+                continue
+            done[entry_key(res.get("wejscie") or {})] = res
+    return done
+
+class CheckpointWriter:
+    """Dopisuje każdy wynik jako osobną linię JSONL zaraz po jego otrzymaniu."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.f = open(path, "a", encoding="utf-8")
+        # po awarii ostatnia linia może być urwana – zacznij od nowej linii
+        if self.f.tell() > 0:
+            with open(path, "rb") as tail:
+                tail.seek(-1, os.SEEK_END)
+                if tail.read(1) != b"\n":
+                    self.f.write("\n")
+
+    def write(self, res: Dict[str, Any]) -> None:
+        self.f.write(json.dumps(res, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def close(self) -> None:
+        self.f.close()
+
+# --------------------------- Kompaktowanie ---------------------------
+
+def compact(jsonl_path: str, json_path: str) -> int:
+    # JSONL -> dawna tablica JSON (np. dla frontend/data.json); zapis atomowy
+    out: List[Dict[str, Any]] = [to_legacy(r) for r in load_checkpoint(jsonl_path).values()]
+    os.makedirs(os.path.dirname(json_path) or ".", exist_ok=True)
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(out, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, json_path)
+    return len(out)
@@ -0,0 +1,257 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import functools
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import requests
+
+import scrape_london_danger
+import google_news_scraper
+import x_scraper
+from incident_store import IncidentStore, DB_FILE, backpressure_delay
+from fetcher import PoliteFetcher
+from http_cache import HttpCache
+from cpu_stage import CpuStage
+from cities import City, city_names, load_cities
+from checkpoint import to_entry
+
+# --------------------------- Konfiguracja ---------------------------
+
+JITTER = 0.1  # losowe przesunięcie kolejnego cyklu: ±10% interwału (źródła nie startują razem)
+X_INTERVAL = 15 * 60
+X_MAX_TWEETS_PER_USER = 80
+# kolejka do etykietowania: pełna wstrzymuje źródła, zapełniona ponad 1/4 wydłuża ich interwały
+QUEUE_SIZE = 64
+SETUP_RETRY_MAX = 30 * 60  # górny limit odstępu między kolejnymi próbami uruchomienia źródła
+
+# --------------------------- Źródła ---------------------------
+# Źródła opisują konfiguracje miast (cities/<miasto>.json): zapytanie NewsAPI, kanały RSS,
+# konta X. Każde źródło każdego miasta to osobne zadanie; wszystkie dzielą jeden etap CPU,
+# a skompilowane dopasowania są wspólne dla miast o tych samych listach słów.
+# Każda funkcja otwiera zasoby źródła i zwraca (cykl, zamknięcie, interwał); cykl zwraca
+# nowo zapisane wpisy, interwał (lub None – stały z SOURCES) podaje czas do kolejnego cyklu. Obie wołane są zawsze w wątku zadania (połączenia SQLite i sesje
+# przeglądarki nie mogą zmieniać wątku). Parsowanie, ekstrakcja i dopasowania idą do
+# wspólnego etapu CPU (pula procesów), więc nie trzymają GIL-a pętli etykietowania.
+
+Cycle = Callable[[], List[Dict[str, Any]]]
+Source = Tuple[Cycle, Callable[[], None], Optional[Callable[[], float]]]
+
+def newsapi_source(city: City, stage: CpuStage) -> Source:
+    store = IncidentStore(DB_FILE)
+    fetcher = PoliteFetcher()
+    cache = HttpCache()
+    # planer NewsAPI: stronicowanie, podział zapytań wg dzielnic, dzienny limit i interwał wg napływu artykułów
+    planner = scrape_london_danger.make_planner(city)
+    last_saved_ts = scrape_london_danger.load_last_state(city)
+
+    def cycle() -> List[Dict[str, Any]]:
+        nonlocal last_saved_ts
+        new_items, last_saved_ts = scrape_london_danger.run_cycle(store, fetcher, cache, last_saved_ts, stage,
+                                                                   planner, city)
+        return new_items
+
+    def close() -> None:
+        planner.close()
+        fetcher.close()
+        cache.close()
+        store.close()
+
+    return cycle, close, planner.next_interval
+
+def feed_source(city: City, feed: Dict[str, str], stage: CpuStage) -> Source:
+    store = IncidentStore(DB_FILE)
+    session = requests.Session()
+    cache = HttpCache()
+    last_saved_ts = google_news_scraper.load_last_state(city, feed["source"])
+
+    def cycle() -> List[Dict[str, Any]]:
+        nonlocal last_saved_ts
+        new_items, last_saved_ts = google_news_scraper.run_cycle(store, session, cache, last_saved_ts, stage,
+                                                                  city, feed)
+        return new_items
+
+    def close() -> None:
+        session.close()
+        cache.close()
+        store.close()
+
+    return cycle, close, None
+
+def x_source(city: City, stage: CpuStage) -> Source:
+    # tekst tweetów wyciąga przeglądarka, słowa kluczowe są tanie – etap CPU nieużywany
+    store = IncidentStore(DB_FILE)
+    accounts = city.x["accounts"]
+    pool = x_scraper.BrowserPool(min(x_scraper.BROWSER_WORKERS, len(accounts)) or 1)
+    base_url = os.getenv("X_BASE_URL", x_scraper.BASE_URL)
+
+    def cycle() -> List[Dict[str, Any]]:
+        return x_scraper.scrape_cycle(accounts, store, X_MAX_TWEETS_PER_USER, pool, base_url,
+                                      city=city)
+
+    def close() -> None:
+        pool.close()
+        store.close()
+
+    return cycle, close, None
+
+# rodzaj źródła -> interwał; które rodzaje ma miasto, mówi jego konfiguracja
+SOURCES = {
+    "newsapi": scrape_london_danger.CHECK_INTERVAL,
+    "feeds": google_news_scraper.CHECK_INTERVAL,
+    "x": X_INTERVAL,
+}
+
+def city_jobs(city: City, kinds: List[str], stage: CpuStage) -> List[Tuple[str, Callable[[], Source], float]]:
+    """(nazwa, setup, interwał) dla źródeł miasta wybranych rodzajów; nazwa to "miasto:źródło"."""
+    jobs = []
+    if "newsapi" in kinds and city.newsapi:
+        jobs.append((f"{city.name}:{city.newsapi['source']}",
+                     functools.partial(newsapi_source, city, stage), SOURCES["newsapi"]))
+    if "feeds" in kinds:
+        for feed in city.feeds:
+            jobs.append((f"{city.name}:{feed['source']}",
+                         functools.partial(feed_source, city, feed, stage), SOURCES["feeds"]))
+    if "x" in kinds and city.x:
+        jobs.append((f"{city.name}:{city.x['source']}",
+                     functools.partial(x_source, city, stage), SOURCES["x"]))
+    return jobs
+
+# --------------------------- Zadania ---------------------------
+
+class Job:
+    """Źródło uruchamiane co interval (lub interwał podany przez źródło) ± jitter we własnym, jednym wątku."""
+
+    def __init__(self, name: str, setup: Callable[[], Source],
+                 interval: float, jitter: float = JITTER):
+        self.name = name
+        self.setup = setup
+        self.interval = interval
+        self.jitter = jitter
+        self.cycles = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    async def call(self, fn: Callable[[], Any]) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn)
+
+    def next_delay(self, interval: Optional[Callable[[], float]] = None) -> float:
+        base = interval() if interval else self.interval
+        return base * (1 + random.uniform(-self.jitter, self.jitter))
+
+    async def start(self, once: bool = False) -> Optional[Source]:
+        """Uruchamia źródło; po błędzie ponawia z rosnącym odstępem (None, gdy once i się nie udało)."""
+        delay = self.next_delay()
+        while True:
+            try:
+                return await self.call(self.setup)
+            except Exception as e:
+                # np. BrowserPool bez Chrome'a: to źródło czeka, pozostałe działają dalej
+                print(f"[{self.name}] błąd uruchomienia: {e}")
+                traceback.print_exc()
+                if once:
+                    return None
+                print(f"[{self.name}] kolejna próba za {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, SETUP_RETRY_MAX)
+
+    async def run(self, queue: Optional[asyncio.Queue], once: bool = False) -> None:
+        source = await self.start(once)
+        if source is None:
+            self.executor.shutdown(wait=False)
+            return
+        cycle, close, interval = source
+        try:
+            while True:
+                self.cycles += 1
+                started = time.monotonic()
+                try:
+                    new_items = await self.call(cycle)
+                except Exception as e:
+                    # błąd jednego cyklu nie zatrzymuje źródła ani pozostałych zadań
+                    print(f"[{self.name}] błąd cyklu {self.cycles}: {e}")
+                    traceback.print_exc()
+                    new_items = []
+                print(f"[{self.name}] cykl {self.cycles}: {len(new_items)} nowych wpisów "
+                      f"w {time.monotonic() - started:.1f}s")
+                delay = self.next_delay(interval)
+                if queue is not None:
+                    for item in new_items:
+                        await queue.put(to_entry(item))  # czeka, gdy etykietowanie nie nadąża
+                    delay = backpressure_delay(delay, queue.qsize(), target=QUEUE_SIZE // 4)
+                if once:
+                    break
+                await asyncio.sleep(delay)
+        finally:
+            await self.call(close)
+            self.executor.shutdown(wait=False)
+
+# --------------------------- Main ---------------------------
+
+async def run(args: argparse.Namespace) -> None:
+    stage = CpuStage()
+    jobs = [Job(name, setup, interval)
+            for city in load_cities(args.cities)
+            for name, setup, interval in city_jobs(city, args.sources, stage)]
+    if not jobs:
+        print("Brak źródeł do uruchomienia dla wybranych miast")
+        stage.close()
+        return
+
+    queue: Optional[asyncio.Queue] = None
+    consumer = None
+    if not args.no_label:
+        # etykietowanie w tym samym procesie: nowe wpisy trafiają do kolejki, nie do pliku
+        import main as labeling
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        cache = None if args.no_cache else labeling.open_cache()
+        geocoder = None if args.no_geocode else labeling.open_geocoder()
+        writer = labeling.CheckpointWriter(labeling.OUTPUT_JSONL_PATH)
+        consumer = asyncio.create_task(
+            labeling.label_queue(queue, writer, cache, labeling.make_limiter(), geocoder=geocoder))
+        print(f"Etykiety dopisywane do {labeling.OUTPUT_JSONL_PATH}")
+
+    try:
+        await asyncio.gather(*(job.run(queue, args.once) for job in jobs))
+    finally:
+        stage.close()
+        if consumer is not None:
+            await queue.put(None)
+            try:
+                print(f"Zaetykietowano {await consumer} wpisów")
+            finally:
+                writer.close()
+                if cache is not None:
+                    print(cache.stats())
+                    cache.close()
+                if geocoder is not None:
+                    print(geocoder.cache.stats())
+                    geocoder.close()
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Demon: wszystkie źródła w jednym procesie, nowe wpisy od razu do etykietowania.")
+    parser.add_argument("--cities", nargs="+", choices=city_names(), default=None,
+                        help="Miasta z cities/*.json (domyślnie wszystkie).")
+    parser.add_argument("--sources", nargs="+", choices=sorted(SOURCES), default=sorted(SOURCES),
+                        help="Rodzaje uruchamianych źródeł (domyślnie wszystkie, jakie ma miasto).")
+    parser.add_argument("--once", action="store_true",
+                        help="Jeden cykl każdego źródła, dokończ etykietowanie i zakończ.")
+    parser.add_argument("--no-label", action="store_true",
+                        help="Tylko zbieranie do bazy incydentów, bez etykietowania.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Nie korzystaj z cache odpowiedzi (zawsze pytaj API).")
+    parser.add_argument("--no-geocode", action="store_true",
+                        help="Nie dodawaj współrzędnych (lat/lon) do etykiet.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run(parse_args()))
+    except KeyboardInterrupt:
+        print("Zatrzymano demona")
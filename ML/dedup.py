@@ -0,0 +1,156 @@
+import re
+import struct
+import hashlib
+import operator
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+from checkpoint import to_entry
+
+# MinHash + LSH: 32 pasma po 2 wiersze – pary o podobieństwie Jaccarda ~0.3+
+# trafiają do wspólnego kubełka z dużym prawdopodobieństwem
+NUM_PERM = 64
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 2
+# ile początkowych słów tekstu porównywać (pełne artykuły vs. skróty z API/tweetów)
+MAX_WORDS = 400
+# niski próg: ten sam incydent opisany własnymi słowami przez różne źródła ma na bigramach
+# podobieństwo ~0.3–0.4 (niepowiązane wpisy ~0.1). Różne incydenty z tego samego szablonu
+# („...stabbed in Brixton” / „...stabbed in Peckham”) odsiewa same_incident, nie próg.
+THRESHOLD = 0.3
+# jaka część nazw własnych/liczb krótszego wpisu musi wystąpić też w drugim
+MIN_SHARED_SPECIFICS = 0.5
+# wpisy opublikowane dalej od siebie niż to (s) nie są tym samym incydentem
+MAX_DATE_GAP = 2 * 24 * 60 * 60
+
+# każdy 64-bajtowy skrót blake2b daje 32 niezależne 16-bitowe „permutacje”
+_HALF = struct.Struct("<32H").unpack
+_WORD_RE = re.compile(r"\w+")
+_SENTENCE_RE = re.compile(r"[.!?]+\s+|\n+")
+
+# --------------------------- Tekst wpisu ---------------------------
+
+def entry_text(entry: Dict[str, Any]) -> str:
+    # wpisy ze scraperów (title/context) i wejście etykietowania (tytul/tresc)
+    entry = to_entry(entry)
+    return f"{entry['tytul']} {entry['tresc']}"
+
+Specifics = Dict[str, Set[Tuple[str, str]]]
+
+def specifics(entry: Dict[str, Any]) -> Specifics:
+    """Nazwy własne i liczby wpisu (miejsca, daty, godziny, wiek) z ich otoczeniem.
+
+    Pierwsze słowo zdania (tytułu) pomijamy – wielka litera z definicji – chyba że zawiera
+    cyfrę. Otoczenie to poprzednie („<”) i następne („>”) słowo każdego wystąpienia.
+    """
+    entry = to_entry(entry)
+    found: Specifics = defaultdict(set)
+    for part in (entry["tytul"], entry["tresc"]):
+        for sentence in _SENTENCE_RE.split(part):
+            words = _WORD_RE.findall(sentence)
+            for i, word in enumerate(words):
+                if any(c.isdigit() for c in word) or (i > 0 and word[0].isupper()):
+                    slots = found[word.lower()]
+                    if i > 0:
+                        slots.add(("<", words[i - 1].lower()))
+                    if i + 1 < len(words):
+                        slots.add((">", words[i + 1].lower()))
+    return found
+
+def same_incident(entry: Dict[str, Any], rep: Dict[str, Any],
+                  entry_specifics: Specifics, rep_specifics: Specifics) -> bool:
+    # przepisana relacja wnosi własne szczegóły („Metropolitan Police”), ale większość nazw
+    # i liczb musi się powtarzać; inna wartość w tym samym miejscu zdania („stabbed in
+    # Brixton” / „stabbed in Peckham”, „Covent Garden, London” / „Castle, London”)
+    # oznacza inny incydent z tego samego szablonu
+    shared = entry_specifics.keys() & rep_specifics.keys()
+    if len(shared) < MIN_SHARED_SPECIFICS * min(len(entry_specifics), len(rep_specifics)):
+        return False
+    own = {ctx for word in entry_specifics.keys() - shared for ctx in entry_specifics[word]}
+    if any(ctx in own for word in rep_specifics.keys() - shared for ctx in rep_specifics[word]):
+        return False
+    ts, rep_ts = entry.get("data_ts"), rep.get("data_ts")
+    return ts is None or rep_ts is None or abs(ts - rep_ts) <= MAX_DATE_GAP
+
+def shingles(text: str) -> Set[bytes]:
+    words = _WORD_RE.findall(text.lower())[:MAX_WORDS]
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words).encode("utf-8")}
+    return {
+        " ".join(words[i:i + SHINGLE_SIZE]).encode("utf-8")
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+def _hashes(shingle: bytes) -> tuple:
+    return (_HALF(hashlib.blake2b(shingle, digest_size=64).digest())
+            + _HALF(hashlib.blake2b(shingle, digest_size=64, person=b"minhash-2").digest()))
+
+def minhash(sh: Iterable[bytes]) -> List[int]:
+    # minimum w każdej kolumnie liczone w C (zip/min) zamiast 64 pętli w Pythonie
+    return list(map(min, zip(*map(_hashes, sh))))
+
+def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    # estymata podobieństwa Jaccarda z sygnatur (porównania w C – par-kandydatów jest dużo)
+    return sum(map(operator.eq, sig_a, sig_b)) / NUM_PERM
+
+# --------------------------- Klastrowanie ---------------------------
+
+def cluster_entries(entries: List[Dict[str, Any]], threshold: float = THRESHOLD) -> List[List[Dict[str, Any]]]:
+    """Grupuje prawie-duplikaty; pierwszy element klastra to reprezentant (najdłuższy tekst).
+
+    Podobny tekst to za mało: do klastra trafia tylko wpis zgodny z reprezentantem według
+    same_incident (wspólne nazwy własne i liczby, żadna inna wartość w tym samym miejscu
+    zdania, bliskie daty) – inaczej jest etykietowany osobno.
+    """
+    sigs = [minhash(shingles(entry_text(e))) for e in entries]
+    specs = [specifics(e) for e in entries]
+
+    parent = list(range(len(entries)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # kandydaci tylko z tych samych kubełków LSH – bez porównań każdy z każdym
+    buckets: Dict[tuple, List[int]] = defaultdict(list)
+    for i, sig in enumerate(sigs):
+        keys = [(band, *sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+        # para trafia razem do wielu pasm – każdy kandydat sprawdzany raz
+        for j in set().union(*(buckets[key] for key in keys)):
+            ri, rj = find(i), find(j)
+            if ri != rj and similarity(sig, sigs[j]) >= threshold \
+                    and same_incident(entries[i], entries[j], specs[i], specs[j]):
+                parent[ri] = rj
+        for key in keys:
+            buckets[key].append(i)
+
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for i in range(len(entries)):
+        groups[find(i)].append(i)
+
+    clusters = []
+    for members in groups.values():
+        members.sort(key=lambda i: len(entry_text(entries[i])), reverse=True)
+        rep = members[0]
+        cluster = [entries[rep]]
+        for i in members[1:]:
+            # łańcuch podobnych par może połączyć różne incydenty – sprawdzamy względem reprezentanta
+            if same_incident(entries[i], entries[rep], specs[i], specs[rep]):
+                cluster.append(entries[i])
+            else:
+                clusters.append([entries[i]])
+        clusters.append(cluster)
+    return clusters
+
+def fan_out(res: Dict[str, Any], member: Dict[str, Any]) -> Dict[str, Any]:
+    # etykiety reprezentanta przepisane na duplikat (z jego własnym URL); zgodność miejsca
+    # i daty z reprezentantem sprawdził już cluster_entries
+    labels = None
+    if res.get("labels") is not None:
+        labels = dict(res["labels"])
+        labels["adres_url"] = member.get("url", "")
+        labels["duplikat"] = res["labels"].get("adres_url", "")
+    return {"wejscie": member, "labels": labels, "error": res.get("error")}
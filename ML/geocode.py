@@ -0,0 +1,165 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Dict, Optional, Tuple
+
+Coords = Tuple[float, float]
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+USER_AGENT = "SolvroGen-HackYeah-2025-v1.0.0"
+MIN_INTERVAL = 1.0  # polityka Nominatim: najwyżej 1 zapytanie na sekundę
+MISS_TTL = 7 * 24 * 3600  # adresy bez wyniku ponawiane po tygodniu
+
+# --------------------------- Adresy ---------------------------
+
+_PREFIX_RE = re.compile(r"\w+:\s?", re.ASCII)
+
+def clean_address(miejsce: str) -> str:
+    # te same reguły co we frontendzie (data.ts): bez " (oszacowano)", bez pierwszego
+    # "Etykieta: ", bez "Intersection of", pierwsze " and " jako " & "
+    address = miejsce.replace(" (oszacowano)", "", 1)
+    address = _PREFIX_RE.sub("", address, count=1)
+    address = address.replace("Intersection of", "", 1)
+    return address.replace(" and ", " & ", 1)
+
+def address_key(address: str) -> str:
+    # klucz cache: wielkość liter i białe znaki nie zmieniają wyniku geokodowania
+    return " ".join(address.casefold().split()).strip(" ,;")
+
+# --------------------------- Geokodery ---------------------------
+
+class NominatimGeocoder:
+    """Geokodowanie przez OpenStreetMap Nominatim (urllib), z limitem zapytań na sekundę."""
+
+    def __init__(self, url: str = NOMINATIM_URL, user_agent: str = USER_AGENT,
+                 min_interval: float = MIN_INTERVAL, timeout: float = 15):
+        self.url = url
+        self.user_agent = user_agent
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def _wait_turn(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+    def geocode(self, address: str) -> Optional[Coords]:
+        # None = brak wyniku (zapamiętywany); błędy sieci/HTTP przechodzą dalej (bez zapamiętania)
+        self._wait_turn()
+        query = urllib.parse.urlencode({"q": address, "format": "json", "limit": 1})
+        request = urllib.request.Request(f"{self.url}?{query}", headers={"User-Agent": self.user_agent})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            results = json.load(response)
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+class StubGeocoder:
+    """Lokalny geokoder bez sieci (testy, uruchomienia offline): stała tabela adres -> współrzędne."""
+
+    def __init__(self, table: Optional[Dict[str, Coords]] = None, default: Optional[Coords] = None):
+        self.table = {address_key(k): v for k, v in (table or {}).items()}
+        self.default = default
+        self.calls = 0
+
+    def geocode(self, address: str) -> Optional[Coords]:
+        self.calls += 1
+        return self.table.get(address_key(address), self.default)
+
+GEOCODERS = {
+    "nominatim": NominatimGeocoder,
+    "stub": StubGeocoder,
+}
+
+def make_geocoder(name: str = os.getenv("GEOCODER", "nominatim")):
+    return GEOCODERS[name]()
+
+# --------------------------- Cache ---------------------------
+
+class GeocodeCache:
+    """Trwały cache geokodowania w SQLite (klucz: znormalizowany adres; także adresy bez wyniku)."""
+
+    def __init__(self, path: str, miss_ttl: float = MISS_TTL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.miss_ttl = miss_ttl
+        self.hits = 0
+        self.misses = 0
+        # check_same_thread=False: geokoder działa w wątku (asyncio.to_thread)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY,"
+            " lat REAL,"
+            " lon REAL,"
+            " created_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Tuple[bool, Optional[Coords]]:
+        # (czy w cache, współrzędne lub None dla zapamiętanego braku wyniku)
+        with self._lock:
+            row = self.conn.execute("SELECT lat, lon, created_at FROM geocode WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[0] is None and time.time() - row[2] > self.miss_ttl):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, (None if row[0] is None else (row[0], row[1]))
+
+    def put(self, key: str, coords: Optional[Coords]) -> None:
+        lat, lon = coords if coords is not None else (None, None)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, lat, lon, created_at) VALUES (?, ?, ?, ?)",
+                (key, lat, lon, time.time()),
+            )
+            self.conn.commit()
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0.0
+        return f"Geokodowanie: {self.hits} z cache, {self.misses} zapytań ({ratio:.0f}% z cache)"
+
+    def close(self) -> None:
+        self.conn.close()
+
+# --------------------------- Etap potoku ---------------------------
+
+class CachedGeocoder:
+    """Geokoder z cache; ten sam adres pytany najwyżej raz."""
+
+    def __init__(self, geocoder, cache: GeocodeCache):
+        self.geocoder = geocoder
+        self.cache = cache
+        self._lock = threading.Lock()
+
+    def locate(self, miejsce: str) -> Optional[Coords]:
+        address = clean_address(miejsce)
+        key = address_key(address)
+        if not key:
+            return None
+        # jeden wątek naraz – równoległe wpisy o tym samym adresie trafią już w cache
+        with self._lock:
+            found, coords = self.cache.get(key)
+            if found:
+                return coords
+            coords = self.geocoder.geocode(address)
+            self.cache.put(key, coords)
+            return coords
+
+    def close(self) -> None:
+        self.cache.close()
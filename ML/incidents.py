@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from checkpoint import load_checkpoint
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+# ten sam parser dat co scrapery (ISO 8601, RFC 822, dateutil); bez strefy czasowej – UTC
+from dates import parse_date
+
+# incydent bez (poprawnego) czasu zakończenia trwa tyle od początku
+DEFAULT_DURATION = timedelta(hours=3)
+
+# --------------------------- Wczytywanie ---------------------------
+
+def load_labels(path: str) -> List[Dict[str, Any]]:
+    # etykiety z wyjścia main.py: JSONL (--stream/--follow) albo dawna tablica JSON;
+    # wpisy z błędem (labels = None / {"error": ...}) są pomijane
+    if path.endswith(".jsonl"):
+        records = list(load_checkpoint(path).values())
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+    labels = []
+    for rec in records:
+        lab = rec.get("labels")
+        if isinstance(lab, dict) and "error" not in lab:
+            labels.append(lab)
+    return labels
+
+# --------------------------- Daty ---------------------------
+
+def incident_window(labels: Dict[str, Any],
+                    default_duration: timedelta = DEFAULT_DURATION) -> Optional[Tuple[float, float]]:
+    # (początek, koniec) jako znaczniki czasu; brak początku – None (incydent poza osią czasu),
+    # brak lub błędny koniec (także wcześniejszy niż początek) – początek + default_duration
+    start = parse_date(labels.get("data"))
+    if start is None:
+        return None
+    end = parse_date(labels.get("szacowany_czas_zakonczenia"))
+    if end is None or end < start:
+        end = start + default_duration
+    return start.timestamp(), end.timestamp()
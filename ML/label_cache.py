@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from typing import Any, Dict, List, Optional
+
+# --------------------------- Klucze ---------------------------
+
+def _digest(parts: List[Any]) -> str:
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def cache_key(model: str, system_prompt: str, tools: List[Dict[str, Any]], user_prompt: str) -> str:
+    # Klucz zależy od wszystkiego, co trafia do API – ta sama treść = ta sama odpowiedź
+    return _digest([model, system_prompt, tools, user_prompt])
+
+def cache_version(model: str, system_prompt: str, tools: List[Dict[str, Any]], prompt_template: str) -> str:
+    # Wersja = model + prompt systemowy + schemat + szablon promptu (bez danych wpisu);
+    # zmiana któregokolwiek z nich unieważnia stare wpisy przy --vacuum-cache
+    return _digest([model, system_prompt, tools, prompt_template])
+
+# --------------------------- Cache ---------------------------
+
+class LabelCache:
+    """Trwały cache surowych argumentów `set_labels` w SQLite."""
+
+    def __init__(self, path: str, version: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS labels ("
+            " key TEXT PRIMARY KEY,"
+            " version TEXT NOT NULL,"
+            " labels TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS labels_version ON labels(version)")
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT labels FROM labels WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # zawsze świeży słownik – post_validate modyfikuje etykiety w miejscu
+        return json.loads(row[0])
+
+    def __contains__(self, key: str) -> bool:
+        # bez liczenia trafień – do sprawdzeń przed właściwym odczytem
+        return self.conn.execute("SELECT 1 FROM labels WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, key: str, labels: Dict[str, Any]) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO labels (key, version, labels, created_at) VALUES (?, ?, ?, ?)",
+            (key, self.version, json.dumps(labels, ensure_ascii=False), time.time()),
+        )
+        self.conn.commit()
+
+    def vacuum(self) -> int:
+        # usuń wpisy z innych wersji promptu/schematu i odzyskaj miejsce na dysku
+        cur = self.conn.execute("DELETE FROM labels WHERE version != ?", (self.version,))
+        self.conn.commit()
+        self.conn.execute("VACUUM")
+        return cur.rowcount
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        ratio = (self.hits / total * 100) if total else 0.0
+        return f"Cache: {self.hits} trafień, {self.misses} chybień ({ratio:.0f}% trafień)"
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,169 @@
+import re
+import time
+import random
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Mapping, Optional, Tuple
+
+# --------------------------- Nagłówki limitów ---------------------------
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    # format OpenAI: "1s", "6m0s", "120ms", "1h2m3.5s"
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(n) * _UNITS[u] for n, u in parts)
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+# --------------------------- Limiter AIMD ---------------------------
+
+class AdaptiveLimiter:
+    """Wspólny dla wszystkich zadań limiter współbieżności (AIMD) + kubełek limitów API.
+
+    - sukces z latencją poniżej `target_latency` podnosi limit o ~1 na „okno” (addytywnie),
+    - 429 / timeout tnie limit o połowę (najwyżej raz na `cooldown` sekund),
+    - nagłówki `x-ratelimit-*` i `retry-after` ustawiają wspólną pauzę dla wszystkich zadań,
+      zamiast osobnych backoffów, które potem ruszają naraz.
+    """
+
+    def __init__(self, initial: int = 8, min_limit: int = 1, max_limit: int = 64,
+                 target_latency: float = 30.0, cooldown: float = 5.0, window: float = 60.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.window = window
+        self.in_flight = 0
+
+        self._cond = asyncio.Condition()
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        # kubełek: pozostałe zapytania/tokeny wg ostatnich nagłówków i moment ich odnowienia
+        self._remaining_requests: Optional[int] = None
+        self._requests_reset_at = 0.0
+        self._remaining_tokens: Optional[int] = None
+        self._tokens_reset_at = 0.0
+        self._avg_tokens = 0.0
+        # (czas zakończenia, zużyte tokeny) – do RPS/TPM
+        self._events: Deque[Tuple[float, int]] = deque()
+
+    # ---- sloty ----
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self._cond:
+            while self.in_flight >= int(self.limit):
+                await self._cond.wait()
+            self.in_flight += 1
+        try:
+            await self._wait_for_budget()
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    async def _wait_for_budget(self) -> None:
+        while True:
+            now = time.monotonic()
+            wait = self._paused_until - now
+            if self._remaining_requests is not None and self._remaining_requests <= 0:
+                wait = max(wait, self._requests_reset_at - now)
+            if self._remaining_tokens is not None and self._remaining_tokens < self._avg_tokens:
+                wait = max(wait, self._tokens_reset_at - now)
+            if wait <= 0:
+                break
+            # niewielki jitter, żeby po odnowieniu limitu zadania nie ruszyły w tej samej milisekundzie
+            await asyncio.sleep(wait + random.random() * 0.25)
+        if self._remaining_requests is not None:
+            self._remaining_requests -= 1
+        if self._remaining_tokens is not None:
+            self._remaining_tokens -= int(self._avg_tokens)
+
+    # ---- sygnały zwrotne ----
+
+    def on_success(self, latency: float, tokens: int = 0, headers: Optional[Mapping[str, str]] = None) -> None:
+        now = time.monotonic()
+        self._events.append((now, tokens))
+        self._trim(now)
+        if tokens:
+            self._avg_tokens = tokens if not self._avg_tokens else 0.9 * self._avg_tokens + 0.1 * tokens
+        if headers is not None:
+            self._update_budget(headers, now)
+        if latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._notify()
+
+    def on_overload(self, headers: Optional[Mapping[str, str]] = None) -> None:
+        # 429 lub timeout: multiplikatywne cięcie, raz na cooldown (seria 429 = jedno cięcie)
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown:
+            self.limit = max(float(self.min_limit), self.limit / 2)
+            self._last_decrease = now
+        if headers is not None:
+            self._update_budget(headers, now)
+            pause = retry_after(headers)
+            if pause:
+                self._paused_until = max(self._paused_until, now + pause)
+
+    def _update_budget(self, headers: Mapping[str, str], now: float) -> None:
+        remaining = _int_header(headers, "x-ratelimit-remaining-requests")
+        if remaining is not None:
+            self._remaining_requests = remaining
+            self._requests_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 1.0)
+        remaining = _int_header(headers, "x-ratelimit-remaining-tokens")
+        if remaining is not None:
+            self._remaining_tokens = remaining
+            self._tokens_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-tokens")) or 1.0)
+
+    def _notify(self) -> None:
+        # podniesiony limit może wpuścić czekające zadania
+        async def wake() -> None:
+            async with self._cond:
+                self._cond.notify_all()
+        asyncio.get_running_loop().create_task(wake())
+
+    def _trim(self, now: float) -> None:
+        while self._events and now - self._events[0][0] > self.window:
+            self._events.popleft()
+
+    # ---- metryki ----
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._trim(now)
+        tokens = sum(t for _, t in self._events)
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "rps": len(self._events) / self.window,
+            "tpm": tokens * 60.0 / self.window,
+        }
+
+    def describe(self) -> str:
+        s = self.stats()
+        return f"limit {s['limit']}, w toku {s['in_flight']}, {s['rps']:.2f} zapytań/s, {s['tpm']:.0f} tokenów/min"
@@ -1,12 +1,28 @@
 import os
-import re
 import json
 import asyncio
+import time
 import random
-from typing import Any, Dict, List, Optional
+import argparse
+import sys
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
 from openai import AsyncOpenAI, APIConnectionError, RateLimitError, APITimeoutError
 from dotenv import load_dotenv
 
+from label_cache import LabelCache, cache_key, cache_version
+from checkpoint import CheckpointWriter, compact, entry_key, load_checkpoint, to_entry, to_legacy
+from batch import iter_batch_results, submit_batch, wait_for_batch, write_batch_file
+from limiter import AdaptiveLimiter
+from dedup import cluster_entries, fan_out
+from geocode import CachedGeocoder, GeocodeCache, make_geocoder
+from tiles import build_tiles
+from validation import post_validate
+from prefilter import MODEL_PATH as PREFILTER_PATH, Prefilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from incident_store import IncidentStore, DB_FILE as INCIDENTS_DB, LABELER
+
 load_dotenv()
 
 # --------------------------- Konfiguracja ---------------------------
@@ -18,11 +34,31 @@ client = AsyncOpenAI(api_key=API_KEY)
 MODEL = os.getenv("MODEL", "gpt-5-nano")
 INPUT_PATH = "data/london_crime_news.json"
 OUTPUT_PATH = "outputs/london_crime_news_labeled.json"
-
-# Ile jednoczesnych wywołań API 
+# Strumieniowy zapis (--stream): każdy wynik dopisywany od razu, wznowienie po awarii
+OUTPUT_JSONL_PATH = "outputs/london_crime_news_labeled.jsonl"
+# Tryb wsadowy (--batch): plik z zapytaniami i co ile sekund sprawdzać status
+BATCH_INPUT_PATH = "outputs/batch_requests.jsonl"
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "30"))
+CACHE_PATH = os.getenv("CACHE_PATH", "cache/labels.sqlite")
+# Geokodowanie 'miejsce' przy etykietowaniu (GEOCODER=nominatim|stub)
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "cache/geocode.sqlite")
+# Kafelki zagrożenia (--tiles): agregaty geohash do zapytań „co groźnego w pobliżu”
+TILES_PATH = "outputs/danger_tiles.json"
+
+# Startowa liczba jednoczesnych wywołań API – limiter AIMD dostraja ją w trakcie
 MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))
+# Górna granica współbieżności i latencja (s), powyżej której limiter przestaje ją podnosić
+MAX_CONCURRENCY_CAP = int(os.getenv("MAX_CONCURRENCY_CAP", "64"))
+TARGET_LATENCY = float(os.getenv("TARGET_LATENCY", "30"))
+# Pakowanie (--pack): budżet tokenów na paczkę (dane wejściowe + oczekiwane etykiety)
+PACK_TOKEN_BUDGET = int(os.getenv("PACK_TOKEN_BUDGET", "4000"))
+# Szacowana liczba tokenów etykiet zwracanych dla jednego wpisu
+OUTPUT_TOKENS_PER_ENTRY = 200
 # Maksymalna liczba ponowień na wpis
 MAX_RETRIES = 5
+# Tryb --follow: co ile sekund sprawdzać nowe incydenty i ile czekających wpisów buforować
+FOLLOW_POLL_SECONDS = float(os.getenv("FOLLOW_POLL_SECONDS", "2"))
+FOLLOW_QUEUE_SIZE = 64
 
 # --------------------------- Schemat (tools) ---------------------------
 
@@ -73,21 +109,48 @@ TOOLS = [{
     }
 }]
 
+TOOL_CHOICE = {"type": "function", "function": {"name": "set_labels"}}
+
+# Wariant tablicowy (--pack): kilka wpisów w jednym zapytaniu, wynik mapowany po adres_url
+PACKED_TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "set_labels_batch",
+        "description": "Nadaj etykiety dla każdego z wielu wpisów newsowych o zdarzeniach w mieście.",
+        "parameters": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "wpisy": {
+                    "type": "array",
+                    "description": "Jeden element na każdy wpis wejściowy.",
+                    "items": TOOLS[0]["function"]["parameters"]
+                }
+            },
+            "required": ["wpisy"]
+        }
+    }
+}]
+
+PACKED_TOOL_CHOICE = {"type": "function", "function": {"name": "set_labels_batch"}}
+
 # --------------------------- Prompt ---------------------------
 
-def build_user_prompt(entry: Dict[str, Any]) -> str:
+SYSTEM_PROMPT = "Zwracasz etykiety w JSON przez function-calling; przestrzegaj ISO 8601 dla pola 'data' i precyzuj lokalizację poniżej poziomu miasta."
+
+PROMPT_REQUIREMENTS = (
+    "Wymagania:\n"
+    "- 'miejsce' ma być bardziej szczegółowe niż kraj/miasto. Podaj ulicę i numer lub skrzyżowanie/plac/stację/punkt charakterystyczny oraz dzielnicę/arrondissement PO ANGIELSKU. "
+    "Jeśli nie ma wprost, oszacuj najbliższe nazwane miejsce.\n"
+    "- 'data' wpisz w ISO 8601 (format z T i strefą), np. 2025-10-04T13:45:00+02:00. "
+    "Jeśli znana tylko data bez godziny, użyj 00:00 i prawidłowy offset strefy.\n"
+    "- 'szacowany_czas_zakonczenia' oszacuj na bazie podobnych wydarzeń z przeszłości.\n"
+    "- 'poziom_zagrozenia' i 'komfort' to liczby całkowite 1–5.\n"
+    "- 'podsumowanie' pare słów, rzeczowo po polsku.\n"
+)
+
+def format_entry(entry: Dict[str, Any]) -> str:
     return (
-        "Z danych prasowych wyekstrahuj etykiety wg schematu.\n"
-        "Wymagania:\n"
-        "- 'miejsce' ma być bardziej szczegółowe niż kraj/miasto. Podaj ulicę i numer lub skrzyżowanie/plac/stację/punkt charakterystyczny oraz dzielnicę/arrondissement PO ANGIELSKU. "
-        "Jeśli nie ma wprost, oszacuj najbliższe nazwane miejsce.\n"
-        "- 'data' wpisz w ISO 8601 (format z T i strefą), np. 2025-10-04T13:45:00+02:00. "
-        "Jeśli znana tylko data bez godziny, użyj 00:00 i prawidłowy offset strefy.\n"
-        "- 'szacowany_czas_zakonczenia' oszacuj na bazie podobnych wydarzeń z przeszłości.\n"
-        "- 'poziom_zagrozenia' i 'komfort' to liczby całkowite 1–5.\n"
-        "- 'podsumowanie' pare słów, rzeczowo po polsku.\n"
-        "- Zwróć wyłącznie argumenty funkcji zgodne ze schematem.\n\n"
-        f"Dane wejściowe:\n"
         f"- url: {entry.get('url','')}\n"
         f"- tytuł: {entry.get('tytul','')}\n"
         f"- treść: {entry.get('tresc','')}\n"
@@ -96,102 +159,101 @@ def build_user_prompt(entry: Dict[str, Any]) -> str:
         f"- data_surowa: {entry.get('data','')}\n"
     )
 
-# --------------------------- Walidacja wyników ---------------------------
+def build_user_prompt(entry: Dict[str, Any]) -> str:
+    return (
+        "Z danych prasowych wyekstrahuj etykiety wg schematu.\n"
+        + PROMPT_REQUIREMENTS +
+        "- Zwróć wyłącznie argumenty funkcji zgodne ze schematem.\n\n"
+        f"Dane wejściowe:\n"
+        + format_entry(entry)
+    )
 
-ISO_DT_RE = re.compile(
-    r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2})?(?:\.\d+)?([+-]\d{2}:\d{2}|Z)$"
-)
+def build_packed_prompt(entries: List[Dict[str, Any]]) -> str:
+    # wiele wpisów w jednym zapytaniu – instrukcje wysyłane raz
+    parts = [
+        "Z danych prasowych wyekstrahuj etykiety wg schematu OSOBNO dla każdego z poniższych wpisów.\n"
+        + PROMPT_REQUIREMENTS +
+        "- Zwróć dokładnie jeden element 'wpisy' na każdy wpis; 'adres_url' przepisz DOKŁADNIE z pola url wpisu.\n"
+        "- Zwróć wyłącznie argumenty funkcji zgodne ze schematem.\n"
+    ]
+    for i, entry in enumerate(entries, 1):
+        parts.append(f"\nWpis {i}:\n" + format_entry(entry))
+    return "".join(parts)
+
+# --------------------------- Zapytanie ---------------------------
+
+def build_request(entry: Dict[str, Any]) -> Dict[str, Any]:
+    # argumenty chat.completions.create – te same dla trybu online i wsadowego
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_user_prompt(entry)}
+        ],
+        "tools": TOOLS,
+        "tool_choice": TOOL_CHOICE,
+        "temperature": 1,
+    }
 
-GENERIC_PLACES = {
-    "francja", "france", "paryż", "paris",
-    "ile-de-france", "ile de france",
-    "polska", "warszawa", "warsaw"  # zabezpieczenie przed uogólnieniami
-}
-
-def is_specific_place(miejsce: str) -> bool:
-    if not miejsce:
-        return False
-    s = miejsce.strip().lower()
-    if s in GENERIC_PLACES:
-        return False
-    # zbyt krótko lub wyłącznie miasto/kraj
-    if len(s) < 5:
-        return False
-    # proste heurystyki: obecność typu obiektu/ulicy/placu/numeru
-    tokens = ["ul.", "ulica", "rue", "avenue", "av.", "boulevard", "bd", "place", "pl.", "square",
-              "quai", "pont", "gare", "station", "stacja", "skrzyżowanie", "cross", "rond-point",
-              "rue de", "rue du", "rue des", "bd ", "boul.", "allee", "allée"]
-    if any(t in s for t in tokens):
-        return True
-    # numer porządkowy lub skrzyżowanie typu "X / Y"
-    if re.search(r"\d", s) or "/" in s:
-        return True
-    # arrondissement/dzielnica
-    if re.search(r"\b(\d{1,2})(er|e)?\s*arr", s) or "arrondissement" in s:
-        return True
-    return False
-
-def clamp(v: Optional[int], lo=1, hi=5) -> Optional[int]:
-    if v is None:
+def entry_cache_key(entry: Dict[str, Any]) -> str:
+    return cache_key(MODEL, SYSTEM_PROMPT, TOOLS, build_user_prompt(entry))
+
+def lookup_cache(entry: Dict[str, Any], cache: Optional[LabelCache]) -> Optional[Dict[str, Any]]:
+    # trafienie w cache – bez wywołania API
+    if cache is None:
         return None
-    try:
-        iv = int(v)
-        return max(lo, min(hi, iv))
-    except Exception:
+    cached = cache.get(entry_cache_key(entry))
+    if cached is None:
         return None
-
-def post_validate(entry: Dict[str, Any], labels: Dict[str, Any]) -> Dict[str, Any]:
-    # adres_url – zawsze z wejścia, jeśli brak
-    if not labels.get("adres_url"):
-        labels["adres_url"] = entry.get("url", "")
-
-    # ISO 8601 – jeśli model nie trafi w pattern, zostaw jak zwrócił (logika biznesowa może potem odfiltrować)
-    data_val = labels.get("data")
-    if isinstance(data_val, str) and not ISO_DT_RE.match(data_val.strip()):
-        labels["data_warning"] = "data nie przeszła walidacji ISO 8601"
-
-    # miejsce – odrzuć ogólne
-    if not is_specific_place(labels.get("miejsce", "")):
-        labels["miejsce_warning"] = "miejsce zbyt ogólne – rozważ doprecyzowanie lub oszacowanie"
-
-    # skale
-    labels["poziom_zagrozenia"] = clamp(labels.get("poziom_zagrozenia"))
-    labels["komfort"] = clamp(labels.get("komfort"))
-
-    return labels
+    return {"wejscie": entry, "labels": post_validate(entry, cached), "error": None}
+
+def store_labels(entry: Dict[str, Any], labels: Dict[str, Any], cache: Optional[LabelCache]) -> Dict[str, Any]:
+    # do cache trafiają surowe etykiety – walidacja jest liczona przy każdym odczycie
+    if cache is not None:
+        cache.put(entry_cache_key(entry), labels)
+    return {"wejscie": entry, "labels": post_validate(entry, labels), "error": None}
+
+async def complete(request: Dict[str, Any], limiter: AdaptiveLimiter) -> Dict[str, Any]:
+    # jedno wywołanie API w slocie limitera; zwraca argumenty pierwszego wywołania funkcji
+    async with limiter.slot():
+        started = time.monotonic()
+        # surowa odpowiedź – potrzebne nagłówki x-ratelimit-*
+        raw = await client.chat.completions.with_raw_response.create(**request)
+        comp = raw.parse()
+        usage = getattr(comp, "usage", None)
+        limiter.on_success(time.monotonic() - started,
+                           getattr(usage, "total_tokens", 0) or 0, raw.headers)
+    msg = comp.choices[0].message
+    if not getattr(msg, "tool_calls", None):
+        raise RuntimeError("Brak wywołania funkcji z danymi etykiet.")
+    return json.loads(msg.tool_calls[0].function.arguments)
 
 # --------------------------- Jedno zapytanie z retry ---------------------------
 
-async def fetch_labels(entry: Dict[str, Any], sem: asyncio.Semaphore) -> Dict[str, Any]:
-    messages = [
-        {"role": "system", "content": "Zwracasz etykiety w JSON przez function-calling; przestrzegaj ISO 8601 dla pola 'data' i precyzuj lokalizację poniżej poziomu miasta."},
-        {"role": "user", "content": build_user_prompt(entry)}
-    ]
+async def fetch_labels(entry: Dict[str, Any], limiter: AdaptiveLimiter,
+                       cache: Optional[LabelCache] = None) -> Dict[str, Any]:
+    hit = lookup_cache(entry, cache)
+    if hit is not None:
+        return hit
 
     delay = 1.0
     last_err: Optional[Exception] = None
 
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            async with sem:
-                comp = await client.chat.completions.create(
-                    model=MODEL,
-                    messages=messages,
-                    tools=TOOLS,
-                    tool_choice={"type": "function", "function": {"name": "set_labels"}},
-                    temperature=1
-                )
-            msg = comp.choices[0].message
-            if not getattr(msg, "tool_calls", None):
-                raise RuntimeError("Brak wywołania funkcji z danymi etykiet.")
-            args_str = msg.tool_calls[0].function.arguments
-            labels = json.loads(args_str)
-            labels = post_validate(entry, labels)
-            return {"wejscie": entry, "labels": labels, "error": None}
-        except (RateLimitError, APITimeoutError, APIConnectionError) as e:
+            labels = await complete(build_request(entry), limiter)
+            return store_labels(entry, labels, cache)
+        except (RateLimitError, APITimeoutError) as e:
             last_err = e
-            # wykładniczy backoff + jitter
-            await asyncio.sleep(delay + random.random() * 0.3)
+            # przeciążenie: limiter tnie współbieżność i ustawia wspólną pauzę (retry-after);
+            # pełny jitter rozprasza ponowienia zamiast wspólnego „szturmu” po backoffie
+            response = getattr(e, "response", None)
+            limiter.on_overload(response.headers if response is not None else None)
+            await asyncio.sleep(random.uniform(0, delay))
+            delay = min(delay * 2, 16.0)
+        except APIConnectionError as e:
+            last_err = e
+            await asyncio.sleep(random.uniform(0, delay))
             delay = min(delay * 2, 16.0)
         except Exception as e:
             # błąd „merytoryczny” – nie retry’ujemy w nieskończoność, ale jeszcze 1–2 próby pomogą
@@ -201,38 +263,414 @@ async def fetch_labels(entry: Dict[str, Any], sem: asyncio.Semaphore) -> Dict[st
     # Po wyczerpaniu retry – zwróć z błędem, ale nie zatrzymuj całości
     return {"wejscie": entry, "labels": None, "error": str(last_err) if last_err else "unknown error"}
 
+# --------------------------- Paczki wielu wpisów ---------------------------
+
+def estimate_tokens(text: str) -> int:
+    # zgrubnie ~4 znaki na token – wystarcza do doboru wielkości paczki
+    return len(text) // 4 + 1
+
+def make_packs(entries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    # zachłannie dokładamy wpisy, dopóki paczka mieści się w budżecie tokenów
+    base = estimate_tokens(SYSTEM_PROMPT + build_packed_prompt([]) + json.dumps(PACKED_TOOLS))
+    packs: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    used = base
+    for entry in entries:
+        cost = estimate_tokens(format_entry(entry)) + OUTPUT_TOKENS_PER_ENTRY
+        if current and used + cost > PACK_TOKEN_BUDGET:
+            packs.append(current)
+            current, used = [], base
+        current.append(entry)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+def build_packed_request(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_packed_prompt(entries)}
+        ],
+        "tools": PACKED_TOOLS,
+        "tool_choice": PACKED_TOOL_CHOICE,
+        "temperature": 1,
+    }
+
+async def fetch_pack(entries: List[Dict[str, Any]], limiter: AdaptiveLimiter,
+                     cache: Optional[LabelCache] = None) -> List[Dict[str, Any]]:
+    if len(entries) == 1:
+        return [await fetch_labels(entries[0], limiter, cache)]
+
+    # wynik wraca do wpisu po url – wpisy bez url lub z powtórzonym url idą pojedynczo
+    by_url: Dict[str, Dict[str, Any]] = {}
+    singles: List[Dict[str, Any]] = []
+    for entry in entries:
+        url = entry.get("url", "")
+        if url and url not in by_url:
+            by_url[url] = entry
+        else:
+            singles.append(entry)
+
+    if not by_url:
+        # żaden wpis nie ma url – paczka nie miałaby do czego przypisać wyników
+        return list(await asyncio.gather(*(fetch_labels(e, limiter, cache) for e in singles)))
+
+    results: List[Dict[str, Any]] = []
+    try:
+        args = await complete(build_packed_request(list(by_url.values())), limiter)
+        for labels in args.get("wpisy") or []:
+            if not isinstance(labels, dict):
+                continue
+            entry = by_url.pop((labels.get("adres_url") or "").strip(), None)
+            if entry is None:
+                continue
+            # etykiety trafiają do cache pod kluczem pojedynczego wpisu
+            results.append(store_labels(entry, labels, cache))
+    except (RateLimitError, APITimeoutError) as e:
+        response = getattr(e, "response", None)
+        limiter.on_overload(response.headers if response is not None else None)
+    except Exception as e:
+        print(f"Paczka {len(entries)} wpisów nieudana ({e}) – ponawiam pojedynczo")
+
+    # wpisy bez dopasowanego wyniku (lub nieudana paczka) – zwykłe pojedyncze zapytania
+    singles.extend(by_url.values())
+    if singles:
+        results.extend(await asyncio.gather(*(fetch_labels(e, limiter, cache) for e in singles)))
+    return results
+
+# --------------------------- Źródła wyników ---------------------------
+
+def make_limiter() -> AdaptiveLimiter:
+    return AdaptiveLimiter(initial=MAX_CONCURRENCY, max_limit=MAX_CONCURRENCY_CAP,
+                           target_latency=TARGET_LATENCY)
+
+async def label_online(items: List[Dict[str, Any]], cache: Optional[LabelCache],
+                       limiter: AdaptiveLimiter) -> AsyncIterator[Dict[str, Any]]:
+    tasks = [asyncio.create_task(fetch_labels(entry, limiter, cache)) for entry in items]
+    for coro in asyncio.as_completed(tasks):
+        yield await coro
+
+async def label_packed(items: List[Dict[str, Any]], cache: Optional[LabelCache],
+                       limiter: AdaptiveLimiter) -> AsyncIterator[Dict[str, Any]]:
+    # trafienia w cache od razu; pozostałe wpisy pakowane wg budżetu tokenów
+    pending = []
+    for entry in items:
+        hit = lookup_cache(entry, cache)
+        if hit is not None:
+            yield hit
+        else:
+            pending.append(entry)
+    packs = make_packs(pending)
+    print(f"Pakowanie: {len(pending)} wpisów w {len(packs)} zapytaniach")
+    tasks = [asyncio.create_task(fetch_pack(pack, limiter, cache)) for pack in packs]
+    for coro in asyncio.as_completed(tasks):
+        for res in await coro:
+            yield res
+
+async def label_batch(items: List[Dict[str, Any]], cache: Optional[LabelCache],
+                      batch_client: Any = None) -> AsyncIterator[Dict[str, Any]]:
+    # Batch API: jeden plik z zapytaniami zamiast osobnych wywołań (tańsze, wolniejsze)
+    batch_client = batch_client or client
+    pending = []
+    for entry in items:
+        hit = lookup_cache(entry, cache)
+        if hit is not None:
+            yield hit
+        else:
+            pending.append(entry)
+    if not pending:
+        return
+
+    os.makedirs(os.path.dirname(BATCH_INPUT_PATH), exist_ok=True)
+    by_id = write_batch_file(BATCH_INPUT_PATH, pending, build_request)
+    batch_id = await submit_batch(batch_client, BATCH_INPUT_PATH)
+    batch = await wait_for_batch(batch_client, batch_id, BATCH_POLL_SECONDS)
+
+    async for custom_id, args_str, error in iter_batch_results(batch_client, batch):
+        entry = by_id.pop(custom_id, None)
+        if entry is None:
+            # nieznany lub powtórzony custom_id – nie przerywaj odczytu pozostałych wyników
+            print(f"Batch {batch_id}: pominięto wynik dla nieznanego custom_id {custom_id}")
+            continue
+        if error is None:
+            try:
+                yield store_labels(entry, json.loads(args_str), cache)
+                continue
+            except Exception as e:
+                error = str(e)
+        yield {"wejscie": entry, "labels": None, "error": error}
+
+    # wpisy bez wyniku (batch wygasł/anulowany) – zwróć z błędem, --stream ponowi je później
+    for entry in by_id.values():
+        yield {"wejscie": entry, "labels": None, "error": f"batch {batch_id}: {batch.status}"}
+
+async def with_duplicates(source: AsyncIterator[Dict[str, Any]],
+                          members: Dict[int, List[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+    # wynik reprezentanta klastra + jego kopie dla prawie-duplikatów
+    async for res in source:
+        yield res
+        for member in members.get(id(res["wejscie"]), []):
+            yield fan_out(res, member)
+
+async def label_queue(queue: "asyncio.Queue[Optional[Dict[str, Any]]]", writer: CheckpointWriter,
+                      cache: Optional[LabelCache], limiter: AdaptiveLimiter,
+                      on_done: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None,
+                      geocoder: Optional[CachedGeocoder] = None) -> int:
+    # konsument demona (daemon.py) i trybu --follow: wpisy etykietowane zaraz po trafieniu
+    # do kolejki, wyniki dopisywane do JSONL; None kończy pracę po dokończeniu rozpoczętych.
+    # Najwyżej MAX_CONCURRENCY_CAP wpisów w toku – potem kolejka się zapełnia i producent
+    # (scraper / odczyt bazy) czeka zamiast gromadzić zaległości w pamięci.
+    tasks = set()
+    done = 0
+
+    async def label(entry: Dict[str, Any]) -> None:
+        nonlocal done
+        res = await add_coordinates(await fetch_labels(entry, limiter, cache), geocoder)
+        writer.write(res)
+        if on_done is not None:
+            on_done(entry, res)
+        done += 1
+        status = "błąd" if res.get("labels") is None else "OK"
+        print(f"Etykieta ({status}, razem {done}; {limiter.describe()}): {entry.get('url')}")
+
+    while True:
+        if len(tasks) >= MAX_CONCURRENCY_CAP:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        entry = await queue.get()
+        if entry is None:
+            break
+        task = asyncio.create_task(label(entry))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.gather(*tasks)
+    return done
+
+async def follow(args: argparse.Namespace) -> None:
+    # tryb ciągły: śledzi bazę incydentów (kolejne id) i etykietuje nowe wpisy w kilka sekund;
+    # przesunięcie konsumenta zapisywane po zaetykietowaniu, więc restart wznawia od miejsca przerwania
+    store = IncidentStore(args.db)
+    offset = store.get_offset(LABELER)
+    store.set_offset(LABELER, offset)  # rejestracja konsumenta – scrapery widzą zaległości
+    print(f"Śledzenie {args.db} od id {offset} (zaległe: {store.backlog(LABELER)})")
+
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=FOLLOW_QUEUE_SIZE)
+    cache = None if args.no_cache else open_cache()
+    geocoder = None if args.no_geocode else open_geocoder()
+    limiter = make_limiter()
+    writer = CheckpointWriter(OUTPUT_JSONL_PATH)
+
+    # id wpisów w toku; przesunięcie rośnie tylko do najstarszego niedokończonego
+    in_flight: Dict[int, int] = {}
+    unfinished: Deque[int] = deque()
+    finished = set()
+
+    def on_done(entry: Dict[str, Any], res: Dict[str, Any]) -> None:
+        nonlocal offset
+        finished.add(in_flight.pop(id(entry)))
+        advanced = False
+        while unfinished and unfinished[0] in finished:
+            offset = unfinished.popleft()
+            finished.discard(offset)
+            advanced = True
+        if advanced:
+            store.set_offset(LABELER, offset)
+
+    consumer = asyncio.create_task(label_queue(queue, writer, cache, limiter, on_done, geocoder))
+    last_id = offset
+    try:
+        while not consumer.done():
+            rows = store.items_after(last_id, limit=FOLLOW_QUEUE_SIZE)
+            if not rows:
+                await asyncio.sleep(FOLLOW_POLL_SECONDS)
+                continue
+            for row_id, item in rows:
+                entry = to_entry(item)
+                in_flight[id(entry)] = row_id
+                unfinished.append(row_id)
+                await queue.put(entry)  # czeka, gdy etykietowanie nie nadąża
+                last_id = row_id
+    finally:
+        if not consumer.done():
+            await queue.put(None)
+        try:
+            print(f"Zaetykietowano {await consumer} wpisów; przesunięcie {LABELER}: {offset}")
+        finally:
+            writer.close()
+            store.close()
+            if cache is not None:
+                print(cache.stats())
+                cache.close()
+            if geocoder is not None:
+                print(geocoder.cache.stats())
+                geocoder.close()
+
+# --------------------------- Geokodowanie ---------------------------
+
+async def add_coordinates(res: Dict[str, Any], geocoder: Optional[CachedGeocoder]) -> Dict[str, Any]:
+    # współrzędne liczone raz, przy etykietowaniu (lat/lon w etykietach) – frontend nie geokoduje
+    labels = res.get("labels")
+    if geocoder is None or labels is None:
+        return res
+    try:
+        coords = await asyncio.to_thread(geocoder.locate, labels.get("miejsce") or "")
+    except Exception as e:
+        # błąd sieci/usługi nie trafia do cache – adres zostanie zapytany przy kolejnym wpisie
+        coords = None
+        labels["geo_warning"] = f"geokodowanie nieudane: {e}"
+    else:
+        if coords is None:
+            labels["geo_warning"] = "nie znaleziono współrzędnych dla 'miejsce'"
+    labels["lat"], labels["lon"] = coords if coords is not None else (None, None)
+    return res
+
+def open_geocoder() -> CachedGeocoder:
+    return CachedGeocoder(make_geocoder(), GeocodeCache(GEOCODE_CACHE_PATH))
+
+# --------------------------- Cache ---------------------------
+
+def open_cache() -> LabelCache:
+    version = cache_version(MODEL, SYSTEM_PROMPT, TOOLS, build_user_prompt({}))
+    return LabelCache(CACHE_PATH, version)
+
+def vacuum_cache() -> None:
+    cache = open_cache()
+    removed = cache.vacuum()
+    print(f"Usunięto {removed} wpisów ze starych wersji promptu/schematu; zostało {cache.count()}.")
+    cache.close()
+
 # --------------------------- Main ---------------------------
 
-async def main():
+async def main(args: argparse.Namespace):
     with open(INPUT_PATH, "r", encoding="utf-8") as f:
         items: List[Dict[str, Any]] = json.load(f)
 
-    sem = asyncio.Semaphore(MAX_CONCURRENCY)
-    tasks = [asyncio.create_task(fetch_labels(entry, sem)) for entry in items]
+    writer: Optional[CheckpointWriter] = None
+    if args.stream:
+        # wznowienie: pomiń wpisy, które mają już etykiety; ponów tylko błędy i brakujące
+        previous = load_checkpoint(OUTPUT_JSONL_PATH)
+        labeled = {k for k, r in previous.items() if r.get("labels") is not None}
+        skipped = sum(1 for entry in items if entry_key(entry) in labeled)
+        items = [entry for entry in items if entry_key(entry) not in labeled]
+        if skipped:
+            print(f"Wznowienie: pominięto {skipped} wpisów z etykietami w {OUTPUT_JSONL_PATH}")
+        writer = CheckpointWriter(OUTPUT_JSONL_PATH)
+
+    total = len(items)
+    members: Dict[int, List[Dict[str, Any]]] = {}
+    if not args.no_dedup:
+        # prawie-duplikaty (ten sam incydent z wielu źródeł) – etykietujemy tylko reprezentanta
+        clusters = cluster_entries(items)
+        items = [c[0] for c in clusters]
+        members = {id(c[0]): c[1:] for c in clusters if len(c) > 1}
+        if total > len(items):
+            print(f"Deduplikacja: {total} wpisów -> {len(items)} do etykietowania")
+
+    cache = None if args.no_cache else open_cache()
+    if args.prefilter:
+        # lokalny model (prefilter.py) odsiewa wpisy bez incydentu przed wywołaniem LLM;
+        # pominięte nie trafiają do wyjścia (razem z ich prawie-duplikatami). Wpisy z
+        # etykietami w cache nic nie kosztują – prefiltr ocenia tylko chybienia
+        prefilter = Prefilter.load(PREFILTER_PATH)
+        misses = [entry for entry in items if cache is None or entry_cache_key(entry) not in cache]
+        _, skipped = prefilter.split(misses)
+        dropped = {id(entry) for entry in skipped}
+        items = [entry for entry in items if id(entry) not in dropped]
+        total -= sum(1 + len(members.get(id(entry), [])) for entry in skipped)
+        print(f"Prefiltr: pominięto {len(skipped)} z {len(misses)} wpisów spoza cache "
+              f"(próg {prefilter.threshold:.3f})")
+
+    geocoder = None if args.no_geocode else open_geocoder()
+    limiter = make_limiter()
+    if args.batch:
+        source = label_batch(items, cache)
+    elif args.pack:
+        source = label_packed(items, cache, limiter)
+    else:
+        source = label_online(items, cache, limiter)
+    source = with_duplicates(source, members)
     results = []
     done = 0
-    total = len(tasks)
 
-    for coro in asyncio.as_completed(tasks):
-        res = await coro
-        results.append(res)
-        done += 1
-        if done % 10 == 0 or done == total:
-            print(f"Postęp: {done}/{total}")
+    try:
+        async for res in source:
+            res = await add_coordinates(res, geocoder)
+            if writer is not None:
+                writer.write(res)
+            else:
+                results.append(res)
+            done += 1
+            if done % 10 == 0 or done == total:
+                print(f"Postęp: {done}/{total}" + ("" if args.batch else f" ({limiter.describe()})"))
+    finally:
+        if writer is not None:
+            writer.close()
+        if cache is not None:
+            print(cache.stats())
+            cache.close()
+        if geocoder is not None:
+            print(geocoder.cache.stats())
+            geocoder.close()
+
+    if writer is not None:
+        # kompaktowanie JSONL -> dawny format tablicy JSON
+        count = compact(OUTPUT_JSONL_PATH, OUTPUT_PATH)
+        print(f"OK — zapisano: {OUTPUT_JSONL_PATH} (skompaktowano {count} wpisów do {OUTPUT_PATH})")
+        if args.tiles:
+            build_tiles(OUTPUT_PATH, TILES_PATH)
+        return
 
     # zapisujemy w takim samym układzie jak wcześniej (wejście + labels)
-    out = []
-    for r in results:
-        if r["labels"] is not None:
-            out.append({"labels": r["labels"]})
-        else:
-            out.append({"labels": {"error": r["error"]}})
+    out = [to_legacy(r) for r in results]
 
     os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
     with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
         json.dump(out, f, ensure_ascii=False, indent=2)
 
     print(f"OK — zapisano: {OUTPUT_PATH}")
+    if args.tiles:
+        build_tiles(OUTPUT_PATH, TILES_PATH)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Etykietowanie newsów przez LLM (function-calling).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Nie korzystaj z cache odpowiedzi (zawsze pytaj API).")
+    parser.add_argument("--vacuum-cache", action="store_true",
+                        help="Usuń z cache wpisy ze starych wersji modelu/promptu/schematu i zakończ.")
+    parser.add_argument("--stream", action="store_true",
+                        help=f"Dopisuj wyniki na bieżąco do {OUTPUT_JSONL_PATH} i wznawiaj od miejsca przerwania.")
+    parser.add_argument("--compact", action="store_true",
+                        help=f"Tylko skompaktuj {OUTPUT_JSONL_PATH} do {OUTPUT_PATH} i zakończ.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Wyślij wszystkie wpisy jednym zadaniem Batch API (masowe uzupełnianie historii).")
+    parser.add_argument("--no-dedup", action="store_true",
+                        help="Nie łącz prawie-duplikatów (MinHash/LSH) przed etykietowaniem.")
+    parser.add_argument("--no-geocode", action="store_true",
+                        help="Nie dodawaj współrzędnych (lat/lon) do etykiet.")
+    parser.add_argument("--prefilter", action="store_true",
+                        help=f"Pomiń wpisy, które lokalny model ({PREFILTER_PATH}, prefilter.py) uznaje za nieistotne.")
+    parser.add_argument("--tiles", action="store_true",
+                        help=f"Po etykietowaniu zbuduj kafelki zagrożenia w {TILES_PATH} (tiles.py).")
+    parser.add_argument("--follow", action="store_true",
+                        help=f"Śledź bazę incydentów i etykietuj nowe wpisy na bieżąco (dopisywane do {OUTPUT_JSONL_PATH}).")
+    parser.add_argument("--db", default=INCIDENTS_DB,
+                        help="Baza incydentów scraperów (dla --follow).")
+    parser.add_argument("--pack", action="store_true",
+                        help="Pakuj kilka wpisów w jedno zapytanie (budżet PACK_TOKEN_BUDGET tokenów).")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.vacuum_cache:
+        vacuum_cache()
+    elif args.compact:
+        print(f"Skompaktowano {compact(OUTPUT_JSONL_PATH, OUTPUT_PATH)} wpisów do {OUTPUT_PATH}")
+    elif args.follow:
+        try:
+            asyncio.run(follow(args))
+        except KeyboardInterrupt:
+            print("Zatrzymano śledzenie")
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,246 @@
+import os
+import re
+import json
+import math
+import zlib
+import random
+import argparse
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from checkpoint import load_checkpoint
+from dedup import entry_text
+
+# --------------------------- Konfiguracja ---------------------------
+
+MODEL_PATH = os.getenv("PREFILTER_PATH", "cache/prefilter.json")
+DIMS = 1 << 18  # haszowane cechy: słowa i pary słów
+# wpis „istotny”, jeśli LLM dał mu co najmniej taki poziom zagrożenia
+# (1 = nic groźnego: nekrologi, relacje sądowe, sport)
+RELEVANT_LEVEL = 2
+TARGET_RECALL = 0.98  # próg dobierany tak, by przepuścić tyle istotnych wpisów z walidacji
+EPOCHS = 8
+LEARNING_RATE = 0.5
+HOLDOUT = 0.2
+
+Vector = Dict[int, float]
+_WORD_RE = re.compile(r"\w+")
+
+# --------------------------- Cechy ---------------------------
+
+def tokens(text: str) -> List[int]:
+    words = _WORD_RE.findall(text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return [zlib.crc32(g.encode("utf-8")) % DIMS for g in grams]
+
+class Vectorizer:
+    """TF-IDF na haszowanych cechach (bez słownika); idf liczone na zbiorze treningowym."""
+
+    def __init__(self, idf: Optional[Dict[int, float]] = None, default_idf: float = 1.0):
+        self.idf = idf or {}
+        self.default_idf = default_idf
+
+    @classmethod
+    def fit(cls, texts: List[str]) -> "Vectorizer":
+        df: Counter = Counter()
+        for text in texts:
+            df.update(set(tokens(text)))
+        n = len(texts)
+        idf = {h: math.log((1 + n) / (1 + c)) + 1 for h, c in df.items()}
+        return cls(idf, math.log(1 + n) + 1)
+
+    def transform(self, text: str) -> Vector:
+        counts = Counter(tokens(text))
+        idf, default = self.idf, self.default_idf
+        vec = {h: (1 + math.log(c)) * idf.get(h, default) for h, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {h: v / norm for h, v in vec.items()}
+
+# --------------------------- Modele liniowe ---------------------------
+
+def _dot(w: Dict[int, float], x: Vector) -> float:
+    return sum(w.get(h, 0.0) * v for h, v in x.items())
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    if z > 30:
+        return 1.0
+    return 1 / (1 + math.exp(-z))
+
+def train_logistic(xs: List[Vector], ys: List[int], epochs: int = EPOCHS,
+                   lr: float = LEARNING_RATE, seed: int = 0) -> Tuple[Dict[int, float], float]:
+    # SGD z wagami klas (mniej liczna klasa waży więcej)
+    pos = sum(ys) or 1
+    neg = (len(ys) - sum(ys)) or 1
+    cw = {1: len(ys) / (2 * pos), 0: len(ys) / (2 * neg)}
+    w: Dict[int, float] = {}
+    b = 0.0
+    order = list(range(len(xs)))
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        step = lr / (1 + epoch)
+        for i in order:
+            x, y = xs[i], ys[i]
+            g = (_sigmoid(_dot(w, x) + b) - y) * cw[y] * step
+            for h, v in x.items():
+                w[h] = w.get(h, 0.0) - g * v
+            b -= g
+    return w, b
+
+def train_linear(xs: List[Vector], ys: List[float], epochs: int = EPOCHS,
+                 lr: float = LEARNING_RATE, seed: int = 0) -> Tuple[Dict[int, float], float]:
+    # regresja (kwadratowa funkcja straty) – szacunek poziomu zagrożenia
+    w: Dict[int, float] = {}
+    b = sum(ys) / len(ys) if ys else 0.0
+    order = list(range(len(xs)))
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        step = lr / (1 + epoch)
+        for i in order:
+            x = xs[i]
+            g = (_dot(w, x) + b - ys[i]) * step
+            for h, v in x.items():
+                w[h] = w.get(h, 0.0) - g * v
+            b -= g
+    return w, b
+
+# --------------------------- Prefiltr ---------------------------
+
+class Prefilter:
+    """Lokalna ocena „czy to incydent” i szacunek poziomu zagrożenia przed wywołaniem LLM."""
+
+    def __init__(self, vectorizer: Vectorizer, relevance: Tuple[Dict[int, float], float],
+                 level: Tuple[Dict[int, float], float], threshold: float = 0.5,
+                 metrics: Optional[Dict[str, Any]] = None):
+        self.vectorizer = vectorizer
+        self.relevance = relevance
+        self.level = level
+        self.threshold = threshold
+        self.metrics = metrics or {}
+
+    def score(self, entry: Dict[str, Any]) -> Tuple[float, float]:
+        # (prawdopodobieństwo istotności, szacowany poziom 1–5)
+        x = self.vectorizer.transform(entry_text(entry))
+        w, b = self.relevance
+        lw, lb = self.level
+        return _sigmoid(_dot(w, x) + b), max(1.0, min(5.0, _dot(lw, x) + lb))
+
+    def score_batch(self, entries: Iterable[Dict[str, Any]]) -> List[Tuple[float, float]]:
+        return [self.score(entry) for entry in entries]
+
+    def split(self, entries: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        # (do LLM, pominięte)
+        keep, skip = [], []
+        for entry, (p, _) in zip(entries, self.score_batch(entries)):
+            (keep if p >= self.threshold else skip).append(entry)
+        return keep, skip
+
+    def save(self, path: str = MODEL_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "dims": DIMS,
+            "idf": self.vectorizer.idf,
+            "default_idf": self.vectorizer.default_idf,
+            # zapisujemy tylko niezerowe wagi
+            "relevance": [{h: v for h, v in self.relevance[0].items() if v}, self.relevance[1]],
+            "level": [{h: v for h, v in self.level[0].items() if v}, self.level[1]],
+            "threshold": self.threshold,
+            "metrics": self.metrics,
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> "Prefilter":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data["dims"] != DIMS:
+            raise ValueError(f"model {path} ma {data['dims']} cech, oczekiwano {DIMS} – wytrenuj ponownie")
+
+        def ints(d: Dict[str, float]) -> Dict[int, float]:
+            return {int(h): v for h, v in d.items()}
+
+        return cls(
+            Vectorizer(ints(data["idf"]), data["default_idf"]),
+            (ints(data["relevance"][0]), data["relevance"][1]),
+            (ints(data["level"][0]), data["level"][1]),
+            data["threshold"],
+            data.get("metrics"),
+        )
+
+# --------------------------- Trening i ocena ---------------------------
+
+def load_examples(path: str) -> List[Tuple[Dict[str, Any], int]]:
+    # (wejście, poziom zagrożenia) z wyjścia JSONL main.py (--stream/--follow zapisują wejście)
+    examples = []
+    for res in load_checkpoint(path).values():
+        labels = res.get("labels")
+        entry = res.get("wejscie")
+        if not entry or not isinstance(labels, dict) or not labels.get("poziom_zagrozenia"):
+            continue
+        examples.append((entry, int(labels["poziom_zagrozenia"])))
+    return examples
+
+def threshold_at_recall(scores: List[float], ys: List[int], recall: float) -> float:
+    # najwyższy próg, który przepuszcza co najmniej `recall` istotnych wpisów
+    positives = sorted(s for s, y in zip(scores, ys) if y)
+    if not positives:
+        return 0.0
+    return positives[int(math.floor((1 - recall) * len(positives)))]
+
+def evaluate(scores: List[float], ys: List[int], threshold: float) -> Dict[str, float]:
+    passed = [s >= threshold for s in scores]
+    tp = sum(1 for p, y in zip(passed, ys) if p and y)
+    positives = sum(ys) or 1
+    return {
+        "n": len(ys),
+        "recall": tp / positives,
+        "precision": tp / (sum(passed) or 1),
+        "avoided": 1 - sum(passed) / (len(ys) or 1),  # odsetek wywołań API, których nie trzeba robić
+    }
+
+def train(examples: List[Tuple[Dict[str, Any], int]], recall: float = TARGET_RECALL,
+          holdout: float = HOLDOUT, seed: int = 0) -> Prefilter:
+    rng = random.Random(seed)
+    examples = examples[:]
+    rng.shuffle(examples)
+    cut = int(len(examples) * (1 - holdout))
+    train_set, val_set = examples[:cut], examples[cut:] or examples[:cut]
+
+    vectorizer = Vectorizer.fit([entry_text(e) for e, _ in train_set])
+    xs = [vectorizer.transform(entry_text(e)) for e, _ in train_set]
+    relevance = train_logistic(xs, [int(lvl >= RELEVANT_LEVEL) for _, lvl in train_set], seed=seed)
+    level = train_linear(xs, [float(lvl) for _, lvl in train_set], seed=seed)
+
+    model = Prefilter(vectorizer, relevance, level)
+    scored = model.score_batch([e for e, _ in val_set])
+    ys = [int(lvl >= RELEVANT_LEVEL) for _, lvl in val_set]
+    model.threshold = threshold_at_recall([p for p, _ in scored], ys, recall)
+    model.metrics = evaluate([p for p, _ in scored], ys, model.threshold)
+    model.metrics["level_mae"] = sum(abs(est - lvl) for (_, est), (_, lvl) in zip(scored, val_set)) / len(val_set)
+    model.metrics["train"] = len(train_set)
+    return model
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Lokalny prefiltr istotności przed etykietowaniem LLM.")
+    parser.add_argument("labeled", nargs="+", help="Wyjścia JSONL main.py z wejściem i etykietami.")
+    parser.add_argument("--recall", type=float, default=TARGET_RECALL)
+    parser.add_argument("--output", default=MODEL_PATH)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    examples = [ex for path in args.labeled for ex in load_examples(path)]
+    if len(examples) < 20:
+        raise SystemExit(f"Za mało przykładów do treningu: {len(examples)}")
+    model = train(examples, args.recall)
+    model.save(args.output)
+    m = model.metrics
+    print(f"Prefiltr: {m['train']} przykładów treningowych, walidacja {m['n']}: próg {model.threshold:.3f}, "
+          f"recall {m['recall']:.3f}, precyzja {m['precision']:.3f}, pominięte wywołania {m['avoided']:.1%}, "
+          f"MAE poziomu {m['level_mae']:.2f} -> {args.output}")
@@ -0,0 +1,122 @@
+import os
+import json
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from matcher import TermMatcher
+from dates import to_epoch, from_epoch
+
+
+# CONFIGURATION
+CITIES_DIR = os.getenv("CITIES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cities"))
+STATE_DIR = os.getenv("STATE_DIR", "state")  # watermarks and planner state, one directory per city
+# state files in the working directory from before the per-city directories -> the (city, source)
+# that wrote them; read until that source has its own file. The old shared latest_article_state.json
+# is credited to the London NewsAPI scraper only (other sources start over; the store skips known URLs).
+LEGACY_STATE_FILES = {
+    "newsapi_london_state.json": ("london", "newsapi_london"),
+    "google_news_paris_state.json": ("paris", "google_news_paris"),
+    "latest_article_state.json": ("london", "newsapi_london"),
+}
+
+
+@lru_cache(maxsize=None)
+def shared_matcher(categories, whole_word=()):
+    """TermMatcher for ((category, (term, ...)), ...); equal lists share one compiled matcher across cities."""
+    return TermMatcher(dict(categories), whole_word)
+
+
+def _frozen(categories):
+    return tuple((name, tuple(terms)) for name, terms in sorted(categories.items()))
+
+
+class City:
+    """One city's configuration (cities/<name>.json): names, gazetteer, keywords and sources.
+
+    Keys: name, city (spellings of the city name), timezone, generic_places (regions and
+    countries too vague to locate an incident), keywords ({category: terms}), gazetteer
+    ({area group: [areas]}), and the optional sources: newsapi ({source, query}),
+    feeds ([{source, url}]) and x ({source, accounts, keywords}; the city keywords
+    if x has none).
+    """
+
+    def __init__(self, config):
+        self.name = config["name"]
+        self.names = config["city"]
+        self.timezone = ZoneInfo(config.get("timezone", "UTC"))
+        self.generic_places = config.get("generic_places", [])
+        self.keywords = config.get("keywords", {})
+        self.gazetteer = config.get("gazetteer", {})
+        self.areas = [area for areas in self.gazetteer.values() for area in areas]
+        self.newsapi = config.get("newsapi")
+        self.feeds = config.get("feeds", [])
+        self.x = config.get("x")
+        self._matchers = {}
+
+    def matcher(self, keywords=None):
+        """Keyword categories (the city's, or a source's own) plus "area" and "city", compiled into one matcher.
+
+        Compiled once per keyword list; cities with the same lists and places share it.
+        """
+        key = None if keywords is None else _frozen(keywords)
+        matcher = self._matchers.get(key)
+        if matcher is None:
+            categories = dict(keywords if keywords is not None else self.keywords)
+            categories.update(area=self.areas, city=self.names)
+            # place names must end on a word boundary ("Bow" does not match "elbow")
+            matcher = self._matchers[key] = shared_matcher(_frozen(categories), ("area", "city"))
+        return matcher
+
+    @property
+    def place_matcher(self):
+        return self.matcher({})
+
+    def find(self, text, keywords=None):
+        """Hits per keyword category plus "area" (gazetteer) and "city", in one pass: {category: {term, ...}}."""
+        return self.matcher(keywords).find(text)
+
+    def is_local(self, text):
+        hits = self.place_matcher.find(text)
+        return bool(hits["city"] or hits["area"])
+
+    @property
+    def state_dir(self):
+        path = os.path.join(STATE_DIR, self.name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def state_path(self, filename):
+        return os.path.join(self.state_dir, filename)
+
+    def load_watermark(self, source):
+        """Epoch of the newest stored item of the source, or None; raises FileNotFoundError if never saved."""
+        paths = [self.state_path(f"{source}.json")] + [
+            path for path, owner in LEGACY_STATE_FILES.items() if owner == (self.name, source)]
+        for path in paths:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                return data.get("last_ts") or to_epoch(data.get("last_date"))
+        raise FileNotFoundError(paths[0])
+
+    def save_watermark(self, source, last_ts):
+        path = self.state_path(f"{source}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"last_date": from_epoch(last_ts).isoformat(), "last_ts": last_ts}, f, indent=2)
+        os.replace(tmp, path)
+
+
+def city_names(cities_dir=CITIES_DIR):
+    return sorted(name[:-5] for name in os.listdir(cities_dir) if name.endswith(".json"))
+
+
+@lru_cache(maxsize=None)
+def load_city(name, cities_dir=CITIES_DIR):
+    """City config by name; cached, so worker processes of the CPU stage load each city once."""
+    with open(os.path.join(cities_dir, f"{name}.json"), "r", encoding="utf-8") as f:
+        return City(json.load(f))
+
+
+def load_cities(names=None, cities_dir=CITIES_DIR):
+    return [load_city(name, cities_dir) for name in (names or city_names(cities_dir))]
@@ -0,0 +1,76 @@
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+# CONFIGURATION
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", os.cpu_count() or 1))
+CHUNK_SIZE = 16  # items per task sent to a worker process
+MAX_PENDING = 2  # chunks in flight per worker; bounds memory when results are consumed slowly
+
+
+def _run_chunk(fn, chunk):
+    return [fn(item) for item in chunk]
+
+
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CpuStage:
+    """Process pool for the CPU-bound steps of the scrapers (date parsing, HTML extraction, matching).
+
+    fn must be a module-level function and items must be picklable. With workers <= 1 everything
+    runs inline, without a pool. Safe to share between threads; async callers run map in a
+    worker thread (daemon.py Job.call), so the event loop is never blocked. Use as a context
+    manager (or call close) to shut the worker processes down.
+    """
+
+    def __init__(self, workers=CPU_WORKERS, chunk_size=CHUNK_SIZE):
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.pool = None
+        if self.workers > 1:
+            # spawn: the callers run fetcher/browser threads, which fork would copy mid-state
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def call(self, fn, *args):
+        """fn(*args) in a worker process; blocks the calling thread only (the GIL is released while waiting)."""
+        if self.pool is None:
+            return fn(*args)
+        return self.pool.submit(fn, *args).result()
+
+    def map(self, fn, items, chunk_size=None):
+        """Yield fn(item) for every item, in input order, as soon as each chunk is done."""
+        chunks = _chunks(items, chunk_size or self.chunk_size)
+        if self.pool is None:
+            for chunk in chunks:
+                yield from _run_chunk(fn, chunk)
+            return
+
+        pending = deque()
+        for chunk in chunks:
+            pending.append(self.pool.submit(_run_chunk, fn, chunk))
+            if len(pending) >= self.workers * MAX_PENDING:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
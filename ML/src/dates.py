@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from dateutil import parser as dateparser
+
+
+def parse_date(value, tz=timezone.utc):
+    """Aware UTC datetime from a date string, or None if it cannot be parsed.
+
+    Known formats take a fast path: ISO 8601 (NewsAPI publishedAt, X, our own "data" field)
+    and RFC 822 (RSS pubDate). dateutil is the fallback for anything else. Dates without an
+    offset are taken to be in tz (the source city's timezone), UTC by default.
+    """
+    if isinstance(value, datetime):
+        dt = value
+    elif not isinstance(value, str) or not value.strip():
+        return None
+    else:
+        text = value.strip()
+        dt = None
+        try:
+            dt = datetime.fromisoformat(text.replace('Z', '+00:00') if text.endswith('Z') else text)
+        except ValueError:
+            try:
+                dt = parsedate_to_datetime(text)
+            except (TypeError, ValueError, IndexError):
+                try:
+                    dt = dateparser.parse(text)
+                except (ValueError, OverflowError):
+                    return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=tz)
+    return dt.astimezone(timezone.utc)
+
+
+def to_epoch(value, tz=timezone.utc):
+    """UTC epoch seconds of a date string (see parse_date), or None."""
+    dt = parse_date(value, tz)
+    return dt.timestamp() if dt else None
+
+
+def from_epoch(ts):
+    return datetime.fromtimestamp(ts, timezone.utc)
+
+
+def stamp(item, dt=None):
+    """Set item["data_ts"] (the numeric date used for sorting and watermarks) once, at ingest.
+
+    dt: the already parsed date of the item, if the caller has it; otherwise item["data"] is parsed.
+    """
+    if "data_ts" not in item:
+        dt = parse_date(dt if dt is not None else item.get("data"))
+        item["data_ts"] = dt.timestamp() if dt else None
+    return item
@@ -0,0 +1,129 @@
+import os
+
+# Optional fast parsers; BeautifulSoup (html.parser) stays as the fallback backend
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+try:
+    import lxml.html as lxml_html
+except ImportError:
+    lxml_html = None
+
+from bs4 import BeautifulSoup
+
+
+# CONFIGURATION
+DROP_TAGS = ['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe']
+MIN_SECTION_CHARS = 200  # article/main text shorter than this falls back to the next scope
+MIN_CONTENT_CHARS = 100  # shorter results are treated as "no content"
+
+
+def _choose(article_texts, main_texts, all_texts, has_article, has_main):
+    """Apply the article -> main -> whole document fallback to paragraphs collected in one pass."""
+    content = ""
+    if has_article:
+        content = ' '.join(article_texts)
+    if len(content) < MIN_SECTION_CHARS and has_main:
+        content = ' '.join(main_texts)
+    if len(content) < MIN_SECTION_CHARS:
+        content = ' '.join(all_texts)
+    content = ' '.join(content.split())
+    return content if len(content) > MIN_CONTENT_CHARS else ""
+
+
+def _collect(paragraphs, text_of, ancestors_of, article_id, main_id):
+    article_texts, main_texts, all_texts = [], [], []
+    for p in paragraphs:
+        text = text_of(p).strip()
+        if not text:
+            continue
+        all_texts.append(text)
+        in_article = in_main = False
+        for ancestor_id in ancestors_of(p):
+            if ancestor_id == article_id:
+                in_article = True
+            if ancestor_id == main_id:
+                in_main = True
+        if in_article:
+            article_texts.append(text)
+        if in_main:
+            main_texts.append(text)
+    return article_texts, main_texts, all_texts
+
+
+def _extract_selectolax(html):
+    tree = SelectolaxParser(html)
+    tree.strip_tags(DROP_TAGS)
+    article = tree.css_first('article')
+    main = tree.css_first('main')
+
+    def ancestors(node):
+        node = node.parent
+        while node is not None:
+            yield node.mem_id
+            node = node.parent
+
+    texts = _collect(
+        tree.css('p'), lambda p: p.text(deep=True), ancestors,
+        article.mem_id if article is not None else None,
+        main.mem_id if main is not None else None,
+    )
+    return _choose(*texts, article is not None, main is not None)
+
+
+def _extract_lxml(html):
+    if not html.strip():
+        return ""
+    try:
+        doc = lxml_html.document_fromstring(html)
+    except ValueError:
+        # str input with an XML encoding declaration
+        doc = lxml_html.document_fromstring(html.encode('utf-8'))
+    for element in list(doc.iter(*DROP_TAGS)):
+        element.drop_tree()
+    article = next(doc.iter('article'), None)
+    main = next(doc.iter('main'), None)
+
+    texts = _collect(
+        doc.iter('p'), lambda p: p.text_content(), lambda p: map(id, p.iterancestors()),
+        id(article) if article is not None else None,
+        id(main) if main is not None else None,
+    )
+    return _choose(*texts, article is not None, main is not None)
+
+
+def _extract_bs4(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(DROP_TAGS):
+        element.decompose()
+    article = soup.find('article')
+    main = soup.find('main')
+
+    texts = _collect(
+        soup.find_all('p'), lambda p: p.get_text(), lambda p: map(id, p.parents),
+        id(article) if article is not None else None,
+        id(main) if main is not None else None,
+    )
+    return _choose(*texts, article is not None, main is not None)
+
+
+BACKENDS = {'bs4': _extract_bs4}
+if lxml_html is not None:
+    BACKENDS['lxml'] = _extract_lxml
+if SelectolaxParser is not None:
+    BACKENDS['selectolax'] = _extract_selectolax
+
+# Fastest installed backend unless EXTRACT_BACKEND says otherwise
+DEFAULT_BACKEND = os.getenv('EXTRACT_BACKEND') or next(
+    name for name in ('selectolax', 'lxml', 'bs4') if name in BACKENDS
+)
+
+
+def extract_article_text(html, backend=None):
+    """Extract the main article text from an HTML page (single pass over <p> elements)"""
+    return BACKENDS[backend or DEFAULT_BACKEND](html)
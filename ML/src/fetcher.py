@@ -0,0 +1,88 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# CONFIGURATION
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+MAX_WORKERS = 8
+PER_HOST_DELAY = 2.0  # seconds between request starts to the same host
+PER_HOST_CONCURRENCY = 2
+TIMEOUT = 15
+
+
+class _HostSlot:
+    def __init__(self, concurrency):
+        self.semaphore = threading.BoundedSemaphore(concurrency)
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+
+class PoliteFetcher:
+    """Bounded thread pool with one keep-alive session and per-host politeness limits."""
+
+    def __init__(self, max_workers=MAX_WORKERS, per_host_delay=PER_HOST_DELAY,
+                 per_host_concurrency=PER_HOST_CONCURRENCY, timeout=TIMEOUT, headers=None):
+        self.max_workers = max_workers
+        self.per_host_delay = per_host_delay
+        self.per_host_concurrency = per_host_concurrency
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or {'User-Agent': USER_AGENT})
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._hosts_lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = _HostSlot(self.per_host_concurrency)
+            return slot
+
+    def _wait_turn(self, slot):
+        # reserve the next start time for this host, then sleep outside the lock
+        with slot.lock:
+            now = time.monotonic()
+            start = max(now, slot.next_start)
+            slot.next_start = start + self.per_host_delay
+        if start > now:
+            time.sleep(start - now)
+
+    def get(self, url, **kwargs):
+        """GET with per-host pacing; other hosts are not delayed."""
+        slot = self._host_slot(url)
+        with slot.semaphore:
+            self._wait_turn(slot)
+            return self.session.get(url, timeout=self.timeout, **kwargs)
+
+    def map(self, fn, urls):
+        """Run fn(url) for every url on the pool; returns {url: result} (None if fn raised)."""
+        results = {}
+        unique_urls = list(dict.fromkeys(urls))
+        if not unique_urls:
+            return results
+
+        def run(url):
+            try:
+                return fn(url)
+            except Exception as e:
+                print(f"Could not fetch {url}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for url, result in zip(unique_urls, pool.map(run, unique_urls)):
+                results[url] = result
+        return results
+
+    def close(self):
+        self.session.close()
@@ -1,127 +1,155 @@
 import requests
 from bs4 import BeautifulSoup
-import json
+import sys
 import time
-from datetime import datetime
-from dateutil import parser as dateparser
+import functools
+from datetime import datetime, timezone
 
+from incident_store import IncidentStore, DB_FILE, backpressure_delay
+from http_cache import HttpCache
+from cities import load_city
+from dates import parse_date
+from cpu_stage import CpuStage
 
-KEYWORDS_CRIME = ["crime", "attack", "shooting", "theft", "assault", "violence", "murder", "robbery", "vandalisme", "burglary", "arrest", "homicide"]
-KEYWORDS_DEMO = ["protest", "demonstration", "manifestation", "strike", "riot", "march", "protester"]
-OUTPUT_FILE = "paris_crime_news.json"
-STATE_FILE = "latest_article_state.json"
-CHECK_INTERVAL = 15 * 60  
 
-def fetch_google_news():
-    url = "https://news.google.com/rss/search?q=Paris+France+crime+OR+protest+OR+demonstration&hl=en&gl=FR&ceid=FR:en"
-    response = requests.get(url)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, "xml")
-    items = soup.find_all("item")
-    return items
+# Keywords and feed URLs come from the city config (cities/<name>.json)
+CITY = "paris"  # default city of this script
+CHECK_INTERVAL = 15 * 60  
 
-def analyze_article(title, description):
-    text = f"{title} {description}".lower()
-    is_crime = any(word in text for word in KEYWORDS_CRIME)
-    is_demo = any(word in text for word in KEYWORDS_DEMO)
-    return is_crime, is_demo
-
-def parse_articles(items):
-    news_data = []
-    for item in items:
-        title = item.title.text.strip()
-        description = item.description.text.strip() if item.description else ""
-        link = item.link.text.strip()
-        pub_date_text = item.pubDate.text if item.pubDate else datetime.now().isoformat()
-        try:
-            pub_date = dateparser.parse(pub_date_text)
-        except Exception:
-            pub_date = datetime.now()
-
-        if "paris" not in title.lower() and "paris" not in description.lower() and "paryż" not in title.lower():
-            continue
-
-        is_crime, is_demo = analyze_article(title, description)
-
-        if not (is_crime or is_demo):
-            continue
-
-        news_item = {
-            "url": link,
-            "title": title,
-            "context": f"{title} - {description}",
-            "czy_demonstracja": is_demo,
-            "czy_przestepstwo": is_crime,
-            "data": pub_date.isoformat()
-            
-        }
-        news_data.append(news_item)
-
-    return news_data
-
-def load_last_state():
-    try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return dateparser.parse(data.get("last_date"))
-    except Exception:
+def fetch_google_news(session, cache, url):
+    # conditional GET: an unchanged feed (304) is neither downloaded nor parsed again; the
+    # validators advance only when run_cycle commits the feed after storing its items
+    text, status = cache.get(session.get, url, commit=False)
+    if status != "downloaded":
+        print("Feed not modified since last check")
         return None
+    return text
+
+def feed_items(text):
+    """RSS XML -> plain (title, description, link, pubDate) tuples; runs in the CPU stage."""
+    items = []
+    for item in BeautifulSoup(text, "xml").find_all("item"):
+        items.append((
+            item.title.text.strip(),
+            item.description.text.strip() if item.description else "",
+            item.link.text.strip(),
+            item.pubDate.text if item.pubDate else None,
+        ))
+    return items
 
-def save_last_state(last_date):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump({"last_date": last_date.isoformat()}, f)
+def analyze_article(title, description, city):
+    hits = city.find(f"{title} {description}")
+    return bool(hits.get("crime")), bool(hits.get("protest")), bool(hits["city"] or hits["area"])
 
-def save_to_json(data):
-    try:
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            existing = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        existing = []
+def parse_item(item, city=CITY):
+    """One feed item -> news item, or None when it is not about crime/protests in the city (a config name)."""
+    city = load_city(city)
+    title, description, link, pub_date_text = item
+    pub_date = parse_date(pub_date_text, city.timezone) or datetime.now(timezone.utc)
 
-    existing_urls = {item["url"] for item in existing}
-    new_data = [item for item in data if item["url"] not in existing_urls]
+    is_crime, is_demo, is_local = analyze_article(title, description, city)
 
-    if not new_data:
-        print("No new articles")
+    if not is_local:
         return None
 
-    existing.extend(new_data)
-    existing.sort(key=lambda x: x["data"], reverse=True)
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(existing, f, ensure_ascii=False, indent=2)
-
-    print(f" Saved {len(new_data)} new article to {OUTPUT_FILE}")
-    latest_date = max(dateparser.parse(a["data"]) for a in new_data)
-    return latest_date
-
-def main():
-
-    last_saved_date = load_last_state()
+    if not (is_crime or is_demo):
+        return None
 
-    while True:
-        try:
-            items = fetch_google_news()
-            news_data = parse_articles(items)
+    return {
+        "url": link,
+        "title": title,
+        "context": f"{title} - {description}",
+        "czy_demonstracja": is_demo,
+        "czy_przestepstwo": is_crime,
+        "data": pub_date.isoformat(),
+        "data_ts": pub_date.timestamp(),
+    }
+
+def parse_articles(items, stage=None, city=None):
+    if stage is None:
+        with CpuStage(workers=1) as stage:
+            return parse_articles(items, stage, city)
+    city = city or load_city(CITY)
+    parse = functools.partial(parse_item, city=city.name)
+    return [news_item for news_item in stage.map(parse, items) if news_item]
+
+def load_last_state(city, source):
+    try:
+        return city.load_watermark(source)
+    except Exception:
+        return None
 
-            if last_saved_date:
-                # Filtruj tylko artykuły nowsze niż ostatnio zapisany
-                news_data = [
-                    a for a in news_data
-                    if dateparser.parse(a["data"]) > last_saved_date
-                ]
+def save_last_state(city, source, last_ts):
+    city.save_watermark(source, last_ts)
 
-            if news_data:
-                latest_date = save_to_json(news_data)
-                if latest_date:
-                    save_last_state(latest_date)
-            else:
-                print("No new relevant articles found")
+def save_incidents(store, data, source):
+    new_data = store.upsert_many(data, source)
 
-        except Exception as e:
-            print("error:", e)
+    if not new_data:
+        print("No new articles")
+        return [], None
+
+    print(f" Saved {len(new_data)} new article to {store.path}")
+    latest_ts = max((a["data_ts"] for a in new_data if a["data_ts"] is not None), default=None)
+    return new_data, latest_ts
+
+def run_cycle(store, session, cache, last_saved_ts, stage=None, city=None, feed=None):
+    """One check of one of the city's feeds (default: its first); returns (newly stored items, new last_saved_ts)."""
+    if stage is None:
+        with CpuStage(workers=1) as stage:
+            return run_cycle(store, session, cache, last_saved_ts, stage, city, feed)
+    city = city or load_city(CITY)
+    feed = feed or city.feeds[0]
+    cache.evict()
+    text = fetch_google_news(session, cache, feed["url"])
+    items = stage.call(feed_items, text) if text else []
+    news_data = parse_articles(items, stage, city)
+
+    if last_saved_ts:
+        # Filtruj tylko artykuły nowsze niż ostatnio zapisany
+        news_data = [
+            a for a in news_data
+            if a["data_ts"] is None or a["data_ts"] > last_saved_ts
+        ]
+
+    if not news_data:
+        print("No new relevant articles found")
+        cache.commit(feed["url"])
+        return [], last_saved_ts
+
+    new_data, latest_ts = save_incidents(store, news_data, feed["source"])
+    if latest_ts:
+        save_last_state(city, feed["source"], latest_ts)
+        last_saved_ts = latest_ts
+    # the items are stored; only now may the next check get a 304 for this body
+    cache.commit(feed["url"])
+    return new_data, last_saved_ts
+
+def main(city_name=CITY):
+    city = load_city(city_name)
+    store = IncidentStore(DB_FILE)
+    session = requests.Session()
+    cache = HttpCache()
+    stage = CpuStage()
+    last_saved_ts = {feed["source"]: load_last_state(city, feed["source"]) for feed in city.feeds}
 
-        print(f" Next check at {CHECK_INTERVAL / 60:.0f} minut...")
-        time.sleep(CHECK_INTERVAL)
+    try:
+        while True:
+            for feed in city.feeds:
+                try:
+                    _, last_saved_ts[feed["source"]] = run_cycle(
+                        store, session, cache, last_saved_ts[feed["source"]], stage, city, feed)
+                except Exception as e:
+                    print("error:", e)
+
+            # wait longer while the labeler is behind (ML/main.py --follow)
+            delay = backpressure_delay(CHECK_INTERVAL, store.backlog())
+            print(f" Next check at {delay / 60:.0f} minut...")
+            time.sleep(delay)
+    finally:
+        stage.close()
+        cache.close()
+        store.close()
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else CITY)
@@ -0,0 +1,124 @@
+import time
+import sqlite3
+import threading
+
+
+# CONFIGURATION
+CACHE_FILE = "http_cache.sqlite"
+ARTICLE_TTL = 7 * 24 * 60 * 60  # extracted article text is reused for a week without any request
+EVICT_AFTER = 30 * 24 * 60 * 60  # entries untouched for this long are dropped
+
+
+class HttpCache:
+    """On-disk cache of (transformed) response bodies with ETag/Last-Modified validators.
+
+    Safe to share between the fetcher's worker threads.
+    """
+
+    def __init__(self, path=CACHE_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " body TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_fetched_at ON responses(fetched_at)")
+        self.conn.commit()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.pending = {}  # url -> (etag, last_modified, body) downloaded with commit=False
+
+    def _lookup(self, url):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified, body, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _store(self, url, etag, last_modified, body):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, body, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body, time.time()),
+            )
+            self.conn.commit()
+
+    def _touch(self, url):
+        with self.lock:
+            self.conn.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+
+    def _count(self, counter):
+        # get() runs in the fetcher's worker threads
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, get, url, transform=None, max_age=0, commit=True):
+        """Fetch url through the cache.
+
+        get(url, headers=...) performs the request (e.g. PoliteFetcher.get or session.get).
+        transform(text) is applied once per downloaded body and its result is what gets
+        cached and returned (e.g. extracted article text instead of the full HTML).
+        Entries younger than max_age seconds are returned without any request; older ones
+        are revalidated with If-None-Match / If-Modified-Since.
+        Returns (body, status) where status is "fresh", "not_modified" or "downloaded".
+        An empty body (e.g. a failed extraction) is returned but not cached, so the next
+        call downloads the page again. With commit=False a downloaded body is only cached
+        (and its validators used) once commit(url) is called: a feed whose items were not
+        processed because the cycle failed is downloaded again instead of answered by a 304.
+        """
+        row = self._lookup(url)
+        headers = {}
+        if row:
+            etag, last_modified, body, fetched_at = row
+            if time.time() - fetched_at < max_age:
+                self._count("hits")
+                return body, "fresh"
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = get(url, headers=headers)
+        if row and response.status_code == 304:
+            self._count("revalidated")
+            self._touch(url)
+            return row[2], "not_modified"
+
+        response.raise_for_status()
+        self._count("misses")
+        body = transform(response.text) if transform else response.text
+        if body and body.strip():
+            entry = (response.headers.get('ETag'), response.headers.get('Last-Modified'), body)
+            if commit:
+                self._store(url, *entry)
+            else:
+                with self.lock:
+                    self.pending[url] = entry
+        return body, "downloaded"
+
+    def commit(self, url):
+        """Cache the body downloaded by get(url, commit=False), once it has been processed."""
+        with self.lock:
+            entry = self.pending.pop(url, None)
+        if entry is not None:
+            self._store(url, *entry)
+
+    def evict(self, older_than=EVICT_AFTER):
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM responses WHERE fetched_at < ?", (time.time() - older_than,))
+            self.conn.commit()
+        return cur.rowcount
+
+    def stats(self):
+        return f"HTTP cache: {self.hits} fresh, {self.revalidated} not modified (304), {self.misses} downloaded"
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+
+from dates import stamp
+
+
+# CONFIGURATION
+DB_FILE = "incidents.sqlite"
+
+# Legacy JSON export file of the original sources; other sources (from cities/*.json) export to <source>.json
+SOURCES = {
+    "newsapi_london": "london_crime_news.json",
+    "google_news_paris": "paris_crime_news.json",
+    "x": "all_accounts_filtered_tweets.json",
+}
+
+LABELER = "labeler"  # consumer name of the labeler's follow mode (ML/main.py --follow)
+BACKLOG_TARGET = 200  # unlabeled incidents above which the scrapers poll less often
+MAX_SLOWDOWN = 4  # at most this many times the normal interval
+
+
+class IncidentStore:
+    """Append-only incident store shared by all scrapers (SQLite in WAL mode)."""
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        # WAL lets the scrapers write from separate processes while exports read
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS incidents ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " url TEXT NOT NULL UNIQUE,"
+            " source TEXT NOT NULL,"
+            " data TEXT,"
+            " data_ts REAL,"
+            " payload TEXT NOT NULL,"
+            " inserted_at REAL NOT NULL)"
+        )
+        self._migrate()
+        self.conn.execute("CREATE INDEX IF NOT EXISTS incidents_data_ts ON incidents(data_ts)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS incidents_source_data_ts ON incidents(source, data_ts)")
+        # per-account scraping state (newest harvested tweet, recently seen texts)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS account_state ("
+            " account TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        # how far each stream consumer got (last processed incident id)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS consumer_offsets ("
+            " consumer TEXT PRIMARY KEY,"
+            " last_id INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def _migrate(self):
+        # stores created before data_ts: add the column and parse the stored dates once
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(incidents)")}
+        if "data_ts" in columns:
+            return
+        with self.conn:
+            self.conn.execute("ALTER TABLE incidents ADD COLUMN data_ts REAL")
+            self.conn.execute("DROP INDEX IF EXISTS incidents_data")
+            self.conn.execute("DROP INDEX IF EXISTS incidents_source_data")
+            rows = self.conn.execute("SELECT id, payload FROM incidents").fetchall()
+            updates = []
+            for row_id, payload in rows:
+                item = stamp(json.loads(payload))
+                updates.append((item["data_ts"], json.dumps(item, ensure_ascii=False), row_id))
+            self.conn.executemany("UPDATE incidents SET data_ts = ?, payload = ? WHERE id = ?", updates)
+
+    def upsert_many(self, items, source):
+        """Insert items in one transaction; returns the ones whose url was not stored yet.
+
+        Items without "data_ts" get it here (parsed from "data").
+        """
+        new_items = []
+        seen = set()
+        now = time.time()
+        with self.conn:
+            for item in items:
+                url = item.get("url")
+                if not url or url in seen:
+                    continue
+                seen.add(url)
+                stamp(item)
+                cur = self.conn.execute(
+                    "INSERT INTO incidents (url, source, data, data_ts, payload, inserted_at) VALUES (?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(url) DO NOTHING",
+                    (url, source, item.get("data"), item["data_ts"], json.dumps(item, ensure_ascii=False), now),
+                )
+                if cur.rowcount:
+                    new_items.append(item)
+        return new_items
+
+    def known_urls(self, source=None):
+        if source:
+            rows = self.conn.execute("SELECT url FROM incidents WHERE source = ?", (source,))
+        else:
+            rows = self.conn.execute("SELECT url FROM incidents")
+        return {row[0] for row in rows}
+
+    def sources(self):
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT source FROM incidents ORDER BY source")]
+
+    def count(self, source=None):
+        if source:
+            return self.conn.execute("SELECT COUNT(*) FROM incidents WHERE source = ?", (source,)).fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
+
+    def iter_items(self, source=None):
+        """Stored items, newest first (undated ones last)."""
+        query = "SELECT payload FROM incidents"
+        params = ()
+        if source:
+            query += " WHERE source = ?"
+            params = (source,)
+        query += " ORDER BY data_ts DESC"  # NULLs sort last in descending order
+        for (payload,) in self.conn.execute(query, params):
+            yield json.loads(payload)
+
+    def export_json(self, output_file, source=None):
+        """Write the legacy JSON array (same shape the scrapers used to write)."""
+        items = list(self.iter_items(source))
+        tmp_file = output_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(items, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, output_file)
+        return len(items)
+
+    def items_after(self, last_id, limit=100, source=None):
+        """[(id, item)] of incidents stored after last_id, in insertion order."""
+        query = "SELECT id, payload FROM incidents WHERE id > ?"
+        params = [last_id]
+        if source:
+            query += " AND source = ?"
+            params.append(source)
+        query += " ORDER BY id LIMIT ?"
+        params.append(limit)
+        return [(row_id, json.loads(payload)) for row_id, payload in self.conn.execute(query, params)]
+
+    def get_offset(self, consumer):
+        row = self.conn.execute("SELECT last_id FROM consumer_offsets WHERE consumer = ?", (consumer,)).fetchone()
+        return row[0] if row else 0
+
+    def set_offset(self, consumer, last_id):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO consumer_offsets (consumer, last_id, updated_at) VALUES (?, ?, ?)",
+                (consumer, last_id, time.time()),
+            )
+
+    def backlog(self, consumer=LABELER):
+        """Incidents the consumer has not processed yet (0 while no such consumer follows the store)."""
+        row = self.conn.execute("SELECT last_id FROM consumer_offsets WHERE consumer = ?", (consumer,)).fetchone()
+        if row is None:
+            return 0
+        return self.conn.execute("SELECT COUNT(*) FROM incidents WHERE id > ?", (row[0],)).fetchone()[0]
+
+    def load_account_states(self, accounts):
+        """{account: state dict} for the given accounts ({} for accounts never scraped)."""
+        states = {account: {} for account in accounts}
+        for account, state in self.conn.execute("SELECT account, state FROM account_state"):
+            if account in states:
+                states[account] = json.loads(state)
+        return states
+
+    def save_account_states(self, states):
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO account_state (account, state, updated_at) VALUES (?, ?, ?)",
+                [(account, json.dumps(state, ensure_ascii=False), now) for account, state in states.items()],
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def backpressure_delay(delay, backlog, target=BACKLOG_TARGET, max_slowdown=MAX_SLOWDOWN):
+    """Polling interval stretched in proportion to the backlog once it exceeds target."""
+    if backlog <= target:
+        return delay
+    return delay * min(max_slowdown, backlog / target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incident store utilities")
+    parser.add_argument("--db", default=DB_FILE, help="SQLite database file")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="Export a source to its legacy JSON file")
+    export.add_argument("source", help=f"Source name, e.g. {', '.join(sorted(SOURCES))}")
+    export.add_argument("output", nargs="?", help="Output JSON file (default: the scraper's old file name or <source>.json)")
+
+    sub.add_parser("stats", help="Print item counts per source")
+
+    args = parser.parse_args()
+    store = IncidentStore(args.db)
+    try:
+        if args.command == "export":
+            output_file = args.output or SOURCES.get(args.source, f"{args.source}.json")
+            count = store.export_json(output_file, args.source)
+            print(f"Exported {count} items from '{args.source}' to {output_file}")
+        elif args.command == "stats":
+            for source in store.sources():
+                print(f"{source}: {store.count(source)}")
+            print(f"total: {store.count()}")
+            print(f"unlabeled ({LABELER}): {store.backlog(LABELER)}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import re
+from functools import lru_cache
+
+
+def _trie_pattern(terms):
+    """Regex alternation factored by common prefixes; terms maps key -> (.., .., strict)."""
+    trie = {}
+    for key, (_, _, strict) in terms.items():
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[None] = strict  # end of a term; strict terms need a trailing word boundary
+
+    def build(node):
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items(), key=lambda kv: kv[0] or '') if ch is not None]
+        if None not in node:
+            return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if not branches:
+            return r'\b' if node[None] else ''
+        exit_ = r'\b' if node[None] else ''
+        return '(?:' + '|'.join(branches + [exit_]) + ')'
+
+    return build(trie)
+
+
+class TermMatcher:
+    """Keyword and gazetteer lists compiled once into a single regex (matched case-insensitively).
+
+    categories maps a category name to its terms. Terms must start on a word boundary;
+    terms of categories listed in whole_word must also end on one (place names: "Bow"
+    does not match "elbow"), the others may carry a suffix (keyword stems: "attack"
+    matches "attacked"). find() reports every category hit in one pass over the text,
+    including shorter terms contained in a longer match ("Clapham" in "Clapham Junction").
+    """
+
+    def __init__(self, categories, whole_word=()):
+        self.categories = {name: list(terms) for name, terms in categories.items()}
+        whole_word = set(whole_word)
+
+        # lowercased term -> (canonical spelling, {categories}, needs trailing boundary)
+        terms = {}
+        for name, category_terms in self.categories.items():
+            for term in category_terms:
+                key = term.lower()
+                canonical, names, strict = terms.get(key, (term, set(), False))
+                names.add(name)
+                terms[key] = (canonical, names, strict or name in whole_word)
+
+        def pattern(key, strict):
+            return re.escape(key) + (r'\b' if strict else '')
+
+        # one regex shaped like a character trie: at every word start the engine follows
+        # a single branch instead of trying each term in turn; greedy branches prefer the
+        # longest term ("clapham junction" over "clapham"). Text is lowercased up front.
+        self._regex = re.compile(r'\b' + _trie_pattern(terms)) if terms else None
+
+        # hits implied by each term: itself plus every other term matching inside it
+        self._implied = {}
+        for key in terms:
+            hits = []
+            for other in terms:
+                if other == key or re.search(r'\b' + pattern(other, terms[other][2]), key):
+                    canonical, names, _ = terms[other]
+                    hits.extend((name, canonical) for name in names)
+            self._implied[key] = hits
+
+    def find(self, text):
+        """All matched terms per category: {category: {canonical term, ...}}."""
+        found = {name: set() for name in self.categories}
+        if not text or self._regex is None:
+            return found
+        for key in self._regex.findall(text.lower()):
+            for name, canonical in self._implied[key]:
+                found[name].add(canonical)
+        return found
+
+    def contains(self, text, category):
+        if not text or self._regex is None:
+            return False
+        # stops at the first hit of the category
+        for match in self._regex.finditer(text.lower()):
+            if any(name == category for name, _ in self._implied[match.group(0)]):
+                return True
+        return False
+
+
+@lru_cache(maxsize=None)
+def matcher_for(terms, whole_word=False):
+    """Shared single-category matcher for a tuple of terms (compiled on first use)."""
+    return TermMatcher({'terms': terms}, whole_word=('terms',) if whole_word else ())
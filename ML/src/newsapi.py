@@ -0,0 +1,366 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import lru_cache
+
+import requests
+
+from dates import to_epoch, from_epoch
+
+
+# CONFIGURATION
+NEWSAPI_URL = os.getenv("NEWSAPI_URL", "https://newsapi.org/v2/everything")  # e.g. newsapi_fixture_server.py
+PAGE_SIZE = 100
+MAX_RESULTS = 100  # developer plan: results past the first 100 of a query are refused (maximumResultsReached)
+DAILY_QUOTA = 100  # developer plan: requests per day, reset at midnight UTC
+QUOTA_RESERVE = 5  # requests left for manual runs and restarts
+MAX_CALLS_PER_CYCLE = 20  # a single backfill must not spend the whole day
+MAX_QUERY_LENGTH = 500  # NewsAPI limit for q
+DEFAULT_INTERVAL = 15 * 60  # until an arrival rate has been observed
+MIN_INTERVAL = 5 * 60
+MAX_INTERVAL = 2 * 60 * 60
+TARGET_PER_POLL = 50  # aim for half a page of new articles per poll, so pages rarely saturate
+INDEX_LAG = 15 * 60  # articles show up in the index up to this long after their publishedAt
+RATE_SMOOTHING = 0.3  # weight of the latest observation in the arrival rate / calls per cycle averages
+TIMEOUT = 15
+
+
+def quote(term):
+    return f'"{term}"' if ' ' in term or "'" in term else term
+
+
+def build_query(base, areas=None):
+    """NewsAPI q: base, narrowed to articles mentioning one of the areas."""
+    if not areas:
+        return base
+    return f"{base} AND ({' OR '.join(quote(a) for a in areas)})"
+
+
+def split_areas(base, areas):
+    """Halve an area group until every shard query fits MAX_QUERY_LENGTH."""
+    if len(areas) <= 1 or len(build_query(base, areas)) <= MAX_QUERY_LENGTH:
+        return [areas]
+    mid = len(areas) // 2
+    return split_areas(base, areas[:mid]) + split_areas(base, areas[mid:])
+
+
+class NewsApiClient:
+    """One /v2/everything request per call; returns (articles, totalResults, error code or None)."""
+
+    def __init__(self, api_key, url=NEWSAPI_URL, timeout=TIMEOUT):
+        self.api_key = api_key
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def everything(self, query, from_date, page=1, page_size=PAGE_SIZE):
+        params = {
+            'q': query,
+            'language': 'en',
+            'sortBy': 'publishedAt',
+            'from': from_date,
+            'apiKey': self.api_key,
+            'pageSize': page_size,
+            'page': page,
+        }
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Network error: {e}")
+            return [], 0, "networkError"
+        if data.get('status') != 'ok':
+            code = data.get('code') or f"http{response.status_code}"
+            print(f"API Error ({code}): {data.get('message', 'Unknown error')}")
+            return [], 0, code
+        return data.get('articles', []), data.get('totalResults', 0), None
+
+    def close(self):
+        self.session.close()
+
+
+def quota_path(api_key, state_dir):
+    """Quota state file of an API key; named by a hash, the key itself is not written to disk."""
+    digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(state_dir, f"newsapi_quota_{digest}.json")
+
+
+class DailyQuota:
+    """Daily request budget of one API key, shared by every planner (city) that uses the key.
+
+    Every change is a read-modify-write of the state file under an exclusive flock on
+    a side lock file, so scrapers in separate processes draw from the same budget. Planners reserve their allowance before fetching and release
+    what they did not use. Each planner also records its average calls per cycle
+    ("demand") so the poll intervals spread the remaining quota over all of them.
+    """
+
+    def __init__(self, path, quota=DAILY_QUOTA):
+        self.path = path
+        self.quota = quota
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        # the thread lock orders this process's planners, the flock other processes
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self.lock, open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, now):
+        state = {"day": None, "used": 0, "demand": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        day = from_epoch(now).strftime('%Y-%m-%d')
+        if state["day"] != day:
+            state["day"] = day
+            state["used"] = 0
+        return state
+
+    def _save(self, state):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def _left(self, state):
+        return max(0, self.quota - QUOTA_RESERVE - state["used"])
+
+    def remaining(self, now=None):
+        with self._locked():
+            return self._left(self._load(time.time() if now is None else now))
+
+    def reserve(self, calls, now):
+        """Take up to calls requests from today's budget; returns how many were granted."""
+        with self._locked():
+            state = self._load(now)
+            granted = min(calls, self._left(state))
+            state["used"] += granted
+            self._save(state)
+            return granted
+
+    def release(self, calls, now):
+        if calls <= 0:
+            return
+        with self._locked():
+            state = self._load(now)
+            state["used"] = max(0, state["used"] - calls)
+            self._save(state)
+
+    def exhaust(self, now):
+        # the server's count wins (rateLimited); nothing is left until the reset
+        with self._locked():
+            state = self._load(now)
+            state["used"] = max(state["used"], self.quota)
+            self._save(state)
+
+    def set_demand(self, planner, calls_per_cycle, now):
+        with self._locked():
+            state = self._load(now)
+            state["demand"][planner] = {"calls_per_cycle": calls_per_cycle, "at": now}
+            self._save(state)
+
+    def demand(self, now):
+        """Calls per cycle of all planners that polled in the last day."""
+        with self._locked():
+            state = self._load(now)
+        return sum(d["calls_per_cycle"] for d in state["demand"].values() if now - d["at"] < 24 * 60 * 60)
+
+
+@lru_cache(maxsize=None)
+def shared_quota(path, quota=DAILY_QUOTA):
+    """One DailyQuota (and thread lock) per state file in this process."""
+    return DailyQuota(path, quota)
+
+
+class FetchPlanner:
+    """Paginated, sharded and quota-budgeted NewsAPI fetching for one base query.
+
+    Every query is paged (newest first) back to the watermark: the later of the caller's
+    (newest stored incident) and the newest article this planner fetched completely,
+    minus INDEX_LAG. A query whose results hit the plan's MAX_RESULTS cap is split: the
+    base query into the area groups, a group into halves, so every shard fits under the
+    cap. Requests are drawn from the API key's DailyQuota, shared with the planners of
+    other cities; the poll interval follows the observed article arrival rate and is
+    stretched so the remaining quota lasts until the daily reset. A fetch cut short by the
+    allowance is resumed on the next call, from the same watermark. The cursor (rates,
+    seen_until, unfinished shards) is kept per planner in state_path between runs.
+    """
+
+    def __init__(self, client, base_query, area_groups, state_path, quota=None,
+                 default_interval=DEFAULT_INTERVAL):
+        self.client = client
+        self.base_query = base_query
+        self.area_groups = [shard for group in area_groups for shard in split_areas(base_query, list(group))]
+        self.state_path = state_path
+        # default: a budget for the key next to the planner's own state
+        self.quota = quota or shared_quota(quota_path(client.api_key, os.path.dirname(state_path)))
+        self.default_interval = default_interval
+        self.state = {"rate": None, "calls_per_cycle": None, "last_poll": None,
+                      "seen_until": None, "resume": None}
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.state.update(json.load(f))
+        except (FileNotFoundError, ValueError):
+            pass
+        # quota use used to be kept per planner
+        self.state.pop("day", None)
+        self.state.pop("used", None)
+
+    def save(self):
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    # --- quota ---
+
+    def remaining(self, now=None):
+        return self.quota.remaining(now)
+
+    @staticmethod
+    def seconds_to_reset(now):
+        midnight = (from_epoch(now) + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight.timestamp() - now
+
+    # --- fetching ---
+
+    def fetch(self, watermark_ts=None, default_days=7, now=None):
+        """Articles published after the watermark (or in the last default_days), newest first, deduplicated."""
+        now = time.time() if now is None else now
+        seen_until = self.state["seen_until"]
+        resume = self.state["resume"]
+        if resume:
+            watermark_ts = resume["watermark"]
+            pending = resume["pending"]
+            started = resume["started"]
+            print(f"  Resuming {len(pending)} unfinished queries")
+        else:
+            if watermark_ts or seen_until:
+                watermark_ts = max(watermark_ts or 0, (seen_until or 0) - INDEX_LAG)
+            else:
+                watermark_ts = now - default_days * 24 * 60 * 60
+            pending = [None]  # None = the base query without any area restriction
+            started = now
+        from_date = from_epoch(watermark_ts).strftime('%Y-%m-%dT%H:%M:%S')
+
+        reserved = allowance = self.quota.reserve(MAX_CALLS_PER_CYCLE, now)
+        calls = 0
+        articles = {}
+        incomplete = []
+        while pending:
+            areas = pending.pop(0)
+            query = build_query(self.base_query, areas)
+            page = 1
+            saturated = False
+            while True:
+                if calls >= allowance:
+                    incomplete.append(areas)
+                    break
+                batch, total, error = self.client.everything(query, from_date, page)
+                calls += 1
+                if error == "rateLimited":
+                    self.quota.exhaust(now)  # the server's count wins; wait for the reset
+                    reserved = allowance = 0
+                    incomplete.append(areas)
+                    break
+                if error == "maximumResultsReached":
+                    saturated = True
+                    break
+                if error:
+                    incomplete.append(areas)
+                    break
+                for article in batch:
+                    if article.get('url'):
+                        articles.setdefault(article['url'], article)
+                dated = [to_epoch(a.get('publishedAt')) for a in batch]
+                oldest = min((ts for ts in dated if ts is not None), default=None)
+                if len(batch) < PAGE_SIZE or page * PAGE_SIZE >= total:
+                    break
+                if oldest is not None and oldest <= watermark_ts:
+                    break
+                if page * PAGE_SIZE >= MAX_RESULTS:
+                    saturated = True
+                    break
+                page += 1
+
+            if saturated:
+                if areas is None:
+                    shards = self.area_groups
+                elif len(areas) > 1:
+                    mid = len(areas) // 2
+                    shards = [areas[:mid], areas[mid:]]
+                else:
+                    shards = []
+                if shards:
+                    print(f"  Query saturated ({MAX_RESULTS} results), splitting into {len(shards)} shards")
+                    pending.extend(shards)
+                else:
+                    print(f"  Query for {areas} alone has more than {MAX_RESULTS} results; older ones are skipped")
+
+        published = [ts for ts in (to_epoch(a.get('publishedAt')) for a in articles.values()) if ts is not None]
+        newest = max(published + [(resume or {}).get("newest") or 0])
+        if incomplete:
+            # seen_until stays put until every shard of this watermark has been fetched
+            self.state["resume"] = {"watermark": watermark_ts, "pending": incomplete + pending,
+                                    "newest": newest, "started": started}
+            print(f"  {len(incomplete) + len(pending)} queries not finished, resumed at the next check")
+        else:
+            self.state["resume"] = None
+            if newest:
+                # shards fetched early in a resumed fetch may have had later arrivals
+                self.state["seen_until"] = max(min(newest, started), seen_until or 0)
+        self.quota.release(reserved - calls, now)
+        self._observe(now, calls, published)
+        self.save()
+        print(f"Fetched {len(articles)} articles from NewsAPI in {calls} requests "
+              f"({self.remaining(now)} left today)")
+        return sorted(articles.values(), key=lambda a: to_epoch(a.get('publishedAt')) or 0, reverse=True)
+
+    # --- scheduling ---
+
+    def _observe(self, now, calls, published):
+        last_poll = self.state["last_poll"]
+        self.state["last_poll"] = now
+        cpc = self.state["calls_per_cycle"]
+        self.state["calls_per_cycle"] = calls if cpc is None else cpc + RATE_SMOOTHING * (calls - cpc)
+        self.quota.set_demand(self.state_path, self.state["calls_per_cycle"], now)
+        if last_poll is None or now <= last_poll:
+            return
+        # arrivals since the previous poll (articles published in between)
+        rate = sum(1 for ts in published if ts > last_poll) / (now - last_poll)  # articles per second
+        old = self.state["rate"]
+        self.state["rate"] = rate if old is None else old + RATE_SMOOTHING * (rate - old)
+
+    def next_interval(self, now=None):
+        """Seconds until the next poll: arrival rate, bounded by what the remaining quota allows."""
+        now = time.time() if now is None else now
+        rate = self.state["rate"]
+        if rate is None:
+            interval = self.default_interval
+        elif rate > 0:
+            interval = min(max(TARGET_PER_POLL / rate, MIN_INTERVAL), MAX_INTERVAL)
+        else:
+            interval = MAX_INTERVAL
+
+        remaining = self.remaining(now)
+        to_reset = self.seconds_to_reset(now)
+        if remaining <= 0:
+            return to_reset + 60
+        # the remaining quota is shared by all planners of the key
+        polls_left = remaining / max(self.quota.demand(now), 1)
+        return max(interval, to_reset / polls_left)
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,166 @@
+import re
+import json
+import random
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+# CONFIGURATION
+PORT = 8766
+MAX_RESULTS = 100  # like the developer plan: page * pageSize beyond this is refused
+DAILY_QUOTA = 100
+
+SAMPLE_AREAS = [
+    "Westminster", "Soho", "Covent Garden", "Camden", "Islington", "Tottenham",
+    "Hackney", "Stratford", "Whitechapel", "Brixton", "Peckham", "Croydon",
+    "Clapham", "Kensington", "Ealing", "Hammersmith", "Wimbledon", "Elephant and Castle",
+]
+SAMPLE_STORIES = [
+    "Man stabbed in {area}, police appeal for witnesses",
+    "Shooting in {area} leaves two injured",
+    "Robbery at a {area} jewellers, suspects flee on mopeds",
+    "Murder investigation launched after attack in {area}",
+    "Phone scam targets elderly residents in {area}",
+    "New bakery opens in {area}, attack of the croissants",
+]
+
+
+def sample_articles(n, hours=48, end=None, seed=0):
+    """n London articles spread evenly over the hours before end (default: now), newest first.
+
+    Articles dated after the current time stay hidden until that time comes, so an end in
+    the future simulates arrivals while the server runs.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now(timezone.utc)
+    articles = []
+    for i in range(n):
+        published = end - timedelta(seconds=hours * 3600 * i / max(n, 1))
+        area = rng.choice(SAMPLE_AREAS)
+        title = rng.choice(SAMPLE_STORIES).format(area=area)
+        articles.append({
+            "source": {"id": None, "name": "Fixture News"},
+            "title": f"{title} #{i}",
+            "description": f"London: {title.lower()}.",
+            "content": f"Officers in {area}, London, were called on {published:%A}... [+1200 chars]",
+            "url": f"https://news.example/{i}",
+            "publishedAt": published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        })
+    return articles
+
+
+# --- q syntax: clauses joined with AND, each a term or (term OR "a phrase" OR ...) ---
+
+def _terms(clause):
+    clause = clause.strip()
+    if clause.startswith('(') and clause.endswith(')'):
+        clause = clause[1:-1]
+    return [t.strip().strip('"') for t in clause.split(' OR ')]
+
+
+def compile_query(q):
+    clauses = []
+    for clause in re.split(r'\s+AND\s+(?![^(]*\))', q):
+        terms = _terms(clause)
+        clauses.append(re.compile(r'\b(?:' + '|'.join(re.escape(t) for t in terms) + r')\b', re.IGNORECASE))
+    return lambda text: all(c.search(text) for c in clauses)
+
+
+def make_handler(articles, quota=DAILY_QUOTA, stats=None):
+    stats = stats if stats is not None else {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def reply(self, status, data):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def error(self, status, code, message):
+            self.reply(status, {"status": "error", "code": code, "message": message})
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != '/v2/everything':
+                self.error(404, "notFound", "Only /v2/everything is served")
+                return
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if not params.get('apiKey'):
+                self.error(401, "apiKeyMissing", "Your API key is missing.")
+                return
+            with lock:
+                day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+                if stats.get('day') != day:
+                    stats.update(day=day, requests=0)
+                stats['requests'] += 1
+                stats['total'] = stats.get('total', 0) + 1
+                if stats['requests'] > quota:
+                    self.error(429, "rateLimited", "You have made too many requests recently.")
+                    return
+
+            page = int(params.get('page', 1))
+            page_size = int(params.get('pageSize', 100))
+            if page * page_size > MAX_RESULTS:
+                self.error(426, "maximumResultsReached",
+                           f"You have requested too many results. Developer accounts are limited to a max of {MAX_RESULTS} results.")
+                return
+
+            now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+            since = params.get('from', '')
+            since = since + 'Z' if since and 'T' in since and not since.endswith('Z') else since
+            match = compile_query(params.get('q', ''))
+            found = [
+                a for a in articles
+                if a["publishedAt"] <= now and a["publishedAt"] >= since
+                and match(f"{a['title']} {a['description']} {a['content']}")
+            ]
+            start = (page - 1) * page_size
+            self.reply(200, {"status": "ok", "totalResults": len(found), "articles": found[start:start + page_size]})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(articles, port=PORT, quota=DAILY_QUOTA, background=False, stats=None):
+    """Start the fake NewsAPI; point the scraper at it with NEWSAPI_URL=http://127.0.0.1:{port}/v2/everything."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(articles, quota, stats))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"Serving {len(articles)} articles on http://127.0.0.1:{port}/v2/everything (quota {quota}/day)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake NewsAPI /v2/everything for scrape_london_danger")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--articles', help='JSON file with a list of NewsAPI articles; default: generated samples')
+    parser.add_argument('--count', type=int, default=600, help='generated articles')
+    parser.add_argument('--hours', type=float, default=48, help='time span of the generated articles')
+    parser.add_argument('--future-hours', type=float, default=0,
+                        help='part of the span that lies ahead and is released as time passes')
+    parser.add_argument('--quota', type=int, default=DAILY_QUOTA)
+    args = parser.parse_args()
+
+    if args.articles:
+        with open(args.articles, 'r', encoding='utf-8') as f:
+            articles = json.load(f)
+        articles.sort(key=lambda a: a["publishedAt"], reverse=True)
+    else:
+        end = datetime.now(timezone.utc) + timedelta(hours=args.future_hours)
+        articles = sample_articles(args.count, args.hours, end)
+    serve(articles, args.port, args.quota)
@@ -1,237 +1,193 @@
-import requests
-from bs4 import BeautifulSoup
-import json
+import os
+import sys
 import time
-from datetime import datetime, timedelta
-from dateutil import parser as dateparser
+import functools
+from datetime import datetime, timezone
+
+from incident_store import IncidentStore, DB_FILE, backpressure_delay
+from fetcher import PoliteFetcher
+from http_cache import HttpCache, ARTICLE_TTL
+from extract import extract_article_text
+from cities import load_city, STATE_DIR
+from dates import parse_date, from_epoch
+from cpu_stage import CpuStage
+from newsapi import NewsApiClient, FetchPlanner, DAILY_QUOTA, quota_path, shared_quota
 
 
 # CONFIGURATION
-NEWSAPI_KEY = ""  # ← PUT YOUR NEWSAPI KEY HERE
+NEWSAPI_KEY = os.getenv("NEWSAPI_KEY", "")  # ← PUT YOUR NEWSAPI KEY HERE
 
-KEYWORDS_CRIME = [
-    "crime", "attack", "shooting", "theft", "assault",
-    "violence", "murder", "robbery", "vandalism", "burglary",
-    "arrest", "homicide", "stabbing", "knife", "mugging",
-    "beaten", "injured", "killed", "died", "dead", "victim",
-    "scam", "fraud", "hijacked"
-]
+# Keywords, gazetteer (area groups) and the NewsAPI query come from the city config (cities/<name>.json)
+CITY = "london"  # default city of this script
+CHECK_INTERVAL = 15 * 60  # 15 minutes; the planner adapts it to the arrival rate and quota
 
-LONDON_AREAS = [
-    # Central London
-    "Westminster", "Soho", "Covent Garden", "Leicester Square", "Piccadilly",
-    "Oxford Street", "Bond Street", "Mayfair", "Bloomsbury", "Fitzrovia",
-    "King's Cross", "St Pancras", "Euston", "Marylebone", "Paddington",
-    "Holborn", "Clerkenwell", "Farringdon", "City of London", "Shoreditch",
-    
-    # North London
-    "Camden", "Islington", "Holloway", "Finsbury Park", "Highgate", "Hampstead",
-    "Kentish Town", "Chalk Farm", "Belsize Park", "Swiss Cottage", "Kilburn",
-    "Wembley", "Harrow", "Barnet", "Enfield", "Wood Green", "Tottenham",
-    "Hornsey", "Crouch End", "Muswell Hill", "Finchley", "Hendon",
-    
-    # East London
-    "Hackney", "Dalston", "Bethnal Green", "Whitechapel", "Tower Hamlets",
-    "Stratford", "Newham", "East Ham", "Barking", "Ilford", "Romford",
-    "Canary Wharf", "Isle of Dogs", "Poplar", "Bow", "Mile End", "Stepney",
-    "Hackney Wick", "Leyton", "Leytonstone", "Walthamstow", "Wanstead",
-    
-    # South London
-    "Brixton", "Clapham", "Streatham", "Tooting", "Wandsworth", "Battersea",
-    "Peckham", "Camberwell", "Dulwich", "Greenwich", "Lewisham", "Deptford",
-    "Croydon", "Bromley", "Sutton", "Kingston", "Woolwich", "Eltham",
-    "Catford", "Forest Hill", "New Cross", "Balham", "Clapham Junction",
-    
-    # West London
-    "Kensington", "Chelsea", "Notting Hill", "Hammersmith", "Fulham",
-    "Shepherd's Bush", "White City", "Ealing", "Acton", "Chiswick",
-    "Brentford", "Hounslow", "Richmond", "Twickenham", "Wimbledon",
-    "Putney", "Barnes", "Kew", "Holland Park", "Earl's Court",
-    
-    # Other areas
-    "Southwark", "Lambeth", "Vauxhall", "Elephant and Castle", "London Bridge",
-    "Bank", "Monument", "Liverpool Street", "Waterloo", "Victoria",
-    "Pimlico", "Knightsbridge", "South Kensington", "Sloane Square"
-]
+# FUNCTIONS
+def make_planner(city):
+    """NewsAPI fetch planner for the city's query, sharded by its gazetteer groups.
 
-OUTPUT_FILE = "london_crime_news.json"
-STATE_FILE = "latest_article_state.json"
-CHECK_INTERVAL = 15 * 60  # 15 minutes
+    The cursor is kept in the city's state dir; the daily quota belongs to NEWSAPI_KEY and is
+    shared by all cities (STATE_DIR/newsapi_quota_<key hash>.json).
+    """
+    client = NewsApiClient(NEWSAPI_KEY)
+    state_file = city.state_path(f"{city.newsapi['source']}_planner.json")
+    quota = shared_quota(quota_path(NEWSAPI_KEY, STATE_DIR))
+    return FetchPlanner(client, city.newsapi["query"], list(city.gazetteer.values()), state_file,
+                        quota, default_interval=CHECK_INTERVAL)
 
-# FUNCTIONS
-def fetch_newsapi(query, from_date=None):
-    """Fetch news from NewsAPI.org"""
+def fetch_newsapi(planner, last_saved_ts=None):
+    """Fetch news from NewsAPI.org: every page and shard since the watermark, within the daily quota"""
     if not NEWSAPI_KEY or NEWSAPI_KEY == "":
         print("ERROR: Please set your NewsAPI key in the script!")
         print("Get your free key at: https://newsapi.org/register")
         return []
     
-    url = "https://newsapi.org/v2/everything"
-    
-    if not from_date:
-        from_date = (datetime.now() - timedelta(days=40)).strftime('%Y-%m-%d')
-    
-    params = {
-        'q': query,
-        'language': 'en',
-        'sortBy': 'publishedAt',
-        'from': from_date,
-        'apiKey': NEWSAPI_KEY,
-        'pageSize': 100
-    }
-    
     try:
-        response = requests.get(url, params=params, timeout=15)
-        if response.status_code == 401:
-            print("ERROR: Invalid API key!")
-            return []
-        elif response.status_code == 429:
-            print("ERROR: Rate limit exceeded!")
-            return []
-        
-        response.raise_for_status()
-        data = response.json()
-        if data.get('status') != 'ok':
-            print(f"API Error: {data.get('message', 'Unknown error')}")
-            return []
-        
-        articles = data.get('articles', [])
-        print(f"Fetched {len(articles)} articles from NewsAPI")
-        return articles
-        
-    except requests.exceptions.RequestException as e:
-        print(f"Network error: {e}")
-        return []
+        return planner.fetch(last_saved_ts)
     except Exception as e:
         print(f"Unexpected error: {e}")
         return []
 
-def fetch_full_article_content(url):
-    """Scrape full article content from the URL"""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
+def fetch_full_article_content(url, fetcher, cache, stage):
+    """Scrape full article content from the URL (extracted text is cached, revalidated with ETag/Last-Modified)"""
+    try:
+        # extraction runs in the CPU stage; the fetcher thread only waits for it
+        extract = functools.partial(stage.call, extract_article_text)
+        content, _ = cache.get(fetcher.get, url, transform=extract, max_age=ARTICLE_TTL)
+        return content
+        
+    except Exception as e:
+        print(f"Could not scrape article: {e}")
+        return ""
+
+def screen_article(article, city=CITY):
+    """Pass 1 for one API article (runs in the CPU stage): date normalization and relevance matching.
+
+    city is a config name (the worker loads and compiles it once). Returns (title, source,
+    candidate, skip reason); title is None for articles without a URL.
+    """
     try:
-        time.sleep(2)
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
+        city = load_city(city)
+        title = article.get('title', 'No title')
+        description = article.get('description', '')
+        api_content = article.get('content', '')
+        url = article.get('url', '')
+        pub_date = article.get('publishedAt')
+        source = article.get('source', {}).get('name', 'Unknown')
+        
+        if not url:
+            return None, None, None, None
         
-        for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside', 'iframe']):
-            element.decompose()
+        pub_date_obj = parse_date(pub_date, city.timezone) or datetime.now(timezone.utc)
+        formatted_date = pub_date_obj.strftime('%Y-%m-%dT%H:%M:%S+00:00')
         
-        content = ""
-        article = soup.find('article')
-        if article:
-            paragraphs = article.find_all('p')
-            content = ' '.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
-        if not content or len(content) < 200:
-            main = soup.find('main')
-            if main:
-                paragraphs = main.find_all('p')
-                content = ' '.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
-        if not content or len(content) < 200:
-            paragraphs = soup.find_all('p')
-            content = ' '.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
+        hits = city.find(f"{title} {description or ''} {api_content or ''}")
         
-        content = ' '.join(content.split())
-        return content if len(content) > 100 else ""
+        # Crime relevance check
+        if not hits["crime"]:
+            return title, source, None, "Not crime-related"
+        
+        # City or specific area check
+        found_locations = sorted(hits["area"])
+        if not hits["city"] and not found_locations:
+            name = city.names[0]
+            return title, source, None, f"Not {name}-related (no {name} area mentioned)"
+        
+        return title, source, {
+            "url": url,
+            "title": title,
+            "description": description,
+            "api_content": api_content,
+            "source": source,
+            "formatted_date": formatted_date,
+            "data_ts": pub_date_obj.timestamp(),
+            "found_locations": found_locations,
+        }, None
         
     except Exception as e:
-        print(f"Could not scrape article: {e}")
-        return ""
+        return None, None, None, f"Error processing article: {e}"
 
-def is_crime_related(title, description, content):
-    """Check if article is about a crime."""
-    text = f"{title} {description} {content}".lower()
-    return any(word in text for word in KEYWORDS_CRIME)
+def build_incident(args, city=CITY):
+    """Pass 3 for one candidate (runs in the CPU stage): context and the city areas it mentions."""
+    c, full_content = args
+    title = c["title"]
+    description = c["description"]
+    api_content = c["api_content"]
+    
+    if full_content:
+        context = full_content
+    else:
+        context_parts = []
+        if description:
+            context_parts.append(description)
+        if api_content:
+            clean_content = api_content.split('[+')[0].strip() if '[+' in api_content else api_content
+            context_parts.append(clean_content)
+        context = ' '.join(context_parts).strip() or title
+    
+    # Find all city areas mentioned
+    matched_locations = sorted(load_city(city).place_matcher.find(context)["area"])
+    found_locations = c["found_locations"]
+    
+    return {
+        "url": c["url"],
+        "title": title,
+        "context": context,
+        "demonstration": False,
+        "crime": True,
+        "data": c["formatted_date"],
+        "data_ts": c["data_ts"],
+        "source_account": c["source"],
+        "locations": matched_locations if matched_locations else (found_locations if found_locations else [])
+    }
 
-def process_articles(articles):
-    """Process and filter crime articles."""
-    crime_data = []
+def process_articles(articles, fetcher, cache, stage=None, city=None):
+    """Process and filter crime articles; parsing and matching run in the CPU stage (inline without one)."""
+    if stage is None:
+        with CpuStage(workers=1) as stage:
+            return process_articles(articles, fetcher, cache, stage, city)
+    city = city or load_city(CITY)
+    candidates = []
     
-    for i, article in enumerate(articles, 1):
-        found_locations = []
-        try:
-            title = article.get('title', 'No title')
-            description = article.get('description', '')
-            api_content = article.get('content', '')
-            url = article.get('url', '')
-            pub_date = article.get('publishedAt', datetime.now().isoformat())
-            source = article.get('source', {}).get('name', 'Unknown')
-            
-            if not url:
-                continue
-            
-            print(f"\n[{i}/{len(articles)}] {title[:70]}...")
-            print(f"  Source: {source}")
-            
-            try:
-                pub_date_obj = dateparser.parse(pub_date)
-                formatted_date = pub_date_obj.strftime('%Y-%m-%dT%H:%M:%S+00:00')
-            except Exception:
-                formatted_date = datetime.now().strftime('%Y-%m-%dT%H:%M:%S+00:00')
-            
-            # Crime relevance check
-            if not is_crime_related(title, description or '', api_content or ''):
-                print("  ⏭ Skipped: Not crime-related")
-                continue
-            
-            # London or specific area check
-            full_text = f"{title} {description} {api_content}".lower()
-            found_locations = [area for area in LONDON_AREAS if area.lower() in full_text]
-            if "london" not in full_text and not found_locations:
-                print("  ⏭ Skipped: Not London-related (no London area mentioned)")
-                continue
-            
-            print(f"Fetching full article content...")
-            full_content = fetch_full_article_content(url)
-            
-            if full_content:
-                context = full_content
-                print(f"  ✓ Got full article: {len(full_content)} characters")
-            else:
-                context_parts = []
-                if description:
-                    context_parts.append(description)
-                if api_content:
-                    clean_content = api_content.split('[+')[0].strip() if '[+' in api_content else api_content
-                    context_parts.append(clean_content)
-                context = ' '.join(context_parts).strip() or title
-                print(f"Using API content: {len(context)} characters")
-            
-            # Find all London areas mentioned
-            content_lower = context.lower()
-            matched_locations = sorted({area for area in LONDON_AREAS if area.lower() in content_lower})
-            
-            crime_item = {
-                "url": url,
-                "title": title,
-                "context": context,
-                "demonstration": False,
-                "crime": True,
-                "data": formatted_date,
-                "source_account": source,
-                "locations": matched_locations if matched_locations else (found_locations if found_locations else [])
-            }
-            
-            crime_data.append(crime_item)
-            print(f"Crime article added")
-            
-        except Exception as e:
-            print(f"Error processing article: {e}")
+    # Pass 1: cheap relevance filtering on the API fields only
+    screened = stage.map(functools.partial(screen_article, city=city.name), articles)
+    for i, (title, source, candidate, skipped) in enumerate(screened, 1):
+        if title is None:
+            if skipped:
+                print(skipped)
             continue
+        
+        print(f"\n[{i}/{len(articles)}] {title[:70]}...")
+        print(f"  Source: {source}")
+        if skipped:
+            print(f"  ⏭ Skipped: {skipped}")
+            continue
+        candidates.append(candidate)
     
+    # Pass 2: fetch the relevant articles in parallel (per-host politeness, pooled session)
+    print(f"\nFetching full content of {len(candidates)} relevant articles...")
+    contents = fetcher.map(lambda url: fetch_full_article_content(url, fetcher, cache, stage),
+                           [c["url"] for c in candidates])
+    print(cache.stats())
+    
+    # Pass 3: build the incidents
+    crime_data = []
+    jobs = [(c, contents.get(c["url"])) for c in candidates]
+    for (c, full_content), crime_item in zip(jobs, stage.map(functools.partial(build_incident, city=city.name), jobs)):
+        title = c["title"]
+        if full_content:
+            print(f"  ✓ Got full article: {len(full_content)} characters ({title[:40]}...)")
+        else:
+            print(f"Using API content: {len(crime_item['context'])} characters ({title[:40]}...)")
+        crime_data.append(crime_item)
+    
+    print(f"Crime articles added: {len(crime_data)}")
     return crime_data
 
-def load_last_state():
+def load_last_state(city):
     try:
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            last_date = dateparser.parse(data.get("last_date"))
-            print(f"Last check: {last_date.strftime('%Y-%m-%d %H:%M:%S')}")
-            return last_date
+        last_ts = city.load_watermark(city.newsapi["source"])
+        print(f"Last check: {from_epoch(last_ts).strftime('%Y-%m-%d %H:%M:%S')}")
+        return last_ts
     except FileNotFoundError:
         print("No previous state found, starting fresh")
         return None
@@ -239,56 +195,85 @@ def load_last_state():
         print(f"Error loading state: {e}")
         return None
 
-def save_last_state(last_date):
+def save_last_state(city, last_ts):
     try:
-        with open(STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump({"last_date": last_date.isoformat()}, f, indent=2)
-        print(f"Updated state: {last_date.strftime('%Y-%m-%d %H:%M:%S')}")
+        city.save_watermark(city.newsapi["source"], last_ts)
+        print(f"Updated state: {from_epoch(last_ts).strftime('%Y-%m-%d %H:%M:%S')}")
     except Exception as e:
         print(f"Error saving state: {e}")
 
-def save_to_json(data):
+def save_incidents(store, data, source):
+    """Append new incidents to the store; returns (newly stored items, latest data_ts among them)."""
     try:
-        with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
-            existing = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        existing = []
-        print("Creating new output file")
-
-    existing_urls = {item["url"] for item in existing}
-    new_data = [item for item in data if item["url"] not in existing_urls]
+        new_data = store.upsert_many(data, source)
+    except Exception as e:
+        print(f"Error saving to store: {e}")
+        return [], None
 
     if not new_data:
         print("No new crime incidents to save")
-        return None
+        return [], None
+
+    print(f"Saved {len(new_data)} new crime incidents to {store.path}")
+    print(f"Total incidents in database: {store.count(source)}")
 
-    existing.extend(new_data)
-    existing.sort(key=lambda x: dateparser.parse(x["data"]), reverse=True)
+    latest_ts = max((a["data_ts"] for a in new_data if a["data_ts"] is not None), default=None)
+    return new_data, latest_ts
+
+def run_cycle(store, fetcher, cache, last_saved_ts, stage=None, planner=None, city=None):
+    """One check of the city's NewsAPI query: fetch, filter and store; returns (newly stored items, new last_saved_ts)."""
+    city = city or load_city(CITY)
+    planner = planner or make_planner(city)
+    cache.evict()
+    if last_saved_ts:
+        print(f"🔍 Searching from: {from_epoch(last_saved_ts).strftime('%Y-%m-%d %H:%M:%S')}")
+    else:
+        print("🔍 Searching the last 7 days")
+    articles = fetch_newsapi(planner, last_saved_ts)
     
-    try:
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(existing, f, ensure_ascii=False, indent=2)
-        
-        print(f"Saved {len(new_data)} new crime incidents to {OUTPUT_FILE}")
-        print(f"Total incidents in database: {len(existing)}")
-        
-        latest_date = max(dateparser.parse(a["data"]) for a in new_data)
-        return latest_date
-    except Exception as e:
-        print(f"Error saving to JSON: {e}")
-        return None
+    if not articles:
+        print("No articles fetched")
+        return [], last_saved_ts
+    
+    crime_data = process_articles(articles, fetcher, cache, stage, city)
+    
+    if last_saved_ts and crime_data:
+        original_count = len(crime_data)
+        crime_data = [
+            a for a in crime_data
+            if a["data_ts"] is None or a["data_ts"] > last_saved_ts
+        ]
+        filtered_count = original_count - len(crime_data)
+        if filtered_count > 0:
+            print(f"\n🗓 Filtered out {filtered_count} old incidents")
+    
+    if not crime_data:
+        print("\n🕓 No new crime incidents since last check")
+        return [], last_saved_ts
+    
+    new_data, latest_ts = save_incidents(store, crime_data, city.newsapi["source"])
+    if latest_ts:
+        save_last_state(city, latest_ts)
+        last_saved_ts = latest_ts
+    return new_data, last_saved_ts
 
-def main():
+def main(city_name=CITY):
+    city = load_city(city_name)
     print("=" * 70)
-    print("🚨 LONDON CRIME NEWS MONITOR (NewsAPI.org)")
+    print(f"🚨 {city.names[0].upper()} CRIME NEWS MONITOR (NewsAPI.org)")
     print("=" * 70)
-    print(f"⏰ Check interval: {CHECK_INTERVAL / 60:.0f} minutes")
-    print(f"💾 Output file: {OUTPUT_FILE}")
-    print(f"📁 State file: {STATE_FILE}")
-    print(f"🔑 API: NewsAPI.org (Free: 100 requests/day)")
+    print(f"⏰ Check interval: adaptive, starting at {CHECK_INTERVAL / 60:.0f} minutes")
+    print(f"💾 Output store: {DB_FILE} (source: {city.newsapi['source']})")
+    print(f"📁 State dir: {city.state_dir}")
+    print(f"🔑 API: NewsAPI.org (Free: {DAILY_QUOTA} requests/day)")
     print("=" * 70)
     
-    last_saved_date = load_last_state()
+    store = IncidentStore(DB_FILE)
+    fetcher = PoliteFetcher()
+    cache = HttpCache()
+    stage = CpuStage()
+    planner = make_planner(city)
+    last_saved_ts = load_last_state(city)
     iteration = 0
 
     while True:
@@ -298,38 +283,7 @@ def main():
         print("=" * 70)
         
         try:
-            if last_saved_date:
-                from_date = last_saved_date.strftime('%Y-%m-%d')
-            else:
-                from_date = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
-            
-            print(f"🔍 Searching from: {from_date}")
-            query = "London AND (crime OR stabbing OR shooting OR attack OR murder OR robbery OR scam)"
-            articles = fetch_newsapi(query, from_date)
-            
-            if not articles:
-                print("No articles fetched")
-            else:
-                crime_data = process_articles(articles)
-                
-                if last_saved_date and crime_data:
-                    original_count = len(crime_data)
-                    crime_data = [
-                        a for a in crime_data
-                        if dateparser.parse(a["data"]) > last_saved_date
-                    ]
-                    filtered_count = original_count - len(crime_data)
-                    if filtered_count > 0:
-                        print(f"\n🗓 Filtered out {filtered_count} old incidents")
-                
-                if crime_data:
-                    latest_date = save_to_json(crime_data)
-                    if latest_date:
-                        save_last_state(latest_date)
-                        last_saved_date = latest_date
-                else:
-                    print("\n🕓 No new crime incidents since last check")
-
+            _, last_saved_ts = run_cycle(store, fetcher, cache, last_saved_ts, stage, planner, city)
         except KeyboardInterrupt:
             print("\n\n⏹ Monitoring stopped by user")
             break
@@ -338,14 +292,26 @@ def main():
             import traceback
             traceback.print_exc()
 
-        print(f"\n Next check in {CHECK_INTERVAL / 60:.0f} minutes...")
+        # the planner's interval (arrival rate, quota left), longer while the labeler is behind
+        interval = planner.next_interval()
+        backlog = store.backlog()
+        delay = backpressure_delay(interval, backlog)
+        if delay > interval:
+            print(f"\n⏳ Labeler backlog: {backlog} incidents, slowing down")
+        print(f"\n Next check in {delay / 60:.0f} minutes...")
         print(f"   (Press Ctrl+C to stop)")
         
         try:
-            time.sleep(CHECK_INTERVAL)
+            time.sleep(delay)
         except KeyboardInterrupt:
             print("\n\n Monitoring stopped by user")
             break
 
+    stage.close()
+    planner.close()
+    fetcher.close()
+    cache.close()
+    store.close()
+
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1] if len(sys.argv) > 1 else CITY)
@@ -0,0 +1,122 @@
+import json
+import html
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# CONFIGURATION
+PORT = 8765
+PAGE_SIZE = 10  # tweets rendered initially and per scroll, like the real infinite timeline
+
+SAMPLE_TWEETS = [
+    "Police appeal after man stabbed near Brixton station\nOfficers were called at 22:10 and a man was taken to hospital.",
+    "Road closure on Oxford Street this weekend for the marathon",
+    "Protest march planned from Trafalgar Square to Westminster on Saturday",
+    "Arrest made after robbery at a shop in Camden\nA 19-year-old man has been charged.",
+    "Weather: sunny spells across London tomorrow",
+]
+
+
+def sample_fixtures(usernames, per_user=25):
+    """Deterministic timelines: {username: [{id, text, datetime}, ...]} newest first."""
+    start = datetime(2025, 10, 4, 12, 0, tzinfo=timezone.utc)
+    fixtures = {}
+    for u, username in enumerate(usernames):
+        tweets = []
+        for i in range(per_user):
+            posted = start - timedelta(minutes=17 * i + u)
+            tweets.append({
+                "id": str(1900000000000000000 + u * 1000 + (per_user - i)),
+                "text": SAMPLE_TWEETS[(i + u) % len(SAMPLE_TWEETS)] + f" #{u}-{i}",
+                "datetime": posted.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            })
+        fixtures[username] = tweets
+    return fixtures
+
+
+def render_tweet(username, tweet):
+    return (
+        '<article data-testid="tweet">'
+        f'<div data-testid="tweetText">{html.escape(tweet["text"])}</div>'
+        f'<a href="/{html.escape(username)}/status/{tweet["id"]}"><time datetime="{tweet["datetime"]}">now</time></a>'
+        '</article>'
+    )
+
+
+def render_profile(username, tweets):
+    """Profile page: the first page of tweets, the rest appended on scroll."""
+    pages = [
+        ''.join(render_tweet(username, t) for t in tweets[i:i + PAGE_SIZE])
+        for i in range(0, len(tweets), PAGE_SIZE)
+    ]
+    first = pages[0] if pages else ''
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>@{html.escape(username)}</title>
+<style>article {{ display: block; height: 300px; }}</style></head>
+<body><main id="timeline">{first}</main>
+<script>
+const pages = {json.dumps(pages[1:])};
+let loading = false;
+window.addEventListener('scroll', () => {{
+  if (loading || !pages.length) return;
+  if (window.innerHeight + window.scrollY < document.body.scrollHeight - 50) return;
+  loading = true;
+  setTimeout(() => {{
+    document.getElementById('timeline').insertAdjacentHTML('beforeend', pages.shift());
+    loading = false;
+  }}, 300);
+}});
+</script></body></html>"""
+
+
+def make_handler(fixtures):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            username = self.path.strip('/').split('/')[0]
+            if username not in fixtures:
+                self.send_error(404)
+                return
+            body = render_profile(username, fixtures[username]).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(fixtures, port=PORT, background=False):
+    """Start the fixture server; point x_scraper at it with base_url=f"http://127.0.0.1:{port}"."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(fixtures))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"Serving {len(fixtures)} timelines on http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Static X/Twitter timeline fixtures for x_scraper")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--fixtures', help='JSON file {username: [{id, text, datetime}]}; default: generated samples')
+    parser.add_argument('usernames', nargs='*', default=["BBCLondonNews", "metpoliceuk"])
+    args = parser.parse_args()
+
+    if args.fixtures:
+        with open(args.fixtures, 'r', encoding='utf-8') as f:
+            fixtures = json.load(f)
+    else:
+        fixtures = sample_fixtures(args.usernames)
+    serve(fixtures, args.port)
@@ -1,133 +1,270 @@
-import json
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import time
-from datetime import datetime
 import os
+import re
+import sys
+import json
+import time
+import hashlib
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from incident_store import IncidentStore, DB_FILE, backpressure_delay
+from dates import parse_date
+from cities import load_city
+
+CITY = "london"  # default city; its config lists the accounts (x.accounts) and the source name
+BASE_URL = "https://twitter.com"
+BROWSER_WORKERS = 3  # parallel headless browser sessions
+PAGE_TIMEOUT = 15  # max wait for the first tweets of a profile
+SCROLL_TIMEOUT = 5  # max wait for new content after a scroll
+MAX_IDLE_SCROLLS = 3  # stop after this many scrolls that load nothing new
+TWEET_SELECTOR = 'article[data-testid="tweet"]'
+KNOWN_STREAK = 3  # stop after this many consecutive already-harvested own tweets (retweets and pinned ones are skipped)
+SEEN_TEXTS_LIMIT = 500  # recent tweet text hashes remembered per account (skips reposted texts)
+STATUS_ID_RE = re.compile(r'/status/(\d+)')
+STATUS_AUTHOR_RE = re.compile(r'/([^/]+)/status/\d+')
+EXTRACT_MODE = "script"  # "script": one injected script per scroll, "elements": per-element WebDriver calls
+
+# Returns text/url/datetime of tweets not returned before as one JSON array, with a flag
+# for articles under a social-context line ("reposted", "Pinned"). Each article is tagged
+# with the key it was read under; the timeline recycles DOM nodes, so a node whose key
+# changed is read again.
+EXTRACT_SCRIPT = """
+const records = [];
+for (const article of document.querySelectorAll(arguments[0])) {
+  const textEl = article.querySelector('[data-testid="tweetText"]');
+  if (!textEl) continue;
+  const time = article.querySelector('time');
+  const link = time ? time.parentElement : null;
+  const url = link && link.href ? link.href : null;
+  const text = textEl.innerText;
+  const key = url || text;
+  if (article.getAttribute('data-harvested') === key) continue;
+  article.setAttribute('data-harvested', key);
+  records.push({text: text, url: url, datetime: time ? time.getAttribute('datetime') : null,
+                social: !!article.querySelector('[data-testid="socialContext"]')});
+}
+return JSON.stringify(records);
+"""
 
 class TweetAnalyzer:
-    
-    CRIME_KEYWORDS = [
-        'crime', 'criminal', 'theft', 'robbery', 'murder', 'assault', 'arrest',
-        'police', 'investigation', 'suspect', 'victim', 'shooting', 'violence',
-        'attack', 'burglary', 'vandalism', 'fraud', 'kidnapping', 'homicide',
-        'stolen', 'gun', 'weapon', 'charged', 'convicted', 'sentenced',
-        'przestępstwo', 'kradzież', 'napad', 'morderstwo', 'areszt', 'policja'
-    ]
-    
-    PROTEST_KEYWORDS = [
-        'protest', 'demonstration', 'rally', 'march', 'protest march',
-        'demonstrators', 'protesters', 'riot', 'uprising', 'strike',
-        'boycott', 'civil disobedience', 'activism', 'activist',
-        'demonstracja', 'protest', 'manifestacja', 'strajk', 'wiec'
-    ]
-    
-    LONDON_KEYWORDS = [
-        'london', 'londyn', 'westminster', 'tower bridge', 'piccadilly',
-        'camden', 'shoreditch', 'brixton', 'soho', 'covent garden',
-        'kensington', 'chelsea', 'hackney', 'islington', 'greenwich',
-        'canary wharf', 'city of london', 'big ben', 'trafalgar square'
-    ]
+    """Tweet relevance from the city config: x.keywords (crime/protest) and the city's names and gazetteer."""
     
     @staticmethod
-    def contains_keywords(text, keywords):
-        if not text:
-            return False
-        text_lower = text.lower()
-        return any(keyword.lower() in text_lower for keyword in keywords)
+    def analyze(tweet_text, city):
+        """Crime, protest and city (name or gazetteer area) hits in a single pass."""
+        hits = city.find(tweet_text, city.x.get('keywords'))
+        return bool(hits.get('crime')), bool(hits.get('protest')), bool(hits['city'] or hits['area'])
+
+
+def make_driver(headless=True):
+    chrome_options = Options()
+    if headless:
+        chrome_options.add_argument('--headless=new')
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+    chrome_options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+    driver = webdriver.Chrome(options=chrome_options)
+    driver.set_window_size(1920, 1080)
+    return driver
+
+
+class BrowserPool:
+    """N browser sessions; each account is scraped by whichever session is free."""
     
-    @classmethod
-    def is_crime_related(cls, tweet_text):
-        return cls.contains_keywords(tweet_text, cls.CRIME_KEYWORDS)
+    def __init__(self, size=BROWSER_WORKERS, headless=True, driver_factory=make_driver):
+        self.size = size
+        self.drivers = queue.Queue()
+        self._all = []
+        for _ in range(size):
+            driver = driver_factory(headless)
+            self._all.append(driver)
+            self.drivers.put(driver)
     
-    @classmethod
-    def is_protest_related(cls, tweet_text):
-        return cls.contains_keywords(tweet_text, cls.PROTEST_KEYWORDS)
+    def map(self, fn, items):
+        """fn(driver, item) for every item, in parallel; results in input order."""
+        def run(item):
+            driver = self.drivers.get()
+            try:
+                return fn(driver, item)
+            finally:
+                self.drivers.put(driver)
+        
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run, items))
     
-    @classmethod
-    def is_london_related(cls, tweet_text):
-        return cls.contains_keywords(tweet_text, cls.LONDON_KEYWORDS)
+    def close(self):
+        for driver in self._all:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+def _content_grew(last_count, last_height):
+    def check(driver):
+        count = len(driver.find_elements(By.CSS_SELECTOR, TWEET_SELECTOR))
+        height = driver.execute_script("return document.body.scrollHeight")
+        return count > last_count or height > last_height
+    return check
+
+
+def tweet_id(tweet_url):
+    """Numeric status id from a tweet URL (ids grow with posting time), or None."""
+    match = STATUS_ID_RE.search(tweet_url or '')
+    return int(match.group(1)) if match else None
+
+
+def text_key(tweet_text):
+    return hashlib.blake2b(tweet_text.encode('utf-8'), digest_size=8).hexdigest()
+
 
+def out_of_order(record, username):
+    """Whether a tweet's status id says nothing about the account's timeline position.
 
-def load_existing_tweets(output_file):
-    if os.path.exists(output_file):
+    Retweets link to the original (older) status and pinned tweets sit on top whatever
+    their age; both carry a social-context line, and a retweet's URL names another author.
+    """
+    if record.get("social"):
+        return True
+    match = STATUS_AUTHOR_RE.search(record.get("url") or '')
+    return bool(match) and match.group(1).lower() != username.lower()
+
+
+def _element_records(tweet_elements, username):
+    """Text, URL, datetime and social-context flag of each tweet via WebDriver calls (several round-trips per tweet)."""
+    records = []
+    for tweet_element in tweet_elements:
+        try:
+            tweet_text = tweet_element.find_element(By.CSS_SELECTOR, '[data-testid="tweetText"]').text
+        except NoSuchElementException:
+            continue
+        try:
+            time_element = tweet_element.find_element(By.CSS_SELECTOR, 'time')
+        except NoSuchElementException:
+            time_element = None
         try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            tweet_url = time_element.find_element(By.XPATH, '..').get_attribute('href')
         except:
-            return []
-    return []
+            tweet_url = None
+        try:
+            tweet_datetime = time_element.get_attribute('datetime')
+        except:
+            tweet_datetime = None
+        social = bool(tweet_element.find_elements(By.CSS_SELECTOR, '[data-testid="socialContext"]'))
+        records.append({"text": tweet_text, "url": tweet_url or f"https://twitter.com/{username}",
+                        "datetime": tweet_datetime, "social": social})
+    return records
 
 
-def save_tweets(tweets, output_file):
-    """Save tweets to JSON file"""
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(tweets, f, ensure_ascii=False, indent=2)
+def _script_records(driver, username):
+    """Text, URL and datetime of every newly rendered tweet in a single execute_script call."""
+    records = json.loads(driver.execute_script(EXTRACT_SCRIPT, TWEET_SELECTOR) or '[]')
+    for record in records:
+        record["url"] = record["url"] or f"https://twitter.com/{username}"
+    return records
 
 
-def scrape_user_tweets(driver, username, existing_urls, max_tweets=100):
+def scrape_user_tweets(driver, username, state, max_tweets=100, base_url=BASE_URL, extract_mode=EXTRACT_MODE,
+                       city=None):
+    """Relevant tweets posted since the account's high-water mark.
+
+    state is the account's persistent dict (IncidentStore.load_account_states): the
+    newest status id/timestamp already harvested and hashes of recently seen texts.
+    It is updated in place; scrolling stops once KNOWN_STREAK of the account's own tweets
+    in a row are at or below the mark. Retweets and pinned tweets (out_of_order) neither
+    count towards the streak nor move the mark: their ids are not timeline positions.
+    extract_mode "script" reads each batch of rendered tweets with one injected script,
+    "elements" with per-element WebDriver calls. city (default CITY) decides which tweets
+    are local: those naming it or one of its areas, or any tweet of an account named after it.
+    """
+    city = city or load_city(CITY)
     filtered_tweets = []
-    username_has_london = 'london' in username.lower()
+    username_has_city = any(name.lower() in username.lower() for name in city.names)
+    high_water = state.get('newest_id') or 0
+    seen_tweet_texts = set(state.get('seen_texts', []))
+    seen_order = list(state.get('seen_texts', []))
+    newest_id, newest_ts = high_water, state.get('newest_ts')
     
     try:
-        url = f"https://twitter.com/{username}"
+        url = f"{base_url}/{username}"
         print(f"  Navigating to {url}...")
         driver.get(url)
         
-        time.sleep(5)
+        # explicit wait for the first tweets instead of a fixed sleep
+        try:
+            WebDriverWait(driver, PAGE_TIMEOUT).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, TWEET_SELECTOR))
+            )
+        except TimeoutException:
+            print(f"  No tweets rendered for @{username}\n")
+            return filtered_tweets
         
         last_height = driver.execute_script("return document.body.scrollHeight")
         tweets_collected = 0
         scroll_attempts = 0
-        max_scroll_attempts = 20
-        
-        seen_tweet_texts = set()
+        known_streak = 0
+        inspected = set()  # status urls already handled in this run (the DOM keeps old tweets)
+        reached_known = False
 
-        while tweets_collected < max_tweets and scroll_attempts < max_scroll_attempts:
-            tweet_elements = driver.find_elements(By.CSS_SELECTOR, 'article[data-testid="tweet"]')
+        while tweets_collected < max_tweets and scroll_attempts < MAX_IDLE_SCROLLS and not reached_known:
+            if extract_mode == "script":
+                records = _script_records(driver, username)
+                rendered = len(driver.find_elements(By.CSS_SELECTOR, TWEET_SELECTOR))
+            else:
+                tweet_elements = driver.find_elements(By.CSS_SELECTOR, TWEET_SELECTOR)
+                records = _element_records(tweet_elements, username)
+                rendered = len(tweet_elements)
             
-            for tweet_element in tweet_elements:
+            for record in records:
                 if tweets_collected >= max_tweets:
                     break
                 
                 try:
-                    tweet_text_element = tweet_element.find_element(By.CSS_SELECTOR, '[data-testid="tweetText"]')
-                    tweet_text = tweet_text_element.text
+                    tweet_text = record["text"]
+                    tweet_url = record["url"]
                     
-                    if tweet_text in seen_tweet_texts:
+                    status_id = tweet_id(tweet_url)
+                    if status_id is not None:
+                        if status_id in inspected:
+                            continue
+                        inspected.add(status_id)
+                    if out_of_order(record, username):
+                        status_id = None  # seen_texts alone keeps reposts from repeating
+                    elif status_id is not None and status_id <= high_water:
+                        # already harvested in an earlier cycle
+                        known_streak += 1
+                        if known_streak >= KNOWN_STREAK:
+                            reached_known = True
+                            break
                         continue
+                    else:
+                        known_streak = 0
                     
-                    seen_tweet_texts.add(tweet_text)
+                    key = text_key(tweet_text)
+                    if key in seen_tweet_texts:
+                        continue
                     
-                    try:
-                        time_element = tweet_element.find_element(By.CSS_SELECTOR, 'time')
-                        tweet_link_element = time_element.find_element(By.XPATH, '..')
-                        tweet_url = tweet_link_element.get_attribute('href')
-                    except:
-                        tweet_url = f"https://twitter.com/{username}"
+                    seen_tweet_texts.add(key)
+                    seen_order.append(key)
                     
-                    # Skip if we already have this tweet
-                    if tweet_url in existing_urls:
-                        continue
+                    pub_date = parse_date(record["datetime"], city.timezone) or datetime.now(timezone.utc)
                     
-                    try:
-                        time_element = tweet_element.find_element(By.CSS_SELECTOR, 'time')
-                        tweet_datetime = time_element.get_attribute('datetime')
-                        pub_date = datetime.fromisoformat(tweet_datetime.replace('Z', '+00:00'))
-                    except:
-                        pub_date = datetime.now()
+                    if status_id is not None and status_id > newest_id:
+                        newest_id, newest_ts = status_id, pub_date.isoformat()
                     
-                    is_crime = TweetAnalyzer.is_crime_related(tweet_text)
-                    is_demo = TweetAnalyzer.is_protest_related(tweet_text)
-                    is_london = TweetAnalyzer.is_london_related(tweet_text)
+                    is_crime, is_demo, is_local = TweetAnalyzer.analyze(tweet_text, city)
                     
-                    london_check = username_has_london or is_london
+                    city_check = username_has_city or is_local
                     
-                    if (is_crime or is_demo) and london_check:
+                    if (is_crime or is_demo) and city_check:
                         title = tweet_text.split('\n')[0][:100] if tweet_text else "No title"
                         
                         lines = tweet_text.split('\n')
@@ -143,6 +280,7 @@ def scrape_user_tweets(driver, username, existing_urls, max_tweets=100):
                             "demonstration": is_demo,
                             "crime": is_crime,
                             "data": pub_date.isoformat(),
+                            "data_ts": pub_date.timestamp(),
                             "source_account": username
                         }
                         
@@ -151,90 +289,94 @@ def scrape_user_tweets(driver, username, existing_urls, max_tweets=100):
                     
                     tweets_collected += 1
                     
-                except NoSuchElementException:
-                    continue
                 except Exception as e:
                     continue
             
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(2)
+            if reached_known or tweets_collected >= max_tweets:
+                break
             
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                scroll_attempts += 1
-            else:
+            # scroll and wait until new tweets render (or the page stops growing)
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            try:
+                WebDriverWait(driver, SCROLL_TIMEOUT).until(_content_grew(rendered, last_height))
                 scroll_attempts = 0
-            last_height = new_height
+            except TimeoutException:
+                scroll_attempts += 1
+            last_height = driver.execute_script("return document.body.scrollHeight")
         
-        print(f"  Completed: {tweets_collected} tweets checked, {len(filtered_tweets)} new relevant found\n")
+        stop_reason = " (reached already harvested tweets)" if reached_known else ""
+        print(f"  Completed: {tweets_collected} tweets checked, {len(filtered_tweets)} new relevant found{stop_reason}\n")
         
     except Exception as e:
         print(f"  Error scraping @{username}: {str(e)}\n")
     
+    # the mark only moves forward; texts are kept for the most recent SEEN_TEXTS_LIMIT tweets
+    state['newest_id'] = newest_id or None
+    state['newest_ts'] = newest_ts
+    state['seen_texts'] = seen_order[-SEEN_TEXTS_LIMIT:]
     return filtered_tweets
 
 
-def scrape_cycle(usernames, output_file, max_tweets_per_user, driver):
+def scrape_cycle(usernames, store, max_tweets_per_user, pool, base_url=BASE_URL, extract_mode=EXTRACT_MODE,
+                 city=None):
     print(f"Starting scrape cycle at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    city = city or load_city(CITY)
+    source = city.x["source"]
     
-    existing_tweets = load_existing_tweets(output_file)
-    existing_urls = set(tweet['url'] for tweet in existing_tweets)
+    states = store.load_account_states(usernames)
     
-    new_tweets = []
+    def scrape(driver, username):
+        print(f"Processing @{username}...")
+        return scrape_user_tweets(driver, username, states[username], max_tweets_per_user, base_url, extract_mode,
+                                  city)
     
-    for i, username in enumerate(usernames, 1):
-        print(f"[{i}/{len(usernames)}] Processing @{username}...")
-        user_tweets = scrape_user_tweets(driver, username, existing_urls, max_tweets_per_user)
-        new_tweets.extend(user_tweets)
-        
-        if i < len(usernames):
-            time.sleep(3)
+    # accounts are scraped in parallel, results merged into the store in one transaction
+    new_tweets = [tweet for user_tweets in pool.map(scrape, usernames) for tweet in user_tweets]
     
     if new_tweets:
-        existing_tweets.extend(new_tweets)
-        save_tweets(existing_tweets, output_file)
+        new_tweets = store.upsert_many(new_tweets, source)
         
         print(f"\n{'='*60}")
         print(f"✓ Added {len(new_tweets)} new tweets!")
-        print(f"✓ Total tweets in database: {len(existing_tweets)}")
+        print(f"✓ Total tweets in database: {store.count(source)}")
         print(f"{'='*60}")
     else:
         print(f"\n{'='*60}")
         print(f"ℹ️  No new tweets found this cycle")
         print(f"{'='*60}")
     
-    return len(new_tweets)
+    # saved after the tweets so a crash mid-cycle rescans instead of skipping them
+    store.save_account_states(states)
+    
+    return new_tweets
 
 
-def run_continuous_scraper(usernames, output_file='all_accounts_filtered_tweets.json', 
-                          max_tweets_per_user=100, interval_minutes=15, headless=True):
-    usernames = [u.lstrip('@') for u in usernames]
+def run_continuous_scraper(usernames=None, db_file=DB_FILE, 
+                          max_tweets_per_user=100, interval_minutes=15, headless=True,
+                          workers=BROWSER_WORKERS, base_url=BASE_URL, extract_mode=EXTRACT_MODE,
+                          city=None):
+    city = city or load_city(CITY)
+    usernames = [u.lstrip('@') for u in (usernames or city.x["accounts"])]
     
-    chrome_options = Options()
-    if headless:
-        chrome_options.add_argument('--headless=new')
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-    chrome_options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-    
-    driver = None
+    pool = None
     cycle_count = 0
+    store = IncidentStore(db_file)
     
     try:
-        driver = webdriver.Chrome(options=chrome_options)
-        driver.set_window_size(1920, 1080)
+        pool = BrowserPool(min(workers, len(usernames)) or 1, headless)
         
         while True:
             cycle_count += 1
             
             try:
-                new_count = scrape_cycle(usernames, output_file, max_tweets_per_user, driver)
+                scrape_cycle(usernames, store, max_tweets_per_user, pool, base_url, extract_mode, city)
                 
-                next_run = datetime.now().timestamp() + (interval_minutes * 60)
+                # wait longer while the labeler is behind (ML/main.py --follow)
+                delay = backpressure_delay(interval_minutes * 60, store.backlog())
+                next_run = datetime.now().timestamp() + delay
                 next_run_time = datetime.fromtimestamp(next_run).strftime('%Y-%m-%d %H:%M:%S')
                 
-                time.sleep(interval_minutes * 60)
+                time.sleep(delay)
                 
             except KeyboardInterrupt:
                 raise
@@ -244,7 +386,7 @@ def run_continuous_scraper(usernames, output_file='all_accounts_filtered_tweets.
     
     except KeyboardInterrupt:
         print(f"Completed {cycle_count} cycles")
-        print(f"Data saved in: {output_file}")
+        print(f"Data saved in: {db_file} (export with: python src/incident_store.py export {city.x['source']})")
     
     except Exception as e:
         print(f"\nError: {str(e)}")
@@ -252,28 +394,22 @@ def run_continuous_scraper(usernames, output_file='all_accounts_filtered_tweets.
         traceback.print_exc()
     
     finally:
-        if driver:
-            driver.quit()
+        if pool:
+            pool.close()
+        store.close()
 
 
 if __name__ == "__main__":
-    # Lista kont do przeszukania
-    usernames = [
-        "BBCLondonNews",
-        "TimeOutLondon",
-        "CTVLondon",
-        "EveningStandard",
-        "LondonNews24",
-        "metpoliceuk",
-    ]
-    
-    output_file = "all_accounts_filtered_tweets.json"
-    
     # Run continuous scraper
+    city = load_city(sys.argv[1] if len(sys.argv) > 1 else CITY)
     run_continuous_scraper(
-        usernames=usernames,
-        output_file=output_file,
+        usernames=city.x["accounts"],
+        db_file=DB_FILE,
         max_tweets_per_user=80,
         interval_minutes=15,
-        headless=True
+        headless=True,
+        workers=BROWSER_WORKERS,
+        base_url=os.getenv("X_BASE_URL", BASE_URL),  # e.g. http://localhost:8765 for x_fixture_server.py
+        extract_mode=os.getenv("X_EXTRACT_MODE", EXTRACT_MODE),
+        city=city,
     )
\ No newline at end of file
@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import asyncio
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("OPENAI_API_KEY", "test-key")  # main.py wymaga klucza przy imporcie
+
+import main
+from batch import FakeBatchClient, _fake_labels
+
+
+def entries(n):
+    return [{"url": f"https://news.example/{i}", "tytul": f"Protest {i}", "tresc": "Protest w Westminster."}
+            for i in range(n)]
+
+
+def run(items, client, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "BATCH_INPUT_PATH", str(tmp_path / "batch_requests.jsonl"))
+    monkeypatch.setattr(main, "BATCH_POLL_SECONDS", 0)
+
+    async def collect():
+        return [res async for res in main.label_batch(items, None, client)]
+
+    return asyncio.run(collect())
+
+
+def test_completed_batch_labels_every_entry(tmp_path, monkeypatch):
+    items = entries(3)
+    results = run(items, FakeBatchClient(), tmp_path, monkeypatch)
+    assert sorted(r["wejscie"]["url"] for r in results) == sorted(e["url"] for e in items)
+    assert all(r["error"] is None and r["labels"] is not None for r in results)
+
+
+def test_partially_failed_batch_reports_failed_entries(tmp_path, monkeypatch):
+    def respond(body):
+        if "https://news.example/1" in body["messages"][-1]["content"]:
+            raise RuntimeError("odrzucone")
+        return _fake_labels(body)
+
+    results = run(entries(3), FakeBatchClient(respond), tmp_path, monkeypatch)
+    by_url = {r["wejscie"]["url"]: r for r in results}
+    assert len(results) == 3
+    assert by_url["https://news.example/1"]["labels"] is None
+    assert "odrzucone" in by_url["https://news.example/1"]["error"]
+    assert all(by_url[f"https://news.example/{i}"]["error"] is None for i in (0, 2))
+
+
+class RepeatingBatchClient(FakeBatchClient):
+    # plik wyników z powtórzoną linią i wynikiem spoza wysłanego pliku
+    async def _file_content(self, file_id):
+        text = (await super()._file_content(file_id)).text
+        lines = text.splitlines()
+        extra = dict(json.loads(lines[0]), custom_id="nieznany")
+        return SimpleNamespace(text="\n".join(lines + [lines[0], json.dumps(extra)]))
+
+
+def test_unknown_and_repeated_custom_ids_are_skipped(tmp_path, monkeypatch):
+    items = entries(2)
+    results = run(items, RepeatingBatchClient(), tmp_path, monkeypatch)
+    assert sorted(r["wejscie"]["url"] for r in results) == sorted(e["url"] for e in items)
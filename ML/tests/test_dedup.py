@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dedup import cluster_entries, fan_out
+
+TEMPLATE = ("A man in his 20s was stabbed in {place} on Saturday evening. Police were called at 9pm "
+            "and the man was taken to hospital, where his condition is described as stable. "
+            "No arrests have been made and officers are appealing for witnesses.")
+
+
+def entry(place, url, extra=""):
+    return {"url": url, "title": f"Man stabbed in {place}", "context": TEMPLATE.format(place=place) + extra}
+
+
+def test_template_text_with_different_places_is_not_merged():
+    entries = [entry("Brixton", "https://a/1"), entry("Peckham", "https://b/2")]
+    assert sorted(len(c) for c in cluster_entries(entries)) == [1, 1]
+
+
+def test_many_template_reports_stay_separate():
+    places = ["Brixton", "Peckham", "Camden", "Hackney", "Croydon", "Tottenham"]
+    entries = [entry(place, f"https://x/{i}") for i, place in enumerate(places * 5)]
+    # ten sam tekst i miejsce pod różnymi URL-ami to duplikaty; różne miejsca – nie
+    assert sorted(len(c) for c in cluster_entries(entries)) == [5] * len(places)
+
+
+def test_same_incident_is_merged():
+    entries = [entry("Brixton", "https://a/1"), entry("Brixton", "https://b/2", " More to follow.")]
+    clusters = cluster_entries(entries)
+    assert [len(c) for c in clusters] == [2]
+    assert clusters[0][0]["url"] == "https://b/2"  # reprezentant: dłuższy tekst
+
+
+def test_reworded_cross_source_copies_are_merged():
+    bbc = {"url": "https://bbc/1", "title": "Man stabbed in Brixton",
+           "context": "A man in his 20s was stabbed in Brixton on Saturday evening. Police were called to "
+                      "Coldharbour Lane at 9pm and he was taken to hospital, where his condition is "
+                      "described as stable. No arrests have been made."}
+    standard = {"url": "https://standard/2", "title": "Brixton stabbing: man in his 20s taken to hospital",
+                "context": "Officers were called to Coldharbour Lane in Brixton at around 9pm on Saturday "
+                           "after reports of a stabbing. A man in his 20s was taken to hospital, where his "
+                           "condition is stable. No arrests have been made, the Metropolitan Police said."}
+    # ten sam szablon z innym miejscem i ulicą – osobny incydent
+    peckham = {"url": "https://bbc/3", "title": "Man stabbed in Peckham",
+               "context": bbc["context"].replace("Brixton", "Peckham").replace("Coldharbour Lane", "Rye Lane")}
+    clusters = cluster_entries([bbc, standard, peckham])
+    assert sorted(sorted(e["url"] for e in c) for c in clusters) == [["https://bbc/1", "https://standard/2"],
+                                                                      ["https://bbc/3"]]
+
+
+def test_fan_out_copies_labels_to_the_member():
+    rep, member = entry("Brixton", "https://a/1"), entry("Brixton", "https://c/3")
+    res = {"wejscie": rep, "labels": {"adres_url": "https://a/1", "miejsce": "Brixton, London"}, "error": None}
+    out = fan_out(res, member)
+    assert out["labels"]["miejsce"] == "Brixton, London"
+    assert out["labels"]["adres_url"] == "https://c/3"
+    assert out["labels"]["duplikat"] == "https://a/1"
@@ -0,0 +1,76 @@
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from newsapi import DailyQuota, FetchPlanner, NewsApiClient, QUOTA_RESERVE
+from newsapi_fixture_server import SAMPLE_AREAS, sample_articles, serve
+
+ARTICLES = sample_articles(300)
+AREA_GROUPS = [SAMPLE_AREAS[:9], SAMPLE_AREAS[9:]]
+
+
+@pytest.fixture
+def server():
+    stats = {}
+    httpd = serve(ARTICLES, port=0, quota=1000, background=True, stats=stats)
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/v2/everything", stats
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def planner(url, tmp_path, name, quota):
+    client = NewsApiClient("test-key", url=url)
+    return FetchPlanner(client, "London", AREA_GROUPS, str(tmp_path / f"{name}.json"), quota=quota)
+
+
+def used(quota):
+    with open(quota.path, "r", encoding="utf-8") as f:
+        return json.load(f)["used"]
+
+
+def test_saturated_query_is_sharded_until_every_article_is_fetched(server, tmp_path):
+    url, stats = server
+    quota = DailyQuota(str(tmp_path / "quota.json"), quota=100)
+    articles = planner(url, tmp_path, "london", quota).fetch()
+    # 300 wyników > MAX_RESULTS: zapytanie bazowe dzieli się na grupy, grupy na połowy
+    assert {a["url"] for a in articles} == {a["url"] for a in ARTICLES}
+    assert stats["total"] > 2
+    assert used(quota) == stats["total"]
+
+
+def test_planners_of_one_key_share_the_daily_budget(server, tmp_path):
+    url, stats = server
+    budget = 4
+    first = planner(url, tmp_path, "london", DailyQuota(str(tmp_path / "quota.json"), quota=QUOTA_RESERVE + budget))
+    second = planner(url, tmp_path, "paris", DailyQuota(str(tmp_path / "quota.json"), quota=QUOTA_RESERVE + budget))
+    first.fetch()
+    second.fetch()
+    # pierwszy wyczerpał budżet klucza, drugi nie wysłał żadnego zapytania i wznowi je później
+    assert stats["total"] == budget
+    assert used(first.quota) == budget
+    assert second.remaining() == 0
+    assert first.state["resume"] and second.state["resume"]
+
+
+def test_separate_quota_instances_do_not_lose_updates(tmp_path):
+    # osobne instancje (jak osobne procesy) mają osobne blokady wątków; chroni je tylko flock
+    path = str(tmp_path / "quota.json")
+    granted = []
+
+    def worker():
+        quota = DailyQuota(path, quota=QUOTA_RESERVE + 200)
+        for _ in range(50):
+            granted.append(quota.reserve(1, 0))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sum(granted) == 200
+    assert used(DailyQuota(path)) == 200
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import argparse
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from incidents import incident_window, load_labels, parse_date
+
+# --------------------------- Konfiguracja ---------------------------
+
+INPUT_PATH = "outputs/london_crime_news_labeled.json"
+OUTPUT_PATH = "outputs/danger_tiles.json"
+# poziomy przybliżenia = długości geohasha: ~39 km, ~4.9 km, ~1.2 km, ~150 m
+PRECISIONS = (4, 5, 6, 7)
+DEFAULT_PRECISION = 6
+# po szacowanym końcu waga incydentu maleje o połowę co tyle sekund
+HALF_LIFE = 24 * 3600
+# incydent bez rozpoznawalnej daty liczy się z taką wagą czasu
+UNDATED_FACTOR = 0.25
+TOP_K = 5  # najgroźniejsze incydenty zapamiętywane w każdym kafelku
+
+# --------------------------- Geohash ---------------------------
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+def geohash(lat: float, lon: float, precision: int) -> str:
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # bity na przemian: długość, szerokość
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value *= 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+def bbox(code: str) -> Tuple[float, float, float, float]:
+    # (lat_min, lat_max, lon_min, lon_max) kafelka
+    lat_lo, lat_hi, lon_lo, lon_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for c in code:
+        value = _DECODE[c]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                lon_lo, lon_hi = (mid, lon_hi) if bit else (lon_lo, mid)
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                lat_lo, lat_hi = (mid, lat_hi) if bit else (lat_lo, mid)
+            even = not even
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+def neighbors(code: str) -> List[str]:
+    # kafelek i 8 sąsiadów tego samego rozmiaru (punkt przy krawędzi kafelka)
+    lat_lo, lat_hi, lon_lo, lon_hi = bbox(code)
+    dlat, dlon = lat_hi - lat_lo, lon_hi - lon_lo
+    lat_c, lon_c = (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+    codes = []
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            lat = lat_c + dy * dlat
+            if not -90 <= lat <= 90:
+                continue
+            lon = (lon_c + dx * dlon + 180) % 360 - 180
+            codes.append(geohash(lat, lon, len(code)))
+    return list(dict.fromkeys(codes))
+
+# --------------------------- Wagi ---------------------------
+
+def severity(labels: Dict[str, Any]) -> float:
+    # poziom zagrożenia 1–5 wzmacniany wpływem na komfort (5 = największy): od 0.2 (1, komfort 1)
+    # do 5 (5, komfort 5)
+    level = labels.get("poziom_zagrozenia") or 3
+    comfort = labels.get("komfort") or 3
+    return level * comfort / 5
+
+def time_factor(window: Optional[Tuple[float, float]], at: float, half_life: float = HALF_LIFE) -> float:
+    # trwający – 1, zakończony – wygasa wykładniczo, przyszły – 0
+    if window is None:
+        return UNDATED_FACTOR
+    start, end = window
+    if at < start:
+        return 0.0
+    if at <= end:
+        return 1.0
+    return 0.5 ** ((at - end) / half_life)
+
+# --------------------------- Indeks ---------------------------
+
+class TileIndex:
+    """Incydenty w kafelkach geohash na kilku poziomach przybliżenia.
+
+    Kafelek trzyma numery swoich incydentów, a incydent surowe okno czasu i wagę powagi;
+    wagę czasu lookup liczy na chwilę zapytania, więc zapisany indeks się nie starzeje.
+    """
+
+    def __init__(self, tiles: Dict[str, Dict[str, List[int]]], incidents: List[Dict[str, Any]],
+                 precisions: Sequence[int]):
+        self.tiles = tiles  # {str(precyzja): {geohash: [numery incydentów]}}
+        self.incidents = incidents
+        self.precisions = list(precisions)
+
+    @classmethod
+    def build(cls, labels: Iterable[Dict[str, Any]], precisions: Sequence[int] = PRECISIONS) -> "TileIndex":
+        incidents = []
+        for lab in labels:
+            lat, lon = lab.get("lat"), lab.get("lon")
+            if lat is None or lon is None:
+                continue  # bez współrzędnych (geokodowanie w main.py) nie ma kafelka
+            window = incident_window(lab)
+            incidents.append({
+                "miejsce": lab.get("miejsce"),
+                "lat": lat,
+                "lon": lon,
+                "poziom_zagrozenia": lab.get("poziom_zagrozenia"),
+                "komfort": lab.get("komfort"),
+                "start": window[0] if window else None,
+                "end": window[1] if window else None,
+                "severity": round(severity(lab), 4),
+                "podsumowanie": lab.get("podsumowanie"),
+                "adres_url": lab.get("adres_url"),
+            })
+
+        tiles: Dict[str, Dict[str, List[int]]] = {}
+        for precision in precisions:
+            members: Dict[str, List[int]] = defaultdict(list)
+            for i, inc in enumerate(incidents):
+                members[geohash(inc["lat"], inc["lon"], precision)].append(i)
+            tiles[str(precision)] = dict(members)
+        return cls(tiles, incidents, precisions)
+
+    @staticmethod
+    def weight(inc: Dict[str, Any], at: float) -> float:
+        window = (inc["start"], inc["end"]) if inc["start"] is not None else None
+        return inc["severity"] * time_factor(window, at)
+
+    def lookup(self, lat: float, lon: float, precision: int = DEFAULT_PRECISION,
+               with_neighbors: bool = True, at: Optional[float] = None) -> Dict[str, Any]:
+        # „co groźnego w pobliżu” w chwili at (domyślnie teraz): kafelek punktu (i sąsiednie)
+        # zamiast przeglądania wszystkich wpisów
+        if str(precision) not in self.tiles:
+            raise ValueError(f"brak kafelków o precyzji {precision} (dostępne: {self.precisions})")
+        at = time.time() if at is None else at
+        level = self.tiles[str(precision)]
+        code = geohash(lat, lon, precision)
+        codes = neighbors(code) if with_neighbors else [code]
+        ids = [i for c in codes for i in level.get(c, [])]
+        weights = {i: self.weight(self.incidents[i], at) for i in ids}
+        active = {i for i in ids if self.incidents[i]["start"] is not None
+                  and self.incidents[i]["start"] <= at <= self.incidents[i]["end"]}
+        top = sorted(ids, key=weights.__getitem__, reverse=True)[:TOP_K]
+        return {
+            "geohash": code,
+            "at": at,
+            "n": len(ids),
+            "active": len(active),
+            "danger": round(sum(weights.values()), 4),
+            "max_level": max((self.incidents[i]["poziom_zagrozenia"] or 0 for i in ids if weights[i] > 0),
+                             default=0),
+            "incidents": [dict(self.incidents[i], weight=round(weights[i], 4), active=i in active)
+                          for i in top],
+        }
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"precisions": self.precisions, "tiles": self.tiles, "incidents": self.incidents},
+                      f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TileIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["tiles"], data["incidents"], data["precisions"])
+
+# --------------------------- Main ---------------------------
+
+def build_tiles(input_path: str = INPUT_PATH, output_path: str = OUTPUT_PATH) -> TileIndex:
+    index = TileIndex.build(load_labels(input_path))
+    index.save(output_path)
+    counts = ", ".join(f"p{p}: {len(index.tiles[str(p)])}" for p in index.precisions)
+    print(f"Kafelki zagrożenia: {len(index.incidents)} incydentów ze współrzędnymi ({counts}) -> {output_path}")
+    return index
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Kafelki zagrożenia (geohash) z etykietowanego wyjścia main.py.")
+    parser.add_argument("--input", default=INPUT_PATH, help="Wyjście main.py (.json lub .jsonl).")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--lookup", nargs=2, type=float, metavar=("LAT", "LON"),
+                        help="Zamiast budowania: zagrożenie w pobliżu punktu z zapisanych kafelków.")
+    parser.add_argument("--at", help="Chwila odniesienia dla wag czasu przy --lookup (ISO 8601, domyślnie teraz).")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.lookup:
+        at = parse_date(args.at) if args.at else None
+        if args.at and at is None:
+            raise SystemExit(f"Nierozpoznana data --at: {args.at}")
+        result = TileIndex.load(args.output).lookup(*args.lookup, precision=args.precision,
+                                                    at=at.timestamp() if at else None)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        build_tiles(args.input, args.output)
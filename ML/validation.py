@@ -0,0 +1,167 @@
+import os
+import re
+import json
+from typing import Any, Dict, List, Optional
+
+# --------------------------- Walidacja wyników ---------------------------
+
+ISO_DT_RE = re.compile(
+    r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2})?(?:\.\d+)?([+-]\d{2}:\d{2}|Z)$"
+)
+
+CITIES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cities")
+
+def load_generic_places(cities_dir: str = CITIES_DIR) -> set:
+    """Nazwy miast i ich regionów/krajów z cities/*.json – zbyt ogólne, by wskazać miejsce zdarzenia."""
+    places = set()
+    for name in sorted(os.listdir(cities_dir)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(cities_dir, name), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        places.update(p.lower() for p in config.get("city", []))
+        places.update(p.lower() for p in config.get("generic_places", []))
+    return places
+
+GENERIC_PLACES = load_generic_places()  # zabezpieczenie przed uogólnieniami
+
+# typy obiektów/ulic/placów świadczące o konkretnym miejscu – wspólne dla is_specific_place
+# i walidacji wsadowej (SPECIFIC_RE)
+SPECIFIC_TOKENS = ["ul.", "ulica", "rue", "avenue", "av.", "boulevard", "bd", "place", "pl.", "square",
+                   "quai", "pont", "gare", "station", "stacja", "skrzyżowanie", "cross", "rond-point",
+                   "rue de", "rue du", "rue des", "bd ", "boul.", "allee", "allée"]
+
+def is_specific_place(miejsce: str) -> bool:
+    if not miejsce:
+        return False
+    s = miejsce.strip().lower()
+    if s in GENERIC_PLACES:
+        return False
+    # zbyt krótko lub wyłącznie miasto/kraj
+    if len(s) < 5:
+        return False
+    # proste heurystyki: obecność typu obiektu/ulicy/placu/numeru
+    if any(t in s for t in SPECIFIC_TOKENS):
+        return True
+    # numer porządkowy lub skrzyżowanie typu "X / Y"
+    if re.search(r"\d", s) or "/" in s:
+        return True
+    # arrondissement/dzielnica
+    if re.search(r"\b(\d{1,2})(er|e)?\s*arr", s) or "arrondissement" in s:
+        return True
+    return False
+
+def clamp(v: Optional[int], lo=1, hi=5) -> Optional[int]:
+    if v is None:
+        return None
+    try:
+        iv = int(v)
+        return max(lo, min(hi, iv))
+    except Exception:
+        return None
+
+def post_validate(entry: Dict[str, Any], labels: Dict[str, Any]) -> Dict[str, Any]:
+    # adres_url – zawsze z wejścia, jeśli brak
+    if not labels.get("adres_url"):
+        labels["adres_url"] = entry.get("url", "")
+
+    # ISO 8601 – jeśli model nie trafi w pattern, zostaw jak zwrócił (logika biznesowa może potem odfiltrować)
+    data_val = labels.get("data")
+    if isinstance(data_val, str) and not ISO_DT_RE.match(data_val.strip()):
+        labels["data_warning"] = "data nie przeszła walidacji ISO 8601"
+
+    # miejsce – odrzuć ogólne
+    if not is_specific_place(labels.get("miejsce", "")):
+        labels["miejsce_warning"] = "miejsce zbyt ogólne – rozważ doprecyzowanie lub oszacowanie"
+
+    # skale
+    labels["poziom_zagrozenia"] = clamp(labels.get("poziom_zagrozenia"))
+    labels["komfort"] = clamp(labels.get("komfort"))
+
+    return labels
+
+# --------------------------- Walidacja wsadowa ---------------------------
+# Te same reguły dla całej kolumny etykiet naraz (ponowna walidacja historycznych wyjść).
+# is_specific_place sprowadzone do jednego wyrażenia: tokeny typu ulicy/placu, cyfra
+# (obejmuje też wzorzec "12e arr"), "/" lub "arrondissement".
+
+SPECIFIC_RE = re.compile("|".join(re.escape(t) for t in SPECIFIC_TOKENS) + r"|\d|/|arrondissement")
+
+def specific_places(places: List[Any]) -> List[bool]:
+    # is_specific_place dla kolumny; powtarzające się nazwy miejsc liczone raz
+    known: Dict[Any, bool] = {}
+    out = []
+    search = SPECIFIC_RE.search
+    for miejsce in places:
+        ok = known.get(miejsce)
+        if ok is None:
+            if not miejsce:
+                ok = False
+            else:
+                s = miejsce.strip().lower()
+                ok = s not in GENERIC_PLACES and len(s) >= 5 and search(s) is not None
+            known[miejsce] = ok
+        out.append(ok)
+    return out
+
+def iso_dates(values: List[Any]) -> List[bool]:
+    # True = brak ostrzeżenia (nie-napis albo poprawny ISO 8601)
+    match = ISO_DT_RE.match
+    return [not isinstance(v, str) or match(v.strip()) is not None for v in values]
+
+def clamp_column(values: List[Any], lo=1, hi=5) -> List[Optional[int]]:
+    # najczęstszy przypadek – int w zakresie – bez wywołania funkcji
+    return [v if type(v) is int and lo <= v <= hi else clamp(v, lo, hi) for v in values]
+
+def validate_batch(entries: List[Dict[str, Any]], labels_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """post_validate dla wielu wyników naraz (etykiety modyfikowane w miejscu, te same ostrzeżenia)."""
+    places_ok = specific_places([lab.get("miejsce", "") for lab in labels_list])
+    dates_ok = iso_dates([lab.get("data") for lab in labels_list])
+    levels = clamp_column([lab.get("poziom_zagrozenia") for lab in labels_list])
+    comforts = clamp_column([lab.get("komfort") for lab in labels_list])
+
+    for entry, labels, place_ok, date_ok, level, comfort in zip(
+            entries, labels_list, places_ok, dates_ok, levels, comforts):
+        if not labels.get("adres_url"):
+            labels["adres_url"] = entry.get("url", "")
+        if not date_ok:
+            labels["data_warning"] = "data nie przeszła walidacji ISO 8601"
+        if not place_ok:
+            labels["miejsce_warning"] = "miejsce zbyt ogólne – rozważ doprecyzowanie lub oszacowanie"
+        labels["poziom_zagrozenia"] = level
+        labels["komfort"] = comfort
+    return labels_list
+
+# --------------------------- Ponowna walidacja wyjścia ---------------------------
+
+WARNINGS = ("data_warning", "miejsce_warning")
+
+def revalidate(path: str) -> int:
+    # wyjście main.py (JSONL lub dawna tablica JSON) walidowane od nowa po zmianie reguł;
+    # stare ostrzeżenia usuwane, plik podmieniany atomowo
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = json.load(f)
+    valid = [r for r in records if isinstance(r.get("labels"), dict) and "error" not in r["labels"]]
+    for r in valid:
+        for key in WARNINGS:
+            r["labels"].pop(key, None)
+    validate_batch([r.get("wejscie") or {} for r in valid], [r["labels"] for r in valid])
+
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for r in records:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        else:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    return len(valid)
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        print(f"{path}: zwalidowano ponownie {revalidate(path)} wyników")
@@ -13,6 +13,10 @@ interface RawData {
     komfort: number;
     podsumowanie: string;
     adres_url: string;
+    // missing in older files; null when ML/geocode.py could not resolve the place
+    lat?: number | null;
+    lon?: number | null;
+    geo_warning?: string;
   };
 }
 
@@ -29,31 +33,58 @@ const geocoder = NodeGeocoder({
   provider: "openstreetmap",
 });
 
+// Older labeled files have no coordinates; geocode those addresses on the fly
+async function geocodeAddress(miejsce: string): Promise<[number, number]> {
+  const address = miejsce
+    .replace(" (oszacowano)", "")
+    .replace(/\w+:\s?/, "")
+    .replace("Intersection of", "")
+    .replace(" and ", " & ");
+  const result = await geocoder.geocode(address);
+  const geo = result[0];
+
+  if (geo == null) {
+    throw new Error(`Could not geocode address: ${address}, result: ${result}`);
+  }
+
+  if (geo.latitude == null || geo.longitude == null) {
+    throw new Error(`Could not geocode address: ${address}`);
+  }
+
+  return [geo.latitude, geo.longitude];
+}
+
+async function resolvePosition(
+  labels: RawData["labels"],
+): Promise<[number, number] | null> {
+  // coordinates are resolved once by the ML pipeline (ML/geocode.py)
+  if (labels.lat != null && labels.lon != null) {
+    return [labels.lat, labels.lon];
+  }
+  if (labels.lat === null || labels.lon === null) {
+    // a known miss of the ML geocoder; geocoding it again would fail the same way
+    console.warn(
+      `Skipping ${labels.adres_url}: ${labels.geo_warning ?? "no coordinates"}`,
+    );
+    return null;
+  }
+  return await geocodeAddress(labels.miejsce);
+}
+
 export async function parseData(): Promise<DangerZone[]> {
   const rawData = data as RawData[];
 
-  return await Promise.all(
+  const zones = await Promise.all(
     rawData.map(async ({ labels }) => {
-      const address = labels.miejsce
-        .replace(" (oszacowano)", "")
-        .replace(/\w+:\s?/, "")
-        .replace("Intersection of", "")
-        .replace(" and ", " & ");
-      const result = await geocoder.geocode(address);
-      const geo = result[0];
-
-      if (geo == null) {
-        throw new Error(`Could not geocode address: ${address}, result: ${result}`);
-      }
-
-      if (geo.latitude == null || geo.longitude == null) {
-        throw new Error(`Could not geocode address: ${address}`);
+      const position = await resolvePosition(labels);
+      if (position == null) {
+        return null;
       }
 
       const zone: DangerZone = {
         address: labels.miejsce,
         title: labels.podsumowanie,
-        position: [geo.latitude, geo.longitude],
+        position,
         date: new Date(labels.data),
         description: labels.podsumowanie,
         level:
@@ -67,4 +98,5 @@ export async function parseData(): Promise<DangerZone[]> {
       return zone;
     }),
   );
+  return zones.filter((zone): zone is DangerZone => zone != null);
 }